@@ -0,0 +1,98 @@
+"""
+Genera los extractos .osm.pbf de test_osm_pbf.py (hace falta pyosmium, que no es dependencia del proyecto).
+
+    python ETL/extract/fixtures/make_pbf_fixtures.py
+
+- dense.osm.pbf: nodos densos, vías sin coordenadas.
+- plain_low.osm.pbf: nodos sin DenseNodes y vías con LocationsOnWays.
+
+Los dos tienen los mismos elementos (NODES, WAYS, RELATIONS) y marca de
+replicación REPLICATION_TIMESTAMP.
+"""
+import os
+
+import osmium
+from osmium.osm.mutable import Node, Relation, Way
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPLICATION_TIMESTAMP = "2026-10-17T20:00:00Z"
+TIMESTAMP = "2026-01-02T03:04:05Z"
+
+CHURCH = {"amenity": "place_of_worship", "religion": "christian", "denomination": "catholic", "name": "San Pedro"}
+SHRINE = {"place_of_worship": "wayside_shrine", "religion": "christian"}
+CHAPEL = {"building": "chapel", "denomination": "catholic", "name": "Ermita"}
+MOSQUE = {"amenity": "place_of_worship", "religion": "muslim"}
+
+# id -> (lat, lon, etiquetas, versión); ids grandes y negativos para el signo
+# (libosmium no guarda coordenadas de ids negativos: -5 no es nodo de ninguna vía)
+NODES = {
+    1: (40.4167754, -3.7037902, CHURCH, 3),
+    2: (41.3850639, 2.1734035, MOSQUE, 1),
+    3: (37.3890924, -5.9844589, SHRINE, 7),
+    4: (42.0, -8.0, {}, 1),
+    5: (42.002, -7.996, {}, 1),
+    6: (42.004, -8.001, {}, 1),
+    7: (36.5, -6.3, {}, 1),
+    8: (36.51, -6.28, {}, 1),
+    9: (36.49, -6.31, {}, 1),
+    10: (43.1, -2.9, {"highway": "crossing"}, 1),
+    9000000001: (39.4699075, -0.3762881, CHURCH, 12),
+    11: (28.1, -15.4, {}, 1),
+    -5: (27.9, -15.6, SHRINE, 2),
+}
+# id -> (nodos, etiquetas, versión)
+WAYS = {
+    100: ([4, 5, 6, 4], CHAPEL, 4),
+    101: ([7, 8], MOSQUE, 1),
+    # Sin etiquetas propias: sólo interesa como miembro de la relación 200
+    102: ([7, 8, 9, 11], {}, 2),
+    8000000000: ([5, 6, 10], {"building": "church", "religion": "christian"}, 5),
+}
+# id -> (miembros, etiquetas, versión)
+RELATIONS = {
+    200: ([("w", 102, "outer"), ("n", 10, "")], {"type": "multipolygon", **CHURCH}, 6),
+    201: ([("w", 100, "outer")], {"type": "multipolygon", **MOSQUE}, 1),
+}
+
+
+def _header():
+    header = osmium.io.Header()
+    header.set("osmosis_replication_timestamp", REPLICATION_TIMESTAMP)
+    return header
+
+
+def _writer(name, options):
+    path = os.path.join(HERE, name)
+    if os.path.exists(path):
+        os.remove(path)
+    return osmium.SimpleWriter(osmium.io.File(path, f"pbf,{options}"), 0, _header())
+
+
+def write_dense(name):
+    writer = _writer(name, "pbf_dense_nodes=true")
+    for node_id in sorted(NODES, key=lambda i: (i < 0, abs(i))):
+        lat, lon, tags, version = NODES[node_id]
+        writer.add_node(Node(id=node_id, location=(lon, lat), tags=tags, version=version, timestamp=TIMESTAMP))
+    for way_id, (refs, tags, version) in WAYS.items():
+        writer.add_way(Way(id=way_id, nodes=refs, tags=tags, version=version, timestamp=TIMESTAMP))
+    for relation_id, (members, tags, version) in RELATIONS.items():
+        writer.add_relation(Relation(id=relation_id, members=members, tags=tags, version=version, timestamp=TIMESTAMP))
+    writer.close()
+
+
+def write_plain_low(name, source):
+    """Copia de `source` con nodos sin DenseNodes y las coordenadas de cada nodo en sus vías."""
+    writer = _writer(name, "pbf_dense_nodes=false,locations_on_ways=true")
+    for obj in osmium.FileProcessor(os.path.join(HERE, source)).with_locations():
+        if obj.is_node():
+            writer.add_node(obj)
+        elif obj.is_way():
+            writer.add_way(obj)
+        else:
+            writer.add_relation(obj)
+    writer.close()
+
+
+if __name__ == "__main__":
+    write_dense("dense.osm.pbf")
+    write_plain_low("plain_low.osm.pbf", "dense.osm.pbf")
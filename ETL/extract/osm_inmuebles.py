@@ -1,20 +1,59 @@
 import requests
+import asyncio
+import codecs
 import json
 import os
+import queue
+import re
+import threading
 import time
 import random
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from requests.adapters import HTTPAdapter, Retry
+from email.utils import parsedate_to_datetime
+from ETL.extract.osm_pbf import iter_pbf_elements
 
 # --- Configuration ---
 # Valores por defecto. Pueden ser sobrescritos por variables de entorno o argumentos.
 DEFAULT_CONFIG = {
     "OVERPASS_URL": "https://overpass-api.de/api/interpreter",
     "WDQS_URL": "https://query.wikidata.org/sparql",
+    # Tamaño inicial del lote de QIDs; después se ajusta para que cada consulta dure ~WD_TARGET_SECONDS
     "WD_BATCH_SIZE": 50,
+    "WD_MIN_BATCH_SIZE": 5,
+    "WD_MAX_BATCH_SIZE": 400,
+    "WD_TARGET_SECONDS": 10,
+    # Consultas simultáneas (WDQS admite 5 por cliente) y ritmo inicial/máximo en consultas por segundo
+    "WD_CONCURRENCY": 5,
+    "WD_RATE": 1.0,
+    "WD_MAX_RATE": 5.0,
+    # Reintentos de un QID suelto antes de darlo por perdido
+    "WD_MAX_RETRIES": 3,
     "USER_AGENT": "ManusAI/1.0 (https://help.manus.im)",
+    # Copia en disco de la respuesta de Overpass; vacío para no guardarla
+    "OVERPASS_CACHE_FILE": "",
+    # Horas durante las que se reutiliza la copia en lugar de volver a consultar
+    "OVERPASS_CACHE_HOURS": 24,
+    "OVERPASS_CHUNK_SIZE": 1 << 16,
+    # Lado de las teselas en grados; 0 para una única consulta nacional
+    "OVERPASS_TILE_DEGREES": 1.0,
+    # Consultas simultáneas; se limita además a los slots que anuncie /api/status
+    "OVERPASS_WORKERS": 2,
+    "OVERPASS_TILE_RETRIES": 4,
+    "OVERPASS_TILE_TIMEOUT": 300,
+    # Extracto .osm.pbf local (p. ej. Geofabrik); si se indica no se consulta Overpass
+    "OSM_PBF_FILE": "",
+    # Procesos para decodificar el PBF; 0 para usar todos los núcleos
+    "OSM_PBF_WORKERS": 0,
 }
 
+# Rectángulos (sur, oeste, norte, este) que cubren España: península, Baleares, Ceuta y Melilla; Canarias
+SPAIN_BBOXES = [
+    (35.1, -9.6, 44.0, 4.6),
+    (27.5, -18.3, 29.5, -13.3),
+]
+
 OVERPASS_QUERY = """
 [out:json][timeout:1800];
 area["ISO3166-1"="ES"]->.es;
@@ -44,9 +83,63 @@ area["ISO3166-1"="ES"]->.es;
   way ["place_of_worship"~"^(cross|wayside_shrine|lourdes_grotto)$"]["religion"="christian"](area.es);
   rel ["place_of_worship"~"^(cross|wayside_shrine|lourdes_grotto)$"]["religion"="christian"](area.es);
 );
-out tags center qt;
+out meta center qt;
 """
 
+def overpass_query(bbox=None, timeout=1800, since=None):
+    """OVERPASS_QUERY con otro timeout y, si se indica, limitada a un rectángulo (sur, oeste, norte, este).
+
+    Con `since` (ISO 8601) la consulta es incremental: devuelve el id de todos
+    los elementos del conjunto, para detectar las bajas, y los datos completos
+    sólo de los editados después de `since`.
+    """
+    query = OVERPASS_QUERY.replace("[timeout:1800]", f"[timeout:{int(timeout)}]")
+    if bbox:
+        query = query.replace("(area.es)", "(area.es)({},{},{},{})".format(*bbox))
+    if since:
+        query = query.replace(
+            "\n);\nout meta center qt;",
+            f'\n)->.all;\n.all out ids qt;\nnwr.all(newer:"{since}");\nout meta center qt;'
+        )
+    return query
+
+class OSMSyncState:
+    """Estado de una sincronización que comparten extracción, transformación y carga.
+
+    `since` es la marca de agua de la última sincronización completa (None:
+    carga completa) y `known_versions` el osm_id -> versión de lo ya cargado.
+    La extracción anota qué elementos existen y cuáles llegan completos; si
+    alguna consulta falla `complete` queda a False y no se dan bajas ni se
+    avanza la marca de agua.
+    """
+
+    def __init__(self, since=None, known_versions=None):
+        self.since = since
+        self.known_versions = known_versions or {}
+        # osm_id de todo lo que devuelve Overpass (completo o sólo id)
+        self.present = set()
+        # osm_id que llegan con datos completos
+        self.changed = set()
+        # completos pero con la misma versión que la ya cargada: no siguen por el pipeline
+        self.unchanged = set()
+        # timestamp_osm_base más antiguo de las respuestas: la próxima marca de agua
+        self.osm_base = None
+        self.complete = True
+
+    def record(self, element):
+        """Anota un elemento; devuelve si trae datos completos."""
+        key = f"{element.get('type')}/{element.get('id')}"
+        self.present.add(key)
+        if "tags" not in element:
+            return False
+        self.changed.add(key)
+        return True
+
+    def record_osm_base(self, header):
+        osm_base = (header.get("osm3s") or {}).get("timestamp_osm_base")
+        if osm_base and (self.osm_base is None or osm_base < self.osm_base):
+            self.osm_base = osm_base
+
 def get_config():
     """Carga la configuración desde las variables de entorno o usa valores por defecto."""
     config = DEFAULT_CONFIG.copy()
@@ -54,25 +147,344 @@ def get_config():
         config[key] = os.environ.get(key, config[key])
     return config
 
-def extract_osm_data(config):
-    """Extrae datos de Overpass API."""
-    print("1. Querying Overpass API for Catholic buildings in Spain...")
+# --- Lectura incremental de la respuesta de Overpass ---
+
+_WHITESPACE = re.compile(r"\s*")
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class OverpassIncomplete(ValueError):
+    """Respuesta de Overpass cortada por el servidor (timeout, memoria); los elementos recibidos no son todos."""
+
+
+class _JsonStream:
+    """Cursor sobre un JSON que llega en trozos de texto; sólo guarda lo que aún no se ha consumido."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def take(self, expected):
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"Unexpected {char!r} at Overpass JSON, expected one of {expected!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Valor cortado entre dos trozos
+                if not self._fill():
+                    raise
+                continue
+            # Un número que llega al final del buffer puede seguir en el siguiente trozo ("0" + ".6")
+            truncated = end == len(self.buffer) or self.buffer[end] in _NUMBER_CHARS
+            if truncated and isinstance(value, (int, float)) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_overpass_elements(chunks, header=None):
+    """Genera uno a uno los objetos de `elements` de una respuesta de Overpass sin cargarla entera.
+
+    El resto de claves (`osm3s`, `generator`...) se guardan en `header` si se pasa.
+    """
+    stream = _JsonStream(chunks)
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.take(":")
+        if key == "elements":
+            stream.take("[")
+            if stream.peek() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.take(",]") == "]":
+                        break
+        elif key == "remark":
+            # Overpass informa aquí de timeouts o falta de memoria: el resultado está incompleto
+            raise OverpassIncomplete(f"Overpass remark: {stream.value()}")
+        else:
+            value = stream.value()
+            if header is not None:
+                header[key] = value
+        if stream.take(",}") == "}":
+            return
+
+
+def _iter_text(byte_chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _cached_response(config, path):
+    """Ruta de la copia en disco si existe y no ha caducado."""
+    if not path or not os.path.exists(path):
+        return None
+    age_hours = (time.time() - os.path.getmtime(path)) / 3600
+    return path if age_hours < float(config["OVERPASS_CACHE_HOURS"]) else None
+
+
+def _download_chunks(response, cache_file, chunk_size):
+    """Trozos del cuerpo HTTP; si hay `cache_file` se van escribiendo y sólo se publica al terminar."""
+    if not cache_file:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    partial = cache_file + ".part"
+    completed = False
     try:
-        response = requests.post(config["OVERPASS_URL"], data=OVERPASS_QUERY, timeout=1800)
+        with open(partial, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                yield chunk
+        completed = True
+    finally:
+        if completed:
+            os.replace(partial, cache_file)
+        elif os.path.exists(partial):
+            os.remove(partial)
+
+
+def _stream_overpass(config, query, cache_file, timeout, header=None):
+    """Elementos de una consulta a Overpass (o de su copia en disco); los errores se propagan."""
+    chunk_size = int(config["OVERPASS_CHUNK_SIZE"])
+    cached = _cached_response(config, cache_file)
+    if cached:
+        with open(cached, "r", encoding="utf-8") as f:
+            yield from iter_overpass_elements(iter(lambda: f.read(chunk_size), ""), header)
+        return
+    with requests.post(config["OVERPASS_URL"], data=query, timeout=timeout, stream=True,
+                       headers={"User-Agent": config["USER_AGENT"]}) as response:
         response.raise_for_status()
-        osm_data = response.json()
-        osm_elements = osm_data.get('elements', [])
-        print(f"   -> Received {len(osm_elements)} elements from OSM.")
-        return osm_elements
-    except requests.exceptions.RequestException as e:
-        print(f"   -> Error querying Overpass: {e}")
-        return []
+        text_chunks = _iter_text(_download_chunks(response, cache_file, chunk_size))
+        try:
+            yield from iter_overpass_elements(text_chunks, header)
+            # Lo que quede tras el JSON, para que la copia en disco se complete
+            for _ in text_chunks:
+                pass
+        finally:
+            # Si algo falla a medias la copia parcial se descarta
+            text_chunks.close()
+
+def _overpass_slots(config):
+    """Slots por IP que anuncia /api/status ("Rate limit: N"); None si no se sabe o no hay límite."""
+    status_url = config["OVERPASS_URL"].rsplit("/", 1)[0] + "/status"
+    try:
+        response = requests.get(status_url, timeout=10, headers={"User-Agent": config["USER_AGENT"]})
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return None
+    match = re.search(r"Rate limit:\s*(\d+)", response.text)
+    if not match or int(match.group(1)) == 0:
+        return None
+    return int(match.group(1))
+
+def overpass_tiles(degrees):
+    """Rejilla de rectángulos de `degrees` grados sobre SPAIN_BBOXES."""
+    tiles = []
+    for south, west, north, east in SPAIN_BBOXES:
+        lat = south
+        while lat < north:
+            lon = west
+            while lon < east:
+                tiles.append((round(lat, 6), round(lon, 6), round(min(lat + degrees, north), 6), round(min(lon + degrees, east), 6)))
+                lon += degrees
+            lat += degrees
+    return tiles
+
+def _cache_file(config, tile=None, since=None):
+    """Copia en disco de una consulta: una por tesela y otra distinta para cada consulta incremental."""
+    base = config["OVERPASS_CACHE_FILE"]
+    if not base:
+        return ""
+    root, ext = os.path.splitext(base)
+    if tile:
+        root += ".{}_{}_{}_{}".format(*tile)
+    if since:
+        root += ".since_" + re.sub(r"[^0-9TZ]", "", since)
+    return root + (ext or ".json")
+
+def _extract_tile(config, tile, since, out, stop):
+    """Descarga una tesela con reintentos propios y deja sus elementos en `out`; devuelve si se completó."""
+    retries = int(config["OVERPASS_TILE_RETRIES"])
+    timeout = int(config["OVERPASS_TILE_TIMEOUT"])
+    query = overpass_query(tile, timeout, since)
+    cache_file = _cache_file(config, tile, since)
+    for attempt in range(retries + 1):
+        count = 0
+        header = {}
+        try:
+            for element in _stream_overpass(config, query, cache_file, timeout + 60, header):
+                if not _put(out, ("element", element), stop):
+                    return False
+                count += 1
+            _put(out, ("tile", (tile, count, header)), stop)
+            return True
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if stop.is_set():
+                return False
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            print(f"   -> Tile {tile} failed (attempt {attempt + 1}/{retries + 1}, {count} elements): {e}")
+            if attempt < retries:
+                # 429/504: servidor saturado, se espera más antes de volver a pedir un slot
+                base = 60 if status in (429, 504) else 15
+                stop.wait(min(600, base * 2 ** attempt) + random.uniform(0, 5))
+    return False
+
+def _run_tile(config, tile, since, out, stop):
+    ok = False
+    try:
+        ok = _extract_tile(config, tile, since, out, stop)
+    except Exception as e:
+        print(f"   -> Tile {tile} aborted: {e}")
+    finally:
+        _put(out, ("done", (tile, ok)), stop)
+
+def _put(out, message, stop):
+    while not stop.is_set():
+        try:
+            out.put(message, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _extract_tiled(config, degrees, state):
+    tiles = overpass_tiles(degrees)
+    workers = max(1, int(config["OVERPASS_WORKERS"]))
+    slots = _overpass_slots(config)
+    if slots:
+        workers = min(workers, slots)
+    print(f"1. Querying Overpass API for Catholic buildings in Spain ({len(tiles)} tiles, {workers} workers)...")
+
+    # Cola acotada: si el resto del pipeline va más lento, las descargas esperan
+    out = queue.Queue(maxsize=1000)
+    stop = threading.Event()
+    seen = set()
+    duplicates = 0
+    done = 0
+    failed = []
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="overpass")
+    try:
+        for tile in tiles:
+            executor.submit(_run_tile, config, tile, state.since, out, stop)
+        while done < len(tiles):
+            kind, payload = out.get()
+            if kind == "element":
+                # Los elementos que cruzan el borde de dos teselas llegan dos veces
+                key = (payload.get('type'), payload.get('id'), "tags" in payload)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                if state.record(payload):
+                    yield payload
+            elif kind == "tile":
+                tile, count, header = payload
+                state.record_osm_base(header)
+                print(f"   -> Tile {tile}: {count} elements.")
+            else:
+                done += 1
+                tile, ok = payload
+                if not ok:
+                    failed.append(tile)
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    print(f"   -> Received {len(state.present)} elements from OSM, {len(state.changed)} with data "
+          f"({duplicates} duplicates across tiles).")
+    if failed:
+        state.complete = False
+        print(f"   -> {len(failed)} tiles failed after retries, their elements are missing: {failed}")
+
+def _extract_pbf(config, state):
+    path = config["OSM_PBF_FILE"]
+    workers = int(config["OSM_PBF_WORKERS"]) or os.cpu_count()
+    print(f"1. Reading Catholic buildings from {path} ({workers} processes)...")
+    header = {}
+    try:
+        for element in iter_pbf_elements(path, workers, header):
+            state.record(element)
+            yield element
+    except (OSError, ValueError, zlib.error) as e:
+        state.complete = False
+        print(f"   -> Error reading {path} after {len(state.present)} elements: {e}")
+        return
+    state.record_osm_base(header)
+    print(f"   -> Read {len(state.present)} elements from the PBF extract.")
+
+def extract_osm_data(config, state=None):
+    """Extrae datos de Overpass API como generador de elementos.
+
+    Por defecto España se divide en teselas de OVERPASS_TILE_DEGREES grados que
+    se consultan en paralelo (OVERPASS_WORKERS) y se reintentan por separado;
+    los elementos se deduplican por `type/id`. Con OVERPASS_TILE_DEGREES=0 se
+    hace la consulta nacional única. Si `state.since` está informado la
+    consulta es incremental y sólo salen los elementos editados desde entonces.
+
+    Con OSM_PBF_FILE los elementos salen del extracto local (ver osm_pbf) y
+    no de Overpass; siempre completos, con o sin `since`.
+    """
+    state = state or OSMSyncState()
+    if config["OSM_PBF_FILE"]:
+        yield from _extract_pbf(config, state)
+        return
+    degrees = float(config["OVERPASS_TILE_DEGREES"])
+    if degrees > 0:
+        yield from _extract_tiled(config, degrees, state)
+        return
+
+    header = {}
+    try:
+        print("1. Querying Overpass API for Catholic buildings in Spain...")
+        query = overpass_query(since=state.since)
+        for element in _stream_overpass(config, query, _cache_file(config, since=state.since), 1800, header):
+            if state.record(element):
+                yield element
+    except (requests.exceptions.RequestException, ValueError) as e:
+        state.complete = False
+        print(f"   -> Error reading Overpass response after {len(state.present)} elements: {e}")
+        return
+    state.record_osm_base(header)
+    print(f"   -> Received {len(state.present)} elements from OSM, {len(state.changed)} with data.")
 
 def normalize_and_filter(osm_elements):
-    """Normaliza y filtra los datos de OSM, extrayendo QIDs de Wikidata."""
+    """Normaliza y filtra los datos de OSM; generador, un elemento cada vez."""
     print("2. Normalizing and filtering OSM data...")
-    normalized_items = []
-    wikidata_qids = set()
+    count = 0
+    with_qid = 0
 
     for e in osm_elements:
         t = e.get('tags', {})
@@ -108,6 +520,9 @@ def normalize_and_filter(osm_elements):
         # Simplificamos la estructura de salida para facilitar la carga en SQLAlchemy
         item = {
             "osm_id": item_id,
+            "osm_type": e.get('type'),
+            "version": e.get('version'),
+            "source_updated_at": e.get('timestamp'),
             "name": name,
             "inferred_type": inferred,
             "denomination": t.get('denomination'),
@@ -124,110 +539,326 @@ def normalize_and_filter(osm_elements):
             "address_street": t.get('addr:street'),
             "address_city": t.get('addr:city') or t.get('addr:town') or t.get('addr:village'),
             "address_postcode": t.get('addr:postcode'),
+            "lat": lat,
+            "lon": lon,
+            "tags": t,
         }
 
+        count += 1
         if wd and wd.startswith('Q'):
-            wikidata_qids.add(wd)
-        
-        normalized_items.append(item)
+            with_qid += 1
+        yield item
 
-    print(f"   -> {len(normalized_items)} items after normalization and filtering.")
-    print(f"   -> Found {len(wikidata_qids)} unique Wikidata QIDs for enrichment.")
-    return normalized_items, wikidata_qids
+    print(f"   -> {count} items after normalization and filtering.")
+    print(f"   -> {with_qid} items with a Wikidata QID for enrichment.")
 
-def enrich_wikidata(normalized_items, wikidata_qids, config):
-    """Enriquece los elementos con datos de Wikidata."""
-    print("3. Enriching data with Wikidata...")
-    
-    session = requests.Session()
-    retries = Retry(total=5, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+def skip_unchanged(normalized_items, state):
+    """Descarta los elementos cuya versión coincide con la ya cargada (ni se enriquecen ni se escriben)."""
+    for item in normalized_items:
+        version = item.get('version')
+        if version is not None and state.known_versions.get(item['osm_id']) == version:
+            state.unchanged.add(item['osm_id'])
+            continue
+        yield item
+    print(f"   -> {len(state.unchanged)} items skipped, version unchanged since the last load.")
+
+def _wikidata_query(batch_qids):
+    wd_items_str = " ".join([f"wd:{qid}" for qid in batch_qids])
+    return f"""
+    SELECT ?item ?itemLabel ?inception ?heritage ?diocese ?coord ?commonsCat WHERE {{
+      VALUES ?item {{ {wd_items_str} }}
+      OPTIONAL {{ ?item wdt:P571 ?inception. }}
+      OPTIONAL {{ ?item wdt:P1435 ?heritage. }}
+      OPTIONAL {{ ?item wdt:P708 ?diocese. }}
+      OPTIONAL {{ ?item wdt:P625 ?coord. }}
+      OPTIONAL {{ ?item wdt:P373 ?commonsCat. }}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language 'es,en'. }}
+    }}
+    """
 
-    qids_list = list(wikidata_qids)
+def _parse_bindings(wd_bindings):
     wd_map = {}
+    for b in wd_bindings:
+        qid = b['item']['value'].split('/')[-1]
+        wd_map[qid] = {
+            'inception': b.get('inception', {}).get('value'),
+            'heritage': b.get('heritage', {}).get('value'),
+            'diocese_wd': b.get('diocese', {}).get('value'),
+            'commons': b.get('commonsCat', {}).get('value'),
+        }
+    return wd_map
 
-    if not qids_list:
-        print("   -> No QIDs to query.")
-        return normalized_items
+def _retry_after(response):
+    """Segundos de la cabecera Retry-After (número o fecha HTTP); None si no viene."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-    # Batch processing
-    for i in range(0, len(qids_list), config["WD_BATCH_SIZE"]):
-        batch_qids = qids_list[i:i + config["WD_BATCH_SIZE"]]
-        wd_items_str = " ".join([f"wd:{qid}" for qid in batch_qids])
-        
-        sparql_query = f"""
-        SELECT ?item ?itemLabel ?inception ?heritage ?diocese ?coord ?commonsCat WHERE {{
-          VALUES ?item {{ {wd_items_str} }}
-          OPTIONAL {{ ?item wdt:P571 ?inception. }}
-          OPTIONAL {{ ?item wdt:P1435 ?heritage. }}
-          OPTIONAL {{ ?item wdt:P708 ?diocese. }}
-          OPTIONAL {{ ?item wdt:P625 ?coord. }}
-          OPTIONAL {{ ?item wdt:P373 ?commonsCat. }}
-          SERVICE wikibase:label {{ bd:serviceParam wikibase:language 'es,en'. }}
-        }}
-        """
-        
+def _merge_wikidata(item, wd_data):
+    item['inception'] = wd_data['inception']
+    item['heritage_status'] = item['heritage_status'] or wd_data['heritage']
+    item['diocese'] = item['diocese'] or wd_data['diocese_wd']
+    item['commons_category'] = wd_data['commons']
+    item['source_refs'].append({"type": "wd", "qid": item['wikidata_qid']})
+
+
+class AdaptiveRateLimiter:
+    """Ritmo AIMD para WDQS.
+
+    Cada respuesta correcta sube el ritmo un paso fijo (hasta `max_rate`);
+    cada 429 lo parte por la mitad y, con Retry-After, detiene todas las
+    consultas hasta esa hora. La concurrencia nunca pasa de `concurrency`.
+    """
+
+    INCREASE = 0.1
+    MIN_RATE = 0.05
+
+    def __init__(self, rate, max_rate, concurrency):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_slot, self.paused_until)
+            self.next_slot = start + 1 / self.rate
+        await asyncio.sleep(start - now)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.INCREASE)
+
+    def on_throttle(self, retry_after):
+        self.throttled += 1
+        self.rate = max(self.MIN_RATE, self.rate / 2)
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+class WikidataEnricher:
+    """Consultas a WDQS por lotes con ritmo adaptativo, lote ajustado al tiempo de respuesta y reparto de fallos."""
+
+    def __init__(self, config):
+        self.config = config
+        self.batch_size = int(config["WD_BATCH_SIZE"])
+        self.min_batch = int(config["WD_MIN_BATCH_SIZE"])
+        self.max_batch = int(config["WD_MAX_BATCH_SIZE"])
+        self.target_seconds = float(config["WD_TARGET_SECONDS"])
+        self.max_retries = int(config["WD_MAX_RETRIES"])
+        self.limiter = AdaptiveRateLimiter(float(config["WD_RATE"]), float(config["WD_MAX_RATE"]), int(config["WD_CONCURRENCY"]))
+        # Sin reintentos de urllib3: los 429 y los fallos se tratan aquí
+        self.session = requests.Session()
+        self.batches = 0
+        self.splits = 0
+        self.lost = 0
+
+    def _tune(self, size, seconds):
+        """Acerca el tamaño de lote al que tardaría `target_seconds`, como mucho x1.5 o /2 cada vez."""
+        # Tiempo que habría tardado un lote del tamaño actual (los lotes partidos son más pequeños)
+        expected = max(seconds, 0.01) * self.batch_size / size
+        factor = min(1.5, max(0.5, self.target_seconds / expected))
+        self.batch_size = int(min(self.max_batch, max(self.min_batch, self.batch_size * factor)))
+
+    async def _post(self, batch_qids):
+        return await asyncio.to_thread(
+            self.session.post,
+            self.config["WDQS_URL"],
+            data={'query': _wikidata_query(batch_qids)},
+            headers={'Accept': 'application/sparql-results+json', 'User-Agent': self.config["USER_AGENT"]},
+            timeout=60,
+        )
+
+    async def fetch(self, batch_qids, attempt=0):
+        """{qid: datos} de un lote; si falla se parte en dos y cada mitad se reintenta por su cuenta."""
+        while True:
+            error = None
+            async with self.limiter:
+                started = time.monotonic()
+                try:
+                    wd_response = await self._post(batch_qids)
+                except requests.exceptions.RequestException as e:
+                    wd_response, error = None, e
+                seconds = time.monotonic() - started
+
+            if wd_response is not None and wd_response.status_code == 429:
+                # Misma consulta cuando el servidor lo permita: el lote no tiene la culpa
+                self.limiter.on_throttle(_retry_after(wd_response))
+                continue
+            if wd_response is not None and wd_response.ok:
+                try:
+                    wd_map = _parse_bindings(wd_response.json().get('results', {}).get('bindings', []))
+                except ValueError as e:
+                    # Respuesta cortada (p. ej. timeout del servidor a mitad del JSON)
+                    error = e
+                else:
+                    self.batches += 1
+                    self.limiter.on_success()
+                    self._tune(len(batch_qids), seconds)
+                    print(f"   -> Batch {self.batches} ({len(batch_qids)} QIDs) in {seconds:.1f}s; "
+                          f"next batch {self.batch_size}, rate {self.limiter.rate:.2f}/s.")
+                    return wd_map
+            elif wd_response is not None:
+                error = f"HTTP {wd_response.status_code}"
+                if wd_response.status_code == 403:
+                    # Cliente bloqueado: repetir sólo empeora
+                    print(f"   -> Wikidata refused {len(batch_qids)} QIDs ({error}).")
+                    self.lost += len(batch_qids)
+                    return {}
+
+            # Timeout, 5xx o JSON incompleto en un lote de tamaño normal: lotes más pequeños a partir de ahora.
+            # Las mitades de un lote ya partido no lo reducen más (un QID problemático no es cuestión de tamaño)
+            if len(batch_qids) * 2 > self.batch_size:
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+            if len(batch_qids) > 1:
+                self.splits += 1
+                half = len(batch_qids) // 2
+                left, right = await asyncio.gather(
+                    self.fetch(batch_qids[:half], attempt), self.fetch(batch_qids[half:], attempt)
+                )
+                return {**left, **right}
+            if attempt >= self.max_retries:
+                print(f"   -> Error querying Wikidata for {batch_qids[0]} after {attempt + 1} attempts: {error}")
+                self.lost += 1
+                return {}
+            attempt += 1
+            await asyncio.sleep(min(60, 2 ** attempt) + random.uniform(0, 1))
+
+
+def enrich_wikidata(normalized_items, config):
+    """Enriquece los elementos con datos de Wikidata.
+
+    Generador: los lotes se consultan en un bucle asyncio en segundo plano
+    (WikidataEnricher) mientras el pipeline sigue leyendo. Sólo se retienen
+    los elementos cuyo QID está pendiente o en vuelo, con como mucho
+    2 * WD_CONCURRENCY lotes en curso; el resto pasa directamente.
+    """
+    print("3. Enriching data with Wikidata...")
+
+    enricher = WikidataEnricher(config)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="wikidata", daemon=True)
+    thread.start()
+    max_in_flight = 2 * int(config["WD_CONCURRENCY"])
+    started = time.monotonic()
+
+    # QID -> datos (None si Wikidata no lo devolvió o se perdió): cada QID se consulta una vez
+    resolved = {}
+    # QID pendiente o en vuelo -> elementos que lo esperan
+    waiting = {}
+    pending_qids = []
+    # future -> QIDs del lote
+    in_flight = {}
+
+    def submit():
+        batch = list(pending_qids)
+        pending_qids.clear()
+        in_flight[asyncio.run_coroutine_threadsafe(enricher.fetch(batch), loop)] = batch
+
+    def complete(block):
+        """Elementos de los lotes terminados; con `block` espera a que termine al menos uno."""
+        done = [future for future in in_flight if future.done()]
+        if block and not done:
+            done = wait(list(in_flight), return_when=FIRST_COMPLETED).done
+        items = []
+        for future in done:
+            items.extend(_resolve(future, in_flight.pop(future)))
+        return items
+
+    def _resolve(future, batch):
         try:
-            # Add a small random delay to respect rate limits
-            time.sleep(random.uniform(1, 3))
-            
-            wd_response = session.post(
-                config["WDQS_URL"], 
-                data={'query': sparql_query}, 
-                headers={'Accept': 'application/sparql-results+json', 'User-Agent': config["USER_AGENT"]},
-                timeout=60
-            )
-            wd_response.raise_for_status()
-            wd_bindings = wd_response.json().get('results', {}).get('bindings', [])
-            
-            for b in wd_bindings:
-                qid = b['item']['value'].split('/')[-1]
-                wd_map[qid] = {
-                    'inception': b.get('inception', {}).get('value'),
-                    'heritage': b.get('heritage', {}).get('value'),
-                    'diocese_wd': b.get('diocese', {}).get('value'),
-                    'commons': b.get('commonsCat', {}).get('value'),
-                }
-            print(f"   -> Batch {i//config['WD_BATCH_SIZE'] + 1}/{len(qids_list)//config['WD_BATCH_SIZE'] + 1} processed successfully.")
-                    
-        except requests.exceptions.RequestException as e:
-            print(f"   -> Error querying Wikidata (Batch {i//config['WD_BATCH_SIZE'] + 1}): {e}")
-            # Continue with the next batch
-
-    # Merge WD data into normalized items
-    for item in normalized_items:
-        qid = item.get('wikidata_qid')
-        if qid in wd_map:
-            wd_data = wd_map[qid]
-            item['inception'] = wd_data['inception']
-            item['heritage_status'] = item['heritage_status'] or wd_data['heritage']
-            item['diocese'] = item['diocese'] or wd_data['diocese_wd']
-            item['commons_category'] = wd_data['commons']
-            item['source_refs'].append({"type": "wd", "qid": qid})
-            
-    return normalized_items
-
-def run_osm_etl():
-    """Función principal para ejecutar el proceso ETL y devolver los datos listos para cargar."""
+            wd_map = future.result()
+        except Exception as e:
+            print(f"   -> Error querying Wikidata ({len(batch)} QIDs): {e}")
+            enricher.lost += len(batch)
+            wd_map = {}
+        done = []
+        for qid in batch:
+            resolved[qid] = wd_map.get(qid)
+            for item in waiting.pop(qid, []):
+                if resolved[qid]:
+                    _merge_wikidata(item, resolved[qid])
+                done.append(item)
+        return done
+
+    try:
+        for item in normalized_items:
+            qid = item.get('wikidata_qid')
+            if not (qid and qid.startswith('Q')):
+                yield item
+            elif qid in resolved:
+                if resolved[qid]:
+                    _merge_wikidata(item, resolved[qid])
+                yield item
+            elif qid in waiting:
+                waiting[qid].append(item)
+            else:
+                waiting[qid] = [item]
+                pending_qids.append(qid)
+                if len(pending_qids) >= enricher.batch_size:
+                    submit()
+            # Lo ya terminado sale en cuanto se puede; con demasiados lotes en curso se espera al primero que acabe
+            yield from complete(block=len(in_flight) >= max_in_flight)
+
+        if pending_qids:
+            submit()
+        while in_flight:
+            yield from complete(block=True)
+    finally:
+        for future in in_flight:
+            future.cancel()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        enricher.session.close()
+
+    if not enricher.batches and not resolved:
+        print("   -> No QIDs to query.")
+    else:
+        print(f"   -> {len(resolved)} QIDs in {time.monotonic() - started:.0f}s: {enricher.batches} batches, "
+              f"{enricher.splits} splits, {enricher.limiter.throttled} throttled, {enricher.lost} lost.")
+
+def run_osm_etl(state=None):
+    """Función principal del ETL: generador de elementos listos para cargar.
+
+    Extracción, normalización y enriquecimiento se encadenan como generadores,
+    así que la memoria no depende del número de elementos de Overpass. Con un
+    `OSMSyncState` la extracción puede ser incremental y se saltan los
+    elementos cuya versión no ha cambiado.
+    """
     config = get_config()
     
     # 1. Extract
-    osm_elements = extract_osm_data(config)
-    if not osm_elements:
-        return []
+    osm_elements = extract_osm_data(config, state)
 
     # 2. Transform (Normalize & Filter)
-    normalized_items, wikidata_qids = normalize_and_filter(osm_elements)
+    normalized_items = normalize_and_filter(osm_elements)
+    if state is not None:
+        normalized_items = skip_unchanged(normalized_items, state)
     
     # 3. Enrich
-    final_items = enrich_wikidata(normalized_items, wikidata_qids, config)
-    
-    return final_items
+    return enrich_wikidata(normalized_items, config)
 
 if __name__ == "__main__":
     # Ejemplo de uso independiente (no necesario para la integración)
     data = run_osm_etl()
-    print(f"Total items ready for loading: {len(data)}")
+    print(f"Total items ready for loading: {sum(1 for _ in data)}")
     # Guardar en un archivo temporal para inspección si es necesario
     # with open("temp_output.json", "w", encoding="utf-8") as f:
     #     json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,456 @@
+"""
+Lectura de un extracto .osm.pbf (p. ej. Geofabrik spain-latest.osm.pbf) como alternativa a Overpass.
+
+Aplica los mismos cinco criterios de etiquetas que OVERPASS_QUERY y devuelve
+elementos con la forma de la salida `out meta center` de Overpass, así que
+normalize_and_filter los trata igual. El área es la del propio extracto.
+
+Los bloques del PBF son independientes: se decodifican en paralelo en un
+pool de procesos, cada uno leyendo su bloque del fichero por offset. Sólo
+se usa la biblioteca estándar (zlib y un decodificador protobuf mínimo).
+
+Pasadas:
+1. Todos los bloques: nodos que cumplen los criterios (salen ya) y vías y
+   relaciones que los cumplen (se guardan). Un bloque cuya tabla de cadenas
+   no contiene "christian" ni "catholic" no puede tener coincidencias y no
+   se decodifica.
+2. Bloques de vías: nodos de las vías que son miembro de alguna relación.
+3. Bloques de nodos: coordenadas de los nodos de esas vías, para calcular
+   el centro del bbox como hace Overpass. No hace falta si el PBF trae
+   LocationsOnWays.
+"""
+import os
+import struct
+import zlib
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import accumulate
+
+# --- Criterios de OVERPASS_QUERY ---
+
+BUILDINGS = {"church", "cathedral", "chapel", "monastery", "convent", "hermitage", "basilica"}
+SMALL_PLACES = {"cross", "wayside_shrine", "lourdes_grotto"}
+# Todo elemento que cumple algún criterio tiene uno de estos valores
+REQUIRED_VALUES = (b"christian", b"catholic")
+
+def matches_overpass_criteria(tags):
+    """Los cinco criterios de OVERPASS_QUERY sobre un diccionario de etiquetas."""
+    christian = tags.get("religion") == "christian"
+    catholic = tags.get("denomination") == "catholic"
+    no_denomination = "denomination" not in tags
+    place_of_worship = tags.get("amenity") == "place_of_worship"
+    building = tags.get("building") in BUILDINGS
+    return (
+        (place_of_worship and christian and catholic)                 # 1
+        or (building and catholic)                                    # 2
+        or (place_of_worship and christian and no_denomination)       # 3
+        or (building and christian and no_denomination)               # 4
+        or (christian and tags.get("place_of_worship") in SMALL_PLACES)  # 5
+    )
+
+# --- Protobuf mínimo ---
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+def _fields(buf):
+    """(número de campo, valor) de un mensaje; los campos length-delimited como memoryview."""
+    buf = memoryview(buf)
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        wire = key & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 2:
+            length, pos = _varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire}")
+        yield key >> 3, value
+
+def _packed(buf):
+    """Varints empaquetados, sin signo."""
+    out = []
+    append = out.append
+    value = shift = 0
+    for b in bytes(buf):
+        if b < 0x80:
+            append(value | (b << shift))
+            value = shift = 0
+        else:
+            value |= (b & 0x7F) << shift
+            shift += 7
+    return out
+
+def _zigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+def _packed_sint(buf, delta=False):
+    values = [(n >> 1) ^ -(n & 1) for n in _packed(buf)]
+    return list(accumulate(values)) if delta else values
+
+def _signed64(n):
+    """int64 codificado como varint (los negativos ocupan 10 bytes)."""
+    return n - (1 << 64) if n >= 1 << 63 else n
+
+# --- Ficheros y bloques ---
+
+def blob_index(path):
+    """Cabecera del fichero y (offset, tamaño) de cada blob OSMData, sin descomprimir nada."""
+    header = None
+    blobs = []
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(4)
+            if not raw:
+                break
+            (header_size,) = struct.unpack(">I", raw)
+            blob_type, data_size = None, 0
+            for field, value in _fields(f.read(header_size)):
+                if field == 1:
+                    blob_type = bytes(value).decode()
+                elif field == 3:
+                    data_size = value
+            offset = f.tell()
+            if blob_type == "OSMHeader":
+                header = _read_header(_blob_data(f.read(data_size)))
+            else:
+                if blob_type == "OSMData":
+                    blobs.append((offset, data_size))
+                f.seek(data_size, os.SEEK_CUR)
+    return header or {}, blobs
+
+def _blob_data(blob):
+    for field, value in _fields(blob):
+        if field == 1:
+            return bytes(value)
+        if field == 3:
+            return zlib.decompress(value)
+        if field in (4, 6, 7):
+            raise ValueError("Only raw and zlib PBF blobs are supported")
+    return b""
+
+def _read_header(data):
+    header = {"required_features": [], "optional_features": []}
+    for field, value in _fields(data):
+        if field == 4:
+            header["required_features"].append(bytes(value).decode())
+        elif field == 5:
+            header["optional_features"].append(bytes(value).decode())
+        elif field == 32:
+            header["replication_timestamp"] = _signed64(value)
+    unsupported = set(header["required_features"]) - {"OsmSchema-V0.6", "DenseNodes"}
+    if unsupported:
+        raise ValueError(f"Unsupported PBF features: {sorted(unsupported)}")
+    return header
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _Block:
+    """PrimitiveBlock decodificado a medias: tabla de cadenas, parámetros y grupos sin abrir."""
+
+    def __init__(self, data):
+        self.strings = []
+        self.groups = []
+        self.granularity = 100
+        self.lat_offset = self.lon_offset = 0
+        self.date_granularity = 1000
+        for field, value in _fields(data):
+            if field == 1:
+                self.strings = [bytes(s) for f, s in _fields(value) if f == 1]
+            elif field == 2:
+                self.groups.append(value)
+            elif field == 17:
+                self.granularity = value
+            elif field == 18:
+                self.date_granularity = value
+            elif field == 19:
+                self.lat_offset = _signed64(value)
+            elif field == 20:
+                self.lon_offset = _signed64(value)
+
+    def may_match(self):
+        return any(value in self.strings for value in REQUIRED_VALUES)
+
+    def kinds(self):
+        """Tipos presentes (1 nodos, 2 densos, 3 vías, 4 relaciones) según el primer campo de cada grupo."""
+        return {next(_fields(group))[0] for group in self.groups if len(group)}
+
+    def coord(self, lat, lon):
+        return (
+            round((self.lat_offset + self.granularity * lat) * 1e-9, 7),
+            round((self.lon_offset + self.granularity * lon) * 1e-9, 7),
+        )
+
+    def tags(self, keys, vals):
+        strings = self.strings
+        return {strings[k].decode(): strings[v].decode() for k, v in zip(keys, vals)}
+
+    def info(self, buf):
+        meta = {}
+        for field, value in _fields(buf):
+            if field == 1:
+                meta["version"] = value
+            elif field == 2:
+                meta["timestamp"] = _timestamp(_signed64(value) * self.date_granularity // 1000)
+        return meta
+
+    def message(self, buf, node=False):
+        """Campos comunes de Node/Way/Relation (`Node.id` es sint64; `Way.id` y `Relation.id`, int64)."""
+        element = {"keys": [], "vals": [], "meta": {}}
+        for field, value in _fields(buf):
+            if field == 1:
+                element["id"] = _zigzag(value) if node else _signed64(value)
+            elif field == 2:
+                element["keys"] = _packed(value)
+            elif field == 3:
+                element["vals"] = _packed(value)
+            elif field == 4:
+                element["meta"] = self.info(value)
+            else:
+                element[field] = value
+        return element
+
+    def dense_nodes(self, dense, wanted=None):
+        """(id, etiquetas, meta, (lat, lon)) de los nodos densos; con `wanted` sólo coordenadas de esos ids."""
+        parts = dict(_fields(dense))
+        ids = _packed_sint(parts.get(1, b""), delta=True)
+        if wanted is not None:
+            hits = wanted(ids)
+            if not hits:
+                return
+            lats = _packed_sint(parts.get(8, b""), delta=True)
+            lons = _packed_sint(parts.get(9, b""), delta=True)
+            for index, node_id in enumerate(ids):
+                if node_id in hits:
+                    yield node_id, None, None, self.coord(lats[index], lons[index])
+            return
+
+        keys_vals = _packed(parts.get(10, b""))
+        if not keys_vals:
+            return
+        tagged = []
+        pos = 0
+        for index in range(len(ids)):
+            start = pos
+            while keys_vals[pos]:
+                pos += 2
+            if pos > start:
+                tags = self.tags(keys_vals[start:pos:2], keys_vals[start + 1:pos:2])
+                if matches_overpass_criteria(tags):
+                    tagged.append((index, tags))
+            pos += 1
+        if not tagged:
+            return
+        lats = _packed_sint(parts.get(8, b""), delta=True)
+        lons = _packed_sint(parts.get(9, b""), delta=True)
+        versions, timestamps = [], []
+        if 5 in parts:
+            info = dict(_fields(parts[5]))
+            versions = _packed(info.get(1, b""))
+            timestamps = _packed_sint(info.get(2, b""), delta=True)
+        for index, tags in tagged:
+            meta = {}
+            if index < len(versions):
+                meta["version"] = versions[index]
+            if index < len(timestamps):
+                meta["timestamp"] = _timestamp(timestamps[index] * self.date_granularity // 1000)
+            yield ids[index], tags, meta, self.coord(lats[index], lons[index])
+
+# --- Trabajo de cada proceso ---
+
+_worker = {}
+
+def _init_worker(path, wanted=None):
+    _worker["file"] = open(path, "rb")
+    _worker["wanted"] = wanted
+
+def _read_block(blob):
+    offset, size = blob
+    f = _worker["file"]
+    f.seek(offset)
+    return _Block(_blob_data(f.read(size)))
+
+def _scan_block(blob):
+    """Pasada 1: tipos del bloque y elementos que cumplen los criterios."""
+    block = _read_block(blob)
+    kinds = block.kinds()
+    nodes, ways, relations = [], [], []
+    if not block.may_match():
+        return kinds, nodes, ways, relations
+    for group in block.groups:
+        for field, value in _fields(group):
+            if field == 2:
+                for node_id, tags, meta, (lat, lon) in block.dense_nodes(value):
+                    nodes.append({"type": "node", "id": node_id, "lat": lat, "lon": lon, **meta, "tags": tags})
+            elif field in (1, 3, 4):
+                element = block.message(value, node=field == 1)
+                tags = block.tags(element["keys"], element["vals"])
+                if not matches_overpass_criteria(tags):
+                    continue
+                if field == 1:
+                    lat, lon = block.coord(_zigzag(element.get(8, 0)), _zigzag(element.get(9, 0)))
+                    nodes.append({"type": "node", "id": element["id"], "lat": lat, "lon": lon, **element["meta"], "tags": tags})
+                elif field == 3:
+                    refs = _packed_sint(element.get(8, b""), delta=True)
+                    coords = []
+                    if 9 in element:
+                        # LocationsOnWays: coordenadas ya en la vía
+                        lats = _packed_sint(element[9], delta=True)
+                        lons = _packed_sint(element[10], delta=True)
+                        coords = [block.coord(lat, lon) for lat, lon in zip(lats, lons)]
+                    ways.append({"id": element["id"], "tags": tags, "meta": element["meta"], "refs": refs, "coords": coords})
+                else:
+                    memids = _packed_sint(element.get(9, b""), delta=True)
+                    types = _packed(element.get(10, b""))
+                    relations.append({"id": element["id"], "tags": tags, "meta": element["meta"],
+                                      "members": list(zip(types, memids))})
+    return kinds, nodes, ways, relations
+
+def _way_refs_block(blob):
+    """Pasada 2: nodos (o coordenadas) de las vías pedidas."""
+    block = _read_block(blob)
+    wanted = _worker["wanted"]
+    found = {}
+    for group in block.groups:
+        for field, value in _fields(group):
+            if field != 3:
+                continue
+            element = block.message(value)
+            if element["id"] in wanted:
+                refs = _packed_sint(element.get(8, b""), delta=True)
+                coords = []
+                if 9 in element:
+                    lats = _packed_sint(element[9], delta=True)
+                    lons = _packed_sint(element[10], delta=True)
+                    coords = [block.coord(lat, lon) for lat, lon in zip(lats, lons)]
+                found[element["id"]] = (refs, coords)
+    return found
+
+def _node_coords_block(blob):
+    """Pasada 3: coordenadas de los nodos pedidos (`wanted` es una lista ordenada de ids)."""
+    block = _read_block(blob)
+    wanted = _worker["wanted"]
+
+    def hits(ids):
+        if not ids:
+            return set()
+        lo, hi = bisect_left(wanted, min(ids)), bisect_right(wanted, max(ids))
+        return set(wanted[lo:hi]).intersection(ids) if hi > lo else set()
+
+    found = {}
+    for group in block.groups:
+        for field, value in _fields(group):
+            if field == 2:
+                for node_id, _, _, coord in block.dense_nodes(value, hits):
+                    found[node_id] = coord
+            elif field == 1:
+                element = block.message(value, node=True)
+                if hits([element["id"]]):
+                    found[element["id"]] = block.coord(_zigzag(element.get(8, 0)), _zigzag(element.get(9, 0)))
+    return found
+
+# --- Extracción ---
+
+def _center(coords):
+    """Centro del bbox, como `out center` de Overpass."""
+    if not coords:
+        return None
+    lats = [c[0] for c in coords]
+    lons = [c[1] for c in coords]
+    return {"lat": round((min(lats) + max(lats)) / 2, 7), "lon": round((min(lons) + max(lons)) / 2, 7)}
+
+def _run_pass(path, blobs, function, workers, wanted=None):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path, wanted)) as executor:
+        yield from executor.map(function, blobs, chunksize=8)
+
+def iter_pbf_elements(path, workers=None, header=None):
+    """Genera los elementos del PBF que cumplen los criterios de OVERPASS_QUERY, con forma de Overpass.
+
+    En `header` deja `osm3s.timestamp_osm_base` si el fichero trae marca de replicación.
+    """
+    workers = workers or os.cpu_count() or 1
+    file_header, blobs = blob_index(path)
+    if header is not None and file_header.get("replication_timestamp"):
+        header["osm3s"] = {"timestamp_osm_base": _timestamp(file_header["replication_timestamp"])}
+
+    # 1. Nodos (salen ya), vías y relaciones que cumplen los criterios
+    node_blobs, way_blobs = [], []
+    ways, relations = {}, []
+    for blob, (kinds, nodes, block_ways, block_relations) in zip(blobs, _run_pass(path, blobs, _scan_block, workers)):
+        if kinds & {1, 2}:
+            node_blobs.append(blob)
+        if 3 in kinds:
+            way_blobs.append(blob)
+        yield from nodes
+        for way in block_ways:
+            ways[way["id"]] = way
+        relations.extend(block_relations)
+
+    # 2. Vías miembro de relaciones que no están ya
+    member_ways = {memid for r in relations for kind, memid in r["members"] if kind == 1 and memid not in ways}
+    extra_ways = {}
+    if member_ways:
+        for found in _run_pass(path, way_blobs, _way_refs_block, workers, member_ways):
+            extra_ways.update(found)
+
+    # 3. Coordenadas de los nodos que faltan
+    wanted = set()
+    for way in ways.values():
+        if not way["coords"]:
+            wanted.update(way["refs"])
+    for refs, coords in extra_ways.values():
+        if not coords:
+            wanted.update(refs)
+    for r in relations:
+        wanted.update(memid for kind, memid in r["members"] if kind == 0)
+    coords = {}
+    if wanted:
+        for found in _run_pass(path, node_blobs, _node_coords_block, workers, sorted(wanted)):
+            coords.update(found)
+
+    def way_coords(refs, way_own):
+        return way_own or [coords[ref] for ref in refs if ref in coords]
+
+    for way in ways.values():
+        element = {"type": "way", "id": way["id"], **way["meta"], "tags": way["tags"]}
+        center = _center(way_coords(way["refs"], way["coords"]))
+        if center:
+            element["center"] = center
+        yield element
+
+    for r in relations:
+        points = []
+        for kind, memid in r["members"]:
+            if kind == 0 and memid in coords:
+                points.append(coords[memid])
+            elif kind == 1:
+                member = ways.get(memid)
+                if member is not None:
+                    points.extend(way_coords(member["refs"], member["coords"]))
+                elif memid in extra_ways:
+                    points.extend(way_coords(*extra_ways[memid]))
+            # Las relaciones anidadas no se siguen
+        element = {"type": "relation", "id": r["id"], **r["meta"], "tags": r["tags"]}
+        center = _center(points)
+        if center:
+            element["center"] = center
+        yield element
@@ -0,0 +1,187 @@
+"""
+Lectura incremental de la respuesta de Overpass (_JsonStream / iter_overpass_elements) y su copia en disco.
+"""
+import json
+import os
+
+import pytest
+import requests
+
+from ETL.extract import osm_inmuebles
+from ETL.extract.osm_inmuebles import (
+    DEFAULT_CONFIG, OverpassIncomplete, _iter_text, _stream_overpass, iter_overpass_elements
+)
+
+ELEMENTS = [
+    {"type": "node", "id": 1, "lat": 40.4167754, "lon": -3.7037902, "version": 3,
+     "tags": {"name": "Nuestra Señora de la \"Asunción\"", "note": "línea\nnueva \\ barra", "ele": "650"}},
+    {"type": "way", "id": 8000000000, "center": {"lat": 0.5, "lon": -1e-07}, "version": 12, "tags": {}},
+    {"type": "relation", "id": 200, "center": {"lat": 35.6, "lon": -9.15}, "tags": {"name": "Ermita ⛪"}},
+]
+HEADER = {
+    "version": 0.6,
+    "generator": "Overpass API 0.7.62",
+    "osm3s": {"timestamp_osm_base": "2026-10-17T20:00:00Z", "copyright": "ODbL"},
+}
+# Cabecera delante y detrás de `elements`, y un número al final del objeto
+DOCUMENT = json.dumps({"version": 0.6, "generator": HEADER["generator"], "elements": ELEMENTS,
+                       "osm3s": HEADER["osm3s"]}, ensure_ascii=False, indent=1)
+
+
+def read(chunks):
+    header = {}
+    return list(iter_overpass_elements(chunks, header)), header
+
+
+# --- Trozos ---
+
+def test_whole_document():
+    assert read([DOCUMENT]) == (ELEMENTS, HEADER)
+
+
+def test_every_split_point():
+    # Incluye cortes dentro de cadenas, escapes, números ("40." + "4167754", "0" + ".6") y claves
+    for i in range(len(DOCUMENT) + 1):
+        assert read([DOCUMENT[:i], DOCUMENT[i:]]) == (ELEMENTS, HEADER), i
+
+
+def test_one_character_chunks():
+    assert read(iter(DOCUMENT)) == (ELEMENTS, HEADER)
+
+
+def test_number_at_end_of_document():
+    document = '{"elements":[],"version":0.6}'
+    cut = document.index("0.6") + 1
+    assert read([document[:cut], document[cut:]]) == ([], {"version": 0.6})
+
+
+def test_utf8_split_inside_character():
+    data = DOCUMENT.encode("utf-8")
+    byte_chunks = [data[i:i + 1] for i in range(len(data))]
+    assert read(_iter_text(byte_chunks)) == (ELEMENTS, HEADER)
+
+
+@pytest.mark.parametrize("document", [
+    '{"version": 0.6, "elements": []}',
+    '{"version": 0.6, "elements": [ \n ] }',
+])
+def test_empty_elements(document):
+    assert read([document]) == ([], {"version": 0.6})
+
+
+def test_empty_object():
+    assert read(["{ }"]) == ([], {})
+
+
+def test_remark_raises_after_received_elements():
+    document = json.dumps({"elements": ELEMENTS[:2], "remark": "runtime error: Query timed out"})
+    received = []
+    with pytest.raises(OverpassIncomplete, match="timed out"):
+        for element in iter_overpass_elements(iter(document)):
+            received.append(element)
+    assert received == ELEMENTS[:2]
+
+
+def test_invalid_document():
+    with pytest.raises(ValueError):
+        read(['{"elements": [1 2]}'])
+
+
+# --- Copia en disco ---
+
+class FakeResponse:
+    def __init__(self, body, fail_after=None):
+        self.body = body.encode("utf-8")
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for n, start in enumerate(range(0, len(self.body), chunk_size)):
+            if self.fail_after is not None and n >= self.fail_after:
+                raise requests.exceptions.ChunkedEncodingError("Connection broken")
+            yield self.body[start:start + chunk_size]
+
+
+@pytest.fixture
+def config():
+    return {**DEFAULT_CONFIG, "OVERPASS_CHUNK_SIZE": 7, "OVERPASS_CACHE_HOURS": 24}
+
+
+@pytest.fixture
+def overpass(monkeypatch):
+    """Sustituye requests.post; `overpass.response` es lo que devuelve y `overpass.calls` cuántas veces se llamó."""
+    class Overpass:
+        response = None
+        calls = 0
+
+        def post(self, *args, **kwargs):
+            self.calls += 1
+            return self.response
+
+    fake = Overpass()
+    monkeypatch.setattr(osm_inmuebles.requests, "post", fake.post)
+    return fake
+
+
+def test_cache_written_on_success_and_reused(tmp_path, config, overpass):
+    cache_file = str(tmp_path / "overpass.json")
+    overpass.response = FakeResponse(DOCUMENT)
+
+    header = {}
+    assert list(_stream_overpass(config, "query", cache_file, 10, header)) == ELEMENTS
+    assert header == HEADER
+    assert os.listdir(tmp_path) == ["overpass.json"]
+    with open(cache_file, encoding="utf-8") as f:
+        assert f.read() == DOCUMENT
+
+    # Segunda lectura desde la copia, sin consultar Overpass
+    assert list(_stream_overpass(config, "query", cache_file, 10)) == ELEMENTS
+    assert overpass.calls == 1
+
+
+def test_cache_discarded_on_remark(tmp_path, config, overpass):
+    cache_file = str(tmp_path / "overpass.json")
+    overpass.response = FakeResponse(json.dumps({"elements": ELEMENTS, "remark": "out of memory"}))
+
+    with pytest.raises(OverpassIncomplete):
+        list(_stream_overpass(config, "query", cache_file, 10))
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_discarded_on_broken_connection(tmp_path, config, overpass):
+    cache_file = str(tmp_path / "overpass.json")
+    overpass.response = FakeResponse(DOCUMENT, fail_after=5)
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        list(_stream_overpass(config, "query", cache_file, 10))
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_discarded_when_consumer_stops(tmp_path, config, overpass):
+    cache_file = str(tmp_path / "overpass.json")
+    overpass.response = FakeResponse(DOCUMENT)
+
+    elements = _stream_overpass(config, "query", cache_file, 10)
+    assert next(elements) == ELEMENTS[0]
+    assert os.path.exists(cache_file + ".part")
+    elements.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_expired_cache_is_not_used(tmp_path, config, overpass):
+    cache_file = tmp_path / "overpass.json"
+    cache_file.write_text('{"elements": []}', encoding="utf-8")
+    old = os.path.getmtime(cache_file) - 25 * 3600
+    os.utime(cache_file, (old, old))
+    overpass.response = FakeResponse(DOCUMENT)
+
+    assert list(_stream_overpass(config, "query", str(cache_file), 10)) == ELEMENTS
+    assert overpass.calls == 1
@@ -0,0 +1,76 @@
+"""
+Lectura de .osm.pbf contra los extractos de fixtures/ (generados con pyosmium, ver make_pbf_fixtures.py).
+"""
+import os
+
+import pytest
+
+from ETL.extract.osm_pbf import blob_index, iter_pbf_elements, matches_overpass_criteria
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# dense: DenseNodes, vías sin coordenadas. plain_low: nodos sueltos, vías con LocationsOnWays
+PBF_FILES = ["dense.osm.pbf", "plain_low.osm.pbf"]
+
+CHURCH = {"amenity": "place_of_worship", "religion": "christian", "denomination": "catholic", "name": "San Pedro"}
+SHRINE = {"place_of_worship": "wayside_shrine", "religion": "christian"}
+TIMESTAMP = "2026-01-02T03:04:05Z"
+
+EXPECTED = {
+    ("node", 1): {"lat": 40.4167754, "lon": -3.7037902, "version": 3, "tags": CHURCH},
+    ("node", 3): {"lat": 37.3890924, "lon": -5.9844589, "version": 7, "tags": SHRINE},
+    ("node", 9000000001): {"lat": 39.4699075, "lon": -0.3762881, "version": 12, "tags": CHURCH},
+    ("node", -5): {"lat": 27.9, "lon": -15.6, "version": 2, "tags": SHRINE},
+    ("way", 100): {
+        "center": {"lat": 42.002, "lon": -7.9985}, "version": 4,
+        "tags": {"building": "chapel", "denomination": "catholic", "name": "Ermita"},
+    },
+    ("way", 8000000000): {
+        "center": {"lat": 42.551, "lon": -5.4505}, "version": 5,
+        "tags": {"building": "church", "religion": "christian"},
+    },
+    # Miembros: la vía 102 (sin etiquetas, sólo se lee en la pasada 2) y el nodo 10 (pasada 3)
+    ("relation", 200): {
+        "center": {"lat": 35.6, "lon": -9.15}, "version": 6,
+        "tags": {"type": "multipolygon", **CHURCH},
+    },
+}
+
+
+@pytest.mark.parametrize("name", PBF_FILES)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_elements_match_overpass_output(name, workers):
+    header = {}
+    elements = list(iter_pbf_elements(os.path.join(FIXTURES, name), workers, header))
+
+    by_key = {(e["type"], e["id"]): e for e in elements}
+    assert len(by_key) == len(elements)
+    assert set(by_key) == set(EXPECTED)
+    for key, expected in EXPECTED.items():
+        element = by_key[key]
+        assert element["timestamp"] == TIMESTAMP
+        for field, value in expected.items():
+            assert element[field] == value, (key, field)
+    assert header == {"osm3s": {"timestamp_osm_base": "2026-10-17T20:00:00Z"}}
+
+
+def test_fixture_variants():
+    dense_header, _ = blob_index(os.path.join(FIXTURES, "dense.osm.pbf"))
+    plain_header, _ = blob_index(os.path.join(FIXTURES, "plain_low.osm.pbf"))
+    assert "DenseNodes" in dense_header["required_features"]
+    assert "DenseNodes" not in plain_header["required_features"]
+    assert "LocationsOnWays" in plain_header["optional_features"]
+
+
+@pytest.mark.parametrize("tags, expected", [
+    (CHURCH, True),
+    ({"building": "chapel", "denomination": "catholic"}, True),
+    ({"amenity": "place_of_worship", "religion": "christian"}, True),
+    ({"building": "church", "religion": "christian"}, True),
+    (SHRINE, True),
+    ({"amenity": "place_of_worship", "religion": "christian", "denomination": "orthodox"}, False),
+    ({"building": "church", "religion": "christian", "denomination": "orthodox"}, False),
+    ({"amenity": "place_of_worship", "religion": "muslim"}, False),
+    ({"building": "house", "denomination": "catholic"}, False),
+])
+def test_matches_overpass_criteria(tags, expected):
+    assert matches_overpass_criteria(tags) is expected
@@ -1,91 +1,215 @@
-from sqlalchemy import create_engine
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select, update, insert, table, column, Integer, String, DateTime, Text
 from sqlalchemy.orm import sessionmaker
 from geoalchemy2 import WKTElement
-from app.db.models.inmuebles import Inmueble, BaseModel
-from ETL.extract.osm_inmuebles import run_osm_etl
+from app.db.models import Inmueble, InmuebleOSMExt
+from ETL.extract.osm_inmuebles import OSMSyncState, run_osm_etl
 import os
 
 # Simulación de la configuración de la base de datos
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./test.db")
+# Cada cuántos registros se vuelca la sesión y se liberan los objetos ya escritos (misma transacción)
+LOAD_FLUSH_SIZE = int(os.environ.get("ETL_LOAD_FLUSH_SIZE", "1000"))
+# incremental: sólo lo editado desde la última sincronización completa (sin ninguna previa equivale a full)
+OSM_SYNC_MODE = os.environ.get("OSM_SYNC_MODE", "incremental")
+# Margen hacia atrás sobre la marca de agua; lo que ya estaba cargado se salta por versión
+OSM_SYNC_OVERLAP_MINUTES = int(os.environ.get("OSM_SYNC_OVERLAP_MINUTES", "60"))
+# Si una ejecución fuera a dar de baja más de esta fracción de lo cargado, no da ninguna
+OSM_SYNC_MAX_TOMBSTONE_FRACTION = float(os.environ.get("OSM_SYNC_MAX_TOMBSTONE_FRACTION", "0.1"))
 
-def load_inmuebles_to_db(data):
-    """Carga los datos procesados en la base de datos SQLAlchemy."""
-    
+# Tabla de la migración 0009: una fila por ejecución
+osm_sync_runs = table(
+    "osm_sync_runs",
+    column("id", Integer), column("mode", String), column("status", String),
+    column("started_at", DateTime), column("finished_at", DateTime),
+    column("since", DateTime), column("watermark", DateTime),
+    column("elements", Integer), column("inserted", Integer), column("updated", Integer),
+    column("unchanged", Integer), column("tombstoned", Integer), column("restored", Integer),
+    column("error", Text),
+)
+
+def _parse_timestamp(value):
+    """'2025-01-31T10:00:00Z' -> datetime UTC sin zona (como el resto de columnas DateTime)."""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+def _ext_values(item):
+    """Campos de InmuebleOSMExt a partir de un elemento normalizado."""
+    return {
+        "osm_id": item["osm_id"],
+        "osm_type": item.get("osm_type"),
+        "version": item.get("version"),
+        "source_updated_at": _parse_timestamp(item.get("source_updated_at")),
+        "name": item.get("name"),
+        "inferred_type": item.get("inferred_type"),
+        "denomination": item.get("denomination"),
+        "diocese": item.get("diocese"),
+        "operator": item.get("operator"),
+        "heritage_status": item.get("heritage_status"),
+        "historic": item.get("historic"),
+        "ruins": item.get("ruins"),
+        "has_polygon": item.get("has_polygon"),
+        "address_street": item.get("address_street"),
+        "address_city": item.get("address_city"),
+        "address_postcode": item.get("address_postcode"),
+        "tags": item.get("tags"),
+        # Elemento completo, con lo que añade Wikidata (inception, commons_category...)
+        "raw": item,
+        "qa_flags": {"flags": item.get("qa_flags") or []},
+        "source_refs": {"refs": item.get("source_refs") or []},
+        # Convertir WKT a objeto GeoAlchemy2
+        "geom": WKTElement(item.get("geom_wkt"), srid=4326),
+    }
+
+def last_watermark(db):
+    """Marca de agua de la última sincronización completa, o None."""
+    return db.execute(
+        select(osm_sync_runs.c.watermark)
+        .where(osm_sync_runs.c.status == "ok", osm_sync_runs.c.watermark.is_not(None))
+        .order_by(osm_sync_runs.c.watermark.desc())
+        .limit(1)
+    ).scalar()
+
+def load_inmuebles_to_db(data, db):
+    """Inserta o actualiza en inmuebles_osm_ext los elementos de `data`.
+
+    `data` puede ser un generador (ver run_osm_etl): se consume una vez y la
+    sesión no acumula más de LOAD_FLUSH_SIZE objetos. Los elementos nuevos
+    crean también su Inmueble; en los existentes sólo se toca la extensión.
+    Devuelve (osm_id cargados, insertados, actualizados, restaurados).
+    """
+    existing = {
+        osm_id: (ext_id, deleted_at)
+        for osm_id, ext_id, deleted_at in db.execute(
+            select(InmuebleOSMExt.osm_id, InmuebleOSMExt.id, InmuebleOSMExt.deleted_at)
+            .where(InmuebleOSMExt.osm_id.is_not(None))
+        )
+    }
+    loaded = set()
+    inserted = updated = restored = 0
+
+    for item in data:
+        values = _ext_values(item)
+        osm_id = values["osm_id"]
+        loaded.add(osm_id)
+        if osm_id in existing:
+            ext_id, deleted_at = existing[osm_id]
+            if deleted_at is not None:
+                # Vuelve a estar en OSM
+                values.update(InmuebleOSMExt.restore_values())
+                restored += 1
+            db.execute(update(InmuebleOSMExt).where(InmuebleOSMExt.id == ext_id).values(**values))
+            updated += 1
+        else:
+            db.add(Inmueble(
+                nombre=(item.get("name") or "")[:255] or None,
+                latitud=item.get("lat"),
+                longitud=item.get("lon"),
+                es_ruina=bool(item.get("ruins")),
+                osm_ext=InmuebleOSMExt(**values),
+            ))
+            inserted += 1
+        if (inserted + updated) % LOAD_FLUSH_SIZE == 0:
+            db.flush()
+            db.expunge_all()
+
+    db.flush()
+    return loaded, inserted, updated, restored
+
+def tombstone_missing(db, state, loaded):
+    """Baja lógica de lo cargado que ya no está en OSM (o ya no pasa los filtros)."""
+    # Siguen vivos: los que Overpass sólo listó por id (sin editar) o llegaron con la misma versión,
+    # y los recién cargados. Un elemento editado que ya no pasa normalize_and_filter cae
+    alive = (state.present - state.changed) | state.unchanged | loaded
+    missing = sorted(set(state.known_versions) - alive)
+    if not missing:
+        return 0
+    limit = OSM_SYNC_MAX_TOMBSTONE_FRACTION * len(state.known_versions)
+    if len(missing) > limit:
+        print(f"   -> Refusing to tombstone {len(missing)} of {len(state.known_versions)} elements "
+              f"(limit {OSM_SYNC_MAX_TOMBSTONE_FRACTION:.0%}); check the Overpass results.")
+        return 0
+    for i in range(0, len(missing), LOAD_FLUSH_SIZE):
+        db.execute(
+            update(InmuebleOSMExt)
+            .where(InmuebleOSMExt.osm_id.in_(missing[i:i + LOAD_FLUSH_SIZE]), InmuebleOSMExt.deleted_at.is_(None))
+            .values(**InmuebleOSMExt.soft_delete_values())
+        )
+    return len(missing)
+
+def run_load_workflow(mode=OSM_SYNC_MODE):
+    """Flujo de trabajo completo: Extraer -> Cargar, registrado en osm_sync_runs.
+
+    En modo incremental Overpass sólo devuelve completos los elementos
+    editados desde la marca de agua (menos OSM_SYNC_OVERLAP_MINUTES) y del
+    resto el id, que basta para detectar las bajas. En los dos modos se
+    saltan los elementos cuya versión no ha cambiado. Si alguna consulta
+    falla la ejecución queda `partial`: se guarda lo cargado, pero no se dan
+    bajas ni avanza la marca de agua.
+    """
     engine = create_engine(DATABASE_URL)
-    # Asegurarse de que la tabla existe (solo para el ejemplo)
-    BaseModel.metadata.create_all(bind=engine) 
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
     db = SessionLocal()
-    count = 0
-    
+    started_at = datetime.utcnow()
+
+    try:
+        watermark = last_watermark(db) if mode == "incremental" else None
+        since = watermark - timedelta(minutes=OSM_SYNC_OVERLAP_MINUTES) if watermark else None
+        mode = "incremental" if since else "full"
+        print(f"--- Starting OSM sync ({mode}{', since ' + since.isoformat() if since else ''}) ---")
+
+        run_id = db.execute(
+            insert(osm_sync_runs).values(mode=mode, status="running", started_at=started_at, since=since)
+            .returning(osm_sync_runs.c.id)
+        ).scalar()
+        db.commit()
+
+        known_versions = dict(db.execute(
+            select(InmuebleOSMExt.osm_id, InmuebleOSMExt.version)
+            .where(InmuebleOSMExt.osm_id.is_not(None), InmuebleOSMExt.deleted_at.is_(None))
+        ).all())
+        state = OSMSyncState(since=since.strftime("%Y-%m-%dT%H:%M:%SZ") if since else None, known_versions=known_versions)
+    except Exception as e:
+        db.rollback()
+        db.close()
+        print(f"An error occurred starting the OSM sync: {e}")
+        return
+
     try:
-        for item in data:
-            # 1. Adaptar el diccionario a los campos del modelo Inmueble
-            inmueble_data = {
-                "osm_id": item.get("osm_id"),
-                "name": item.get("name"),
-                "inferred_type": item.get("inferred_type"),
-                "denomination": item.get("denomination"),
-                "diocese": item.get("diocese"),
-                "operator": item.get("operator"),
-                "wikidata_qid": item.get("wikidata_qid"),
-                "inception": item.get("inception"),
-                "commons_category": item.get("commons_category"),
-                "heritage_status": item.get("heritage_status"),
-                "historic": item.get("historic"),
-                "ruins": item.get("ruins"),
-                "has_polygon": item.get("has_polygon"),
-                "qa_flags": item.get("qa_flags"),
-                "source_refs": item.get("source_refs"),
-                "address_street": item.get("address_street"),
-                "address_city": item.get("address_city"),
-                "address_postcode": item.get("address_postcode"),
-                # Convertir WKT a objeto GeoAlchemy2
-                "geom": WKTElement(item.get("geom_wkt"), srid=4326)
-            }
-            
-            # 2. Comprobar si el inmueble ya existe (por osm_id)
-            existing_inmueble = db.query(Inmueble).filter(Inmueble.osm_id == inmueble_data["osm_id"]).first()
-            
-            if existing_inmueble:
-                # Actualizar (simulación de upsert)
-                for key, value in inmueble_data.items():
-                    setattr(existing_inmueble, key, value)
-                db.add(existing_inmueble)
-                print(f"   -> Updated Inmueble: {inmueble_data['osm_id']}")
-            else:
-                # Insertar
-                new_inmueble = Inmueble(**inmueble_data)
-                db.add(new_inmueble)
-                print(f"   -> Inserted Inmueble: {inmueble_data['osm_id']}")
-            
-            count += 1
-            
+        # 1. Extraer y transformar los datos (generador: se cargan según llegan)
+        data_to_load = run_osm_etl(state)
+
+        # 2. Cargar los datos en la base de datos
+        loaded, inserted, updated, restored = load_inmuebles_to_db(data_to_load, db)
+
+        # 3. Bajas y marca de agua, sólo si Overpass respondió entero
+        tombstoned = tombstone_missing(db, state, loaded) if state.complete else 0
+        db.execute(update(osm_sync_runs).where(osm_sync_runs.c.id == run_id).values(
+            status="ok" if state.complete else "partial",
+            finished_at=datetime.utcnow(),
+            watermark=(_parse_timestamp(state.osm_base) or started_at) if state.complete else None,
+            elements=len(state.present), inserted=inserted, updated=updated,
+            unchanged=len(state.unchanged), tombstoned=tombstoned, restored=restored,
+        ))
         db.commit()
-        print(f"Successfully loaded/updated {count} records.")
-        
+        print(f"OSM sync {'completed' if state.complete else 'partial (no tombstones, watermark kept)'}: "
+              f"{inserted} inserted, {updated} updated ({restored} restored), "
+              f"{len(state.unchanged)} unchanged, {tombstoned} tombstoned.")
+
     except Exception as e:
         db.rollback()
         print(f"An error occurred during loading: {e}")
+        db.execute(update(osm_sync_runs).where(osm_sync_runs.c.id == run_id).values(
+            status="failed", finished_at=datetime.utcnow(), error=str(e)[:2000],
+        ))
+        db.commit()
     finally:
         db.close()
 
-def run_load_workflow():
-    """Flujo de trabajo completo: Extraer -> Cargar."""
-    print("--- Starting Full ETL Workflow: Extract and Load ---")
-    
-    # 1. Extraer y transformar los datos
-    data_to_load = run_osm_etl()
-    
-    if data_to_load:
-        # 2. Cargar los datos en la base de datos
-        load_inmuebles_to_db(data_to_load)
-    else:
-        print("No data to load.")
-
 if __name__ == "__main__":
     # Para ejecutar este script, necesitará configurar su entorno con SQLAlchemy y GeoAlchemy2
     # y asegurarse de que la base de datos esté disponible.
-    # Ejemplo de ejecución: python ETL/load/inmuebles_ext.py
-    run_load_workflow()
+    # Ejemplo de ejecución: python ETL/load/inmuebles_ext.py [full|incremental]
+    import sys
+    run_load_workflow(sys.argv[1] if len(sys.argv) > 1 else OSM_SYNC_MODE)
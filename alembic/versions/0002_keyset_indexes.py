@@ -0,0 +1,36 @@
+# alembic/versions/0002_keyset_indexes.py
+"""composite (created_at, id) indexes for keyset pagination
+
+Revision ID: 0002_keyset_indexes
+Revises: 0001_create_pgcrypto
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0002_keyset_indexes"
+down_revision = "0001_create_pgcrypto"
+branch_labels = None
+depends_on = None
+
+# Tablas con AuditMixin (created_at + id)
+TABLES = [
+    "actuaciones", "actuaciones_documentos", "actuaciones_subvenciones", "actuaciones_tecnicos",
+    "administraciones", "administraciones_titulares", "adquirientes", "agencias_inmobiliarias",
+    "agencias_inmobiliarias_titulares", "citas_historiograficas", "colegios_profesionales",
+    "comunidades_autonomas", "diocesis", "diocesis_titulares", "documentos", "estados_conservacion",
+    "estados_tratamiento", "figuras_proteccion", "fuentes_historiograficas", "inmatriculaciones",
+    "inmuebles", "inmuebles_documentos", "inmuebles_figuras_proteccion", "inmuebles_osm_ext",
+    "inmuebles_wd_ext", "localidades", "notarias", "notarias_titulares", "provincias",
+    "registros_propiedad", "registros_titulares", "roles", "roles_tecnico",
+    "subvenciones_administraciones", "tecnicos", "tipos_certificacion_propiedad", "tipos_documento",
+    "tipos_inmueble", "tipos_mime_documento", "tipos_persona", "tipos_transmision", "tipos_via",
+    "transmision_anunciantes", "transmisiones", "transmisiones_documentos", "transmitentes", "usuarios",
+]
+
+def upgrade():
+    for table in TABLES:
+        op.create_index(f"ix_{table}_created_at_id", table, ["created_at", "id"], if_not_exists=True)
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_created_at_id", table_name=table, if_exists=True)
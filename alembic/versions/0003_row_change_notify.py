@@ -0,0 +1,102 @@
+# alembic/versions/0003_row_change_notify.py
+"""NOTIFY row_changes triggers for inmuebles, their OSM extension and tipos_inmueble
+
+Revision ID: 0003_row_change_notify
+Revises: 0002_keyset_indexes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0003_row_change_notify"
+down_revision = "0002_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+# Un JSON por fila en el canal `row_changes` (ver app/db/changes.py).
+# `old`/`new` son [lon, lat] del punto con que se dibuja el inmueble en los tiles
+# (el de OSM si existe, si no longitud/latitud) para que los suscriptores sepan qué zona invalidar.
+TILE_POINT = """
+    CREATE OR REPLACE FUNCTION inmueble_tile_point(ext geometry, lon double precision, lat double precision)
+    RETURNS json AS $$
+        SELECT json_build_array(ST_X(p), ST_Y(p))
+        FROM (SELECT coalesce(ext, ST_SetSRID(ST_MakePoint(lon, lat), 4326)) AS p) AS punto
+        WHERE p IS NOT NULL
+    $$ LANGUAGE sql STABLE;
+"""
+
+FUNCTIONS = {
+    "notify_inmuebles_change": """
+        PERFORM pg_notify('row_changes', json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP,
+            'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END,
+            'old', CASE WHEN TG_OP <> 'INSERT' THEN inmueble_tile_point(
+                        (SELECT o.geom FROM inmuebles_osm_ext o WHERE o.inmueble_id = OLD.id),
+                        OLD.longitud, OLD.latitud) END,
+            'new', CASE WHEN TG_OP <> 'DELETE' THEN inmueble_tile_point(
+                        (SELECT o.geom FROM inmuebles_osm_ext o WHERE o.inmueble_id = NEW.id),
+                        NEW.longitud, NEW.latitud) END
+        )::text);
+    """,
+    # Sin geometría OSM el inmueble se dibuja en su longitud/latitud: al crear, borrar
+    # o vaciar la extensión también cambia ese tile
+    "notify_inmuebles_osm_ext_change": """
+        PERFORM pg_notify('row_changes', json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP,
+            'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.inmueble_id ELSE NEW.inmueble_id END,
+            'old', (SELECT inmueble_tile_point(CASE WHEN TG_OP <> 'INSERT' THEN OLD.geom END, i.longitud, i.latitud)
+                    FROM (SELECT 1) AS fila LEFT JOIN inmuebles i
+                      ON i.id = CASE WHEN TG_OP = 'INSERT' THEN NEW.inmueble_id ELSE OLD.inmueble_id END),
+            'new', (SELECT inmueble_tile_point(CASE WHEN TG_OP <> 'DELETE' THEN NEW.geom END, i.longitud, i.latitud)
+                    FROM (SELECT 1) AS fila LEFT JOIN inmuebles i
+                      ON i.id = CASE WHEN TG_OP = 'DELETE' THEN OLD.inmueble_id ELSE NEW.inmueble_id END)
+        )::text);
+    """,
+    "notify_tipos_inmueble_change": """
+        PERFORM pg_notify('row_changes', json_build_object(
+            'table', TG_TABLE_NAME, 'op', TG_OP,
+            'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+        )::text);
+    """,
+}
+
+# tabla -> (función, eventos): sólo las columnas que se ven en los tiles
+TRIGGERS = {
+    "inmuebles": (
+        "notify_inmuebles_change",
+        "INSERT OR DELETE OR UPDATE OF latitud, longitud, nombre, es_bic, es_ruina, tipo_inmueble_id, deleted_at",
+    ),
+    "inmuebles_osm_ext": (
+        "notify_inmuebles_osm_ext_change",
+        "INSERT OR DELETE OR UPDATE OF geom, inmueble_id",
+    ),
+    "tipos_inmueble": (
+        "notify_tipos_inmueble_change",
+        "DELETE OR UPDATE OF nombre",
+    ),
+}
+
+def upgrade():
+    op.execute(TILE_POINT)
+    for name, body in FUNCTIONS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+            BEGIN
+                {body}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+    for table, (function, events) in TRIGGERS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_row_changes ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_row_changes
+            AFTER {events} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {function}()
+        """)
+
+def downgrade():
+    for table in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_row_changes ON {table}")
+    for name in FUNCTIONS:
+        op.execute(f"DROP FUNCTION IF EXISTS {name}()")
+    op.execute("DROP FUNCTION IF EXISTS inmueble_tile_point(geometry, double precision, double precision)")
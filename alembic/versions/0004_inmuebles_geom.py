@@ -0,0 +1,30 @@
+# alembic/versions/0004_inmuebles_geom.py
+"""generated geom column on inmuebles with GiST indexes for bbox, radius and KNN
+
+Revision ID: 0004_inmuebles_geom
+Revises: 0003_row_change_notify
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0004_inmuebles_geom"
+down_revision = "0003_row_change_notify"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE inmuebles ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326)
+        GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitud, latitud), 4326)) STORED
+    """)
+    # `&&` (caja) sobre la geometría
+    op.execute("CREATE INDEX IF NOT EXISTS idx_inmuebles_geom ON inmuebles USING gist (geom)")
+    # ST_DWithin en metros y ordenación KNN `<->` sobre geography(geom)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_inmuebles_geography ON inmuebles USING gist (geography(geom))")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_inmuebles_osm_ext_geography ON inmuebles_osm_ext USING gist (geography(geom))")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_inmuebles_osm_ext_geography")
+    op.execute("DROP INDEX IF EXISTS ix_inmuebles_geography")
+    op.execute("DROP INDEX IF EXISTS idx_inmuebles_geom")
+    op.execute("ALTER TABLE inmuebles DROP COLUMN IF EXISTS geom")
@@ -0,0 +1,97 @@
+# alembic/versions/0005_full_text_search.py
+"""accent-insensitive Spanish full-text search: tsvector columns, triggers, GIN and trigram indexes
+
+Revision ID: 0005_full_text_search
+Revises: 0004_inmuebles_geom
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0005_full_text_search"
+down_revision = "0004_inmuebles_geom"
+branch_labels = None
+depends_on = None
+
+CONFIG = "es_unaccent"
+
+# tabla -> (columnas de peso A, columnas de peso B)
+SEARCH_COLUMNS = {
+    "inmuebles": (["nombre"], ["descripcion"]),
+    "inmuebles_osm_ext": (["name"], ["denomination", "historic"]),
+    "citas_historiograficas": ([], ["texto_cita", "notas"]),
+    "fuentes_historiograficas": (["titulo"], ["autor", "descripcion"]),
+    "inmuebles_documentos": ([], ["descripcion"]),
+}
+
+# Búsqueda aproximada de nombres (pg_trgm) sobre el texto sin acentos
+TRIGRAM_COLUMNS = {
+    "inmuebles": "nombre",
+    "inmuebles_osm_ext": "name",
+    "fuentes_historiograficas": "titulo",
+}
+
+def _vector(weight_a, weight_b, row=""):
+    parts = [
+        f"setweight(to_tsvector('{CONFIG}', coalesce({row}{col}::text, '')), '{weight}')"
+        for columns, weight in ((weight_a, "A"), (weight_b, "B"))
+        for col in columns
+    ]
+    return " || ".join(parts)
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Configuración española que además quita acentos antes de aplicar el stemmer
+    op.execute(f"""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{CONFIG}') THEN
+                CREATE TEXT SEARCH CONFIGURATION {CONFIG} (COPY = spanish);
+                ALTER TEXT SEARCH CONFIGURATION {CONFIG}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+            END IF;
+        END $$;
+    """)
+    # unaccent() es STABLE; los índices de expresión necesitan una versión IMMUTABLE
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+        $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """)
+
+    for table, (weight_a, weight_b) in SEARCH_COLUMNS.items():
+        columns = weight_a + weight_b
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {_vector(weight_a, weight_b, "NEW.")};
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_search_vector ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_vector
+            BEFORE INSERT OR UPDATE OF {", ".join(columns)} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()
+        """)
+        # Relleno directo: sin tocar las columnas de origen no se disparan los NOTIFY de 0003
+        op.execute(f"UPDATE {table} SET search_vector = {_vector(weight_a, weight_b)}")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)")
+
+    for table, column in TRIGRAM_COLUMNS.items():
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} "
+            f"USING gin (f_unaccent({column}) gin_trgm_ops)"
+        )
+
+def downgrade():
+    for table, column in TRIGRAM_COLUMNS.items():
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_trgm")
+    for table in SEARCH_COLUMNS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_search_vector ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_search_vector()")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
+    op.execute(f"DROP TEXT SEARCH CONFIGURATION IF EXISTS {CONFIG}")
@@ -0,0 +1,62 @@
+# alembic/versions/0006_suggest_notify.py
+"""NOTIFY row_changes for the geographic and catalog tables behind the typeahead index
+
+Revision ID: 0006_suggest_notify
+Revises: 0005_full_text_search
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0006_suggest_notify"
+down_revision = "0005_full_text_search"
+branch_labels = None
+depends_on = None
+
+EVENTS = "INSERT OR DELETE OR UPDATE OF nombre, deleted_at"
+
+# Tablas de app/graphql/schema/suggest.py (tipos_inmueble ya tenía trigger desde 0003)
+TABLES = [
+    "comunidades_autonomas", "provincias", "localidades", "diocesis",
+    "tipos_via", "tipos_documento", "tipos_persona", "tipos_transmision",
+    "tipos_certificacion_propiedad", "estados_conservacion", "estados_tratamiento",
+    "figuras_proteccion", "roles_tecnico",
+]
+
+def upgrade():
+    # Sólo tabla, operación e id: el índice de sugerencias relee la tabla entera
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_row_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('row_changes', json_build_object(
+                'table', TG_TABLE_NAME, 'op', TG_OP,
+                'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_row_changes ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_row_changes
+            AFTER {EVENTS} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_row_change()
+        """)
+    # Las altas y bajas lógicas de tipos también cambian las sugerencias
+    op.execute("DROP TRIGGER IF EXISTS tipos_inmueble_row_changes ON tipos_inmueble")
+    op.execute(f"""
+        CREATE TRIGGER tipos_inmueble_row_changes
+        AFTER {EVENTS} ON tipos_inmueble
+        FOR EACH ROW EXECUTE FUNCTION notify_tipos_inmueble_change()
+    """)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS tipos_inmueble_row_changes ON tipos_inmueble")
+    op.execute("""
+        CREATE TRIGGER tipos_inmueble_row_changes
+        AFTER DELETE OR UPDATE OF nombre ON tipos_inmueble
+        FOR EACH ROW EXECUTE FUNCTION notify_tipos_inmueble_change()
+    """)
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_row_changes ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_row_change()")
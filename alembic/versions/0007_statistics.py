@@ -0,0 +1,120 @@
+# alembic/versions/0007_statistics.py
+"""summary tables for dashboard statistics: incremental inmueble counts and amount materialized views
+
+Revision ID: 0007_statistics
+Revises: 0006_suggest_notify
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0007_statistics"
+down_revision = "0006_suggest_notify"
+branch_labels = None
+depends_on = None
+
+DIMENSIONS = "comunidad_autonoma_id, provincia_id, diocesis_id, tipo_inmueble_id, es_bic, es_ruina"
+KEY_COLUMNS = """
+    comunidad_autonoma_id varchar(36),
+    provincia_id varchar(36),
+    diocesis_id varchar(36),
+    tipo_inmueble_id varchar(36),
+    es_bic boolean,
+    es_ruina boolean
+"""
+
+# Año de una fecha guardada como texto: el primer grupo de cuatro cifras
+YEAR = "substring({column} from '(\\d{{4}})')::int"
+
+# vista -> (tabla, columna de fecha, columna de importe)
+AMOUNT_VIEWS = {
+    "stats_transmisiones": ("transmisiones", "fecha_transmision", "precio_venta"),
+    "stats_actuaciones": ("actuaciones", "fecha_inicio", "presupuesto"),
+}
+
+def upgrade():
+    # Recuento de inmuebles por combinación de dimensiones
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS stats_inmuebles (
+            {KEY_COLUMNS},
+            n bigint NOT NULL,
+            CONSTRAINT uq_stats_inmuebles UNIQUE NULLS NOT DISTINCT ({DIMENSIONS})
+        )
+    """)
+    # Deltas +1/-1 escritos por el trigger; sólo INSERT, así los escritores no compiten por
+    # la misma fila del resumen. La API los suma al leer y los pliega periódicamente.
+    op.execute(f"CREATE TABLE IF NOT EXISTS stats_inmuebles_delta ({KEY_COLUMNS}, n integer NOT NULL)")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION stats_inmuebles_track() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' AND OLD.deleted_at IS NULL THEN
+                INSERT INTO stats_inmuebles_delta ({DIMENSIONS}, n)
+                VALUES (OLD.comunidad_autonoma_id, OLD.provincia_id, OLD.diocesis_id,
+                        OLD.tipo_inmueble_id, OLD.es_bic, OLD.es_ruina, -1);
+            END IF;
+            IF TG_OP <> 'DELETE' AND NEW.deleted_at IS NULL THEN
+                INSERT INTO stats_inmuebles_delta ({DIMENSIONS}, n)
+                VALUES (NEW.comunidad_autonoma_id, NEW.provincia_id, NEW.diocesis_id,
+                        NEW.tipo_inmueble_id, NEW.es_bic, NEW.es_ruina, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS inmuebles_stats ON inmuebles")
+    op.execute(f"""
+        CREATE TRIGGER inmuebles_stats
+        AFTER INSERT OR DELETE OR UPDATE OF {DIMENSIONS}, deleted_at ON inmuebles
+        FOR EACH ROW EXECUTE FUNCTION stats_inmuebles_track()
+    """)
+    # Pliega los deltas pendientes en el resumen; devuelve cuántos ha consumido
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION stats_inmuebles_fold() RETURNS bigint AS $$
+        DECLARE
+            folded bigint;
+        BEGIN
+            WITH moved AS (
+                DELETE FROM stats_inmuebles_delta RETURNING *
+            ), summed AS (
+                SELECT {DIMENSIONS}, sum(n) AS n, count(*) AS consumed FROM moved GROUP BY {DIMENSIONS}
+            ), merged AS (
+                INSERT INTO stats_inmuebles ({DIMENSIONS}, n)
+                SELECT {DIMENSIONS}, n FROM summed WHERE n <> 0
+                ON CONFLICT ON CONSTRAINT uq_stats_inmuebles
+                DO UPDATE SET n = stats_inmuebles.n + EXCLUDED.n
+            )
+            SELECT coalesce(sum(consumed), 0) INTO folded FROM summed;
+            DELETE FROM stats_inmuebles WHERE n = 0;
+            RETURN folded;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        INSERT INTO stats_inmuebles ({DIMENSIONS}, n)
+        SELECT {DIMENSIONS}, count(*) FROM inmuebles WHERE deleted_at IS NULL GROUP BY {DIMENSIONS}
+    """)
+
+    # Importes por región y año: vistas materializadas con REFRESH CONCURRENTLY programado
+    for view, (table, date_column, amount_column) in AMOUNT_VIEWS.items():
+        op.execute(f"""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS
+            SELECT i.comunidad_autonoma_id, i.provincia_id, {YEAR.format(column="t." + date_column)} AS anio,
+                   count(*) AS n, coalesce(sum(t.{amount_column}), 0) AS total
+            FROM {table} t
+            JOIN inmuebles i ON i.id = t.inmueble_id
+            WHERE t.deleted_at IS NULL AND i.deleted_at IS NULL
+            GROUP BY 1, 2, 3
+        """)
+        # CONCURRENTLY necesita un índice único sobre columnas simples
+        op.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_{view}
+            ON {view} (comunidad_autonoma_id, provincia_id, anio) NULLS NOT DISTINCT
+        """)
+
+def downgrade():
+    for view in AMOUNT_VIEWS:
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
+    op.execute("DROP TRIGGER IF EXISTS inmuebles_stats ON inmuebles")
+    op.execute("DROP FUNCTION IF EXISTS stats_inmuebles_fold()")
+    op.execute("DROP FUNCTION IF EXISTS stats_inmuebles_track()")
+    op.execute("DROP TABLE IF EXISTS stats_inmuebles_delta")
+    op.execute("DROP TABLE IF EXISTS stats_inmuebles")
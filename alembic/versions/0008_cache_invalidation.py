@@ -0,0 +1,47 @@
+# alembic/versions/0008_cache_invalidation.py
+"""statement-level NOTIFY cache_invalidation for the catalog and geography tables
+
+Revision ID: 0008_cache_invalidation
+Revises: 0007_statistics
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0008_cache_invalidation"
+down_revision = "0007_statistics"
+branch_labels = None
+depends_on = None
+
+CHANNEL = "cache_invalidation"
+
+# Deben coincidir con CACHE_TABLES de app/graphql/schema/response_cache.py
+TABLES = [
+    "estados_conservacion", "estados_tratamiento", "figuras_proteccion", "roles_tecnico",
+    "tipos_certificacion_propiedad", "tipos_documento", "tipos_inmueble", "tipos_mime_documento",
+    "tipos_persona", "tipos_transmision", "tipos_via",
+    "comunidades_autonomas", "provincias", "localidades",
+]
+
+def upgrade():
+    # Por sentencia: una carga masiva del ETL produce un solo aviso por tabla,
+    # y NOTIFY descarta los repetidos dentro de la misma transacción
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'op', TG_OP)::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_cache_invalidation ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_cache_invalidation
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation()
+        """)
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_cache_invalidation ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_cache_invalidation()")
@@ -0,0 +1,39 @@
+# alembic/versions/0009_osm_sync_runs.py
+"""osm_sync_runs: one row per OSM sync run with its watermark and counters
+
+Revision ID: 0009_osm_sync_runs
+Revises: 0008_cache_invalidation
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+revision = "0009_osm_sync_runs"
+down_revision = "0008_cache_invalidation"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # status: running | ok | partial | failed. Sólo las ejecuciones `ok` fijan marca de agua:
+    # la siguiente incremental pide a Overpass lo editado después de `watermark`
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS osm_sync_runs (
+            id serial PRIMARY KEY,
+            mode varchar(16) NOT NULL,
+            status varchar(16) NOT NULL DEFAULT 'running',
+            started_at timestamp NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            finished_at timestamp,
+            since timestamp,
+            watermark timestamp,
+            elements integer,
+            inserted integer,
+            updated integer,
+            unchanged integer,
+            tombstoned integer,
+            restored integer,
+            error text
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_osm_sync_runs_status_watermark ON osm_sync_runs (status, watermark DESC)")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS osm_sync_runs")
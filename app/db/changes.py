@@ -0,0 +1,94 @@
+"""
+Bus de cambios de filas sobre LISTEN/NOTIFY de PostgreSQL.
+
+Los triggers de la migración 0003 publican en el canal `row_changes` un JSON
+por fila tocada (`table`, `op`, `id` y, en las tablas con posición, el
+punto con que se dibuja el inmueble antes y después, `old`/`new` como
+`[lon, lat]`). Así cualquier escritor -el ETL
+con sesiones síncronas, las mutaciones GraphQL o un `psql`- llega a los
+suscriptores de la API sin que cada camino de escritura tenga que avisar.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import asyncpg
+
+from app.db.sessions.async_session import DATABASE_URL
+
+CHANNEL = os.getenv("DB_CHANGES_CHANNEL", "row_changes")
+# Un aviso por sentencia y tabla para invalidar la caché de respuestas (migración 0008)
+CACHE_CHANNEL = os.getenv("DB_CACHE_CHANNEL", "cache_invalidation")
+RECONNECT_SECONDS = float(os.getenv("DB_CHANGES_RECONNECT_SECONDS", "5"))
+
+Listener = Callable[[Dict[str, Any]], None]
+
+# ==============================
+# Change Bus
+# ==============================
+
+class ChangeBus:
+    """Una conexión LISTEN por proceso que reparte las notificaciones por tabla"""
+
+    def __init__(self, dsn: str = DATABASE_URL, channel: str = CHANNEL):
+        # asyncpg no entiende el prefijo de dialecto de SQLAlchemy
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://")
+        self.channel = channel
+        self._listeners: Dict[str, List[Listener]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, table: str, listener: Listener):
+        """`listener(payload)` se llama en el bucle de eventos por cada cambio de `table`"""
+        self._listeners[table].append(listener)
+
+    def publish(self, payload: Dict[str, Any]):
+        for listener in self._listeners.get(payload.get("table"), []):
+            try:
+                listener(payload)
+            except Exception as e:
+                print(f"[ChangeBus] Error en el suscriptor de {payload.get('table')}: {e}")
+
+    def _on_notify(self, connection, pid, channel, raw: str):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            print(f"[ChangeBus] Notificación no válida en {channel}: {raw[:200]}")
+            return
+        self.publish(payload)
+
+    async def _listen(self):
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                try:
+                    await connection.add_listener(self.channel, self._on_notify)
+                    # La conexión sólo escucha; se comprueba de vez en cuando que sigue viva
+                    while not connection.is_closed():
+                        await asyncio.sleep(RECONNECT_SECONDS)
+                        await connection.execute("SELECT 1")
+                finally:
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ChangeBus] Conexión LISTEN perdida ({e}); reintentando en {RECONNECT_SECONDS}s")
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self):
+        if self._task is None and self._listeners:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+changes = ChangeBus()
+cache_changes = ChangeBus(channel=CACHE_CHANNEL)
@@ -1,14 +1,15 @@
 # app/db/mixins/__init__.py
 from .base import UUIDPKMixin, AuditMixin
-from .identificacion import TipoIdentificacion, IdentificacionMixin
+from .identificacion import TipoIdentificacion, PersonaFisicaIdentMixin, PersonaJuridicaIdentMixin
 from .contacto import ContactoMixin, ContactoDireccionMixin
-from .direccion import DireccionMixin,
-from titular import TitularidadMixin
+from .direccion import DireccionMixin
+from .titular import TitularidadMixin
 __all__ = [
     'UUIDPKMixin',
     'AuditMixin',
     'TipoIdentificacion',
-    'IdentificacionMixin',
+    'PersonaFisicaIdentMixin',
+    'PersonaJuridicaIdentMixin',
     'ContactoMixin',
     'ContactoDireccionMixin',
     'DireccionMixin',
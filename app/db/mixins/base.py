@@ -1,8 +1,7 @@
-from sqlalchemy import String, DateTime, Boolean
+from sqlalchemy import String, DateTime, Boolean, Column, ForeignKey, Integer, Index
 from datetime import datetime
 import uuid
-from strawberry import Column, ForeignKey, relationship, declared_attr,Integer
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship, declared_attr
 from typing import Optional
 
 class UUIDPKMixin:
@@ -15,6 +14,14 @@ class AuditMixin:
     Tracking de quién y cuándo crea/modifica/elimina registros
     """
     
+    @declared_attr.directive
+    def __table_args__(cls):
+        # (created_at, id) sostiene la paginación por cursor con la ordenación por defecto
+        return (
+            Index(f"ix_{cls.__tablename__}_created_at_id", "created_at", "id"),
+            {'extend_existing': True},
+        )
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = Column(DateTime, onupdate=datetime.utcnow, index=True)
@@ -67,13 +74,25 @@ class AuditMixin:
         """¿Está marcado como eliminado?"""
         return self.deleted_at is not None
     
+    @classmethod
+    def soft_delete_values(cls, deleted_by_id: Optional[int] = None) -> dict:
+        """Valores del soft delete, para aplicarlos en memoria o en un UPDATE"""
+        values = {"deleted_at": datetime.utcnow()}
+        if deleted_by_id:
+            values["deleted_by_id"] = deleted_by_id
+        return values
+
+    @classmethod
+    def restore_values(cls) -> dict:
+        """Valores que deshacen el soft delete"""
+        return {"deleted_at": None, "deleted_by_id": None}
+
     def soft_delete(self, deleted_by_id: Optional[int] = None):
         """Marcar como eliminado (soft delete)"""
-        self.deleted_at = datetime.utcnow()
-        if deleted_by_id:
-            self.deleted_by_id = deleted_by_id
-    
+        for key, value in self.soft_delete_values(deleted_by_id).items():
+            setattr(self, key, value)
+
     def restore(self):
         """Restaurar registro eliminado"""
-        self.deleted_at = None
-        self.deleted_by_id = None
\ No newline at end of file
+        for key, value in self.restore_values().items():
+            setattr(self, key, value)
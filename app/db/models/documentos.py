@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import String, Text, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from app.db.base import Base
 from app.db.mixins import UUIDPKMixin, AuditMixin
 
@@ -30,6 +31,7 @@ class InmuebleDocumento(UUIDPKMixin, AuditMixin, Base):
     tipo_documento_id: Mapped[str] = mapped_column(String(36), ForeignKey("tipos_documento.id"))
     descripcion: Mapped[str | None] = mapped_column(Text, nullable=True)
     fecha_documento: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     
     # Relaciones
     inmueble: Mapped["Inmueble"] = relationship("Inmueble", back_populates="documentos")
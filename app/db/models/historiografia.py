@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import String, Text, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from app.db.base import Base
 from app.db.mixins import UUIDPKMixin, AuditMixin
 
@@ -19,6 +20,7 @@ class FuenteHistoriografica(UUIDPKMixin, AuditMixin, Base):
     anno_publicacion: Mapped[int | None] = mapped_column(Integer, nullable=True)
     isbn: Mapped[str | None] = mapped_column(String(20), nullable=True)
     descripcion: Mapped[str | None] = mapped_column(Text, nullable=True)
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     
     # Relaciones
     citas: Mapped[list["CitaHistoriografica"]] = relationship("CitaHistoriografica", back_populates="fuente")
@@ -31,6 +33,7 @@ class CitaHistoriografica(UUIDPKMixin, AuditMixin, Base):
     paginas: Mapped[str | None] = mapped_column(String(100), nullable=True)
     texto_cita: Mapped[str] = mapped_column(Text)
     notas: Mapped[str | None] = mapped_column(Text, nullable=True)
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     
     # Relaciones
     fuente: Mapped["FuenteHistoriografica"] = relationship("FuenteHistoriografica", back_populates="citas")
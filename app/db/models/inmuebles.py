@@ -3,8 +3,8 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, Float, Boolean, ForeignKey, Integer, DateTime
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import String, Text, Float, Boolean, ForeignKey, Integer, DateTime, Computed
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.mutable import MutableDict
 from geoalchemy2 import Geometry
 from app.db.base import Base
@@ -26,6 +26,12 @@ class Inmueble(UUIDPKMixin, AuditMixin, Base):
     direccion: Mapped[str | None] = mapped_column(Text, nullable=True)
     latitud: Mapped[float | None] = mapped_column(Float, nullable=True)
     longitud: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # Punto generado por la base de datos a partir de longitud/latitud (índice GiST)
+    geom: Mapped[Geometry | None] = mapped_column(
+        Geometry('POINT', srid=4326),
+        Computed("ST_SetSRID(ST_MakePoint(longitud, latitud), 4326)", persisted=True),
+        nullable=True
+    )
     comunidad_autonoma_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("comunidades_autonomas.id"), nullable=True)
     provincia_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("provincias.id"), nullable=True)
     localidad_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("localidades.id"), nullable=True)
@@ -35,6 +41,8 @@ class Inmueble(UUIDPKMixin, AuditMixin, Base):
     estado_tratamiento_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("estados_tratamiento.id"), nullable=True)
     es_bic: Mapped[bool] = mapped_column(Boolean, default=False)
     es_ruina: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Vector de búsqueda mantenido por trigger (migración 0005); no se carga por defecto
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     # Eliminados: esta_inmatriculado e id_inmatriculacion
     
     # Relaciones
@@ -80,6 +88,7 @@ class InmuebleOSMExt(UUIDPKMixin, AuditMixin, Base):
     raw: Mapped[dict | None] = mapped_column(MutableDict.as_mutable(JSONB), nullable=True)
     qa_flags: Mapped[dict | None] = mapped_column(MutableDict.as_mutable(JSONB), nullable=True)
     source_refs: Mapped[dict | None] = mapped_column(MutableDict.as_mutable(JSONB), nullable=True)
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
     
     inmueble: Mapped["Inmueble"] = relationship("Inmueble", back_populates="osm_ext", uselist=False)
   
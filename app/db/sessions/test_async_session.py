@@ -0,0 +1,155 @@
+"""
+Sesión por petición: RequestSessionMiddleware y SerializedSession.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.db.sessions import async_session as sessions
+from app.db.sessions.async_session import RequestSessionMiddleware, SerializedSession
+
+
+class FakeSession:
+    """Anota en `events` cuándo se cierra; execute simula una consulta lenta"""
+
+    def __init__(self, events):
+        self.events = events
+        self.active = 0
+        self.peak = 0
+
+    async def execute(self, statement):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return statement
+
+    def add(self, instance):
+        self.events.append(("add", instance))
+
+    async def close(self):
+        self.events.append("close")
+
+
+@pytest.fixture
+def events(monkeypatch):
+    events = []
+    monkeypatch.setattr(sessions, "async_session", lambda: FakeSession(events))
+    return events
+
+
+def call(app, scope, messages=({"type": "http.request", "body": b""},)):
+    """Ejecuta la app ASGI anotando los mensajes enviados en `events` de la sesión"""
+    sent = []
+    pending = list(messages)
+
+    async def receive():
+        return pending.pop(0) if pending else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message["type"])
+        state = scope.get("state", {}).get("db")
+        if state is not None:
+            state.events.append(message["type"])
+
+    asyncio.run(RequestSessionMiddleware(app)(scope, receive, send))
+    return sent
+
+
+# ----------------------
+# RequestSessionMiddleware
+# ----------------------
+
+def test_session_is_closed_after_the_response_is_sent(events):
+    async def app(scope, receive, send):
+        events.append("handler")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    call(app, {"type": "http"})
+    assert events == ["handler", "http.response.start", "http.response.body", "close"]
+
+
+def test_session_is_closed_when_the_handler_fails(events):
+    async def app(scope, receive, send):
+        raise RuntimeError("fallo")
+
+    with pytest.raises(RuntimeError):
+        call(app, {"type": "http"})
+    assert events == ["close"]
+
+
+def test_session_is_closed_when_the_client_disconnects(events):
+    async def app(scope, receive, send):
+        # Respuesta en streaming: el cliente se va antes de terminar
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    call(app, {"type": "http"}, messages=())
+    assert events == ["http.response.start", "close"]
+
+
+def test_websocket_gets_a_session_and_lifespan_does_not(events):
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope.get("state", {}).get("db"))
+
+    call(app, {"type": "websocket"})
+    call(app, {"type": "lifespan"})
+    assert isinstance(seen[0], FakeSession) and seen[1] is None
+    assert events == ["close"]
+
+
+def test_request_state_db(events):
+    async def endpoint(request):
+        return JSONResponse({"session": type(request.state.db).__name__})
+
+    app = RequestSessionMiddleware(Starlette(routes=[Route("/", endpoint)]))
+    assert TestClient(app).get("/").json() == {"session": "FakeSession"}
+    assert events == ["close"]
+
+
+# ----------------------
+# SerializedSession
+# ----------------------
+
+def test_operations_run_one_at_a_time():
+    session = FakeSession([])
+    db = SerializedSession(session)
+
+    async def run():
+        return await asyncio.gather(*[db.execute(i) for i in range(5)])
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert session.peak == 1
+
+
+def test_non_blocking_methods_pass_through():
+    events = []
+    session = FakeSession(events)
+    db = SerializedSession(session)
+    assert db.add == session.add
+    db.add("fila")
+    assert events == [("add", "fila")]
+
+
+def test_concurrent_resolvers_share_an_async_session():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with AsyncSession(engine) as session:
+                db = SerializedSession(session)
+                results = await asyncio.gather(*[db.execute(text(f"SELECT {i}")) for i in range(10)])
+                return [result.scalar_one() for result in results]
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == list(range(10))
@@ -1,11 +1,81 @@
 # asgi.py
-from strawberry.asgi import GraphQL
-from .schema.schema_main import schema
-from app.db.sessions.async_session import get_async_db
+import time
+_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.routing import Mount, Route
+from .schema.schema_main import schema, MODELS
+from .schema.dataloaders import DataLoaderRegistry
+from .schema.persisted_queries import PersistedQueryGraphQL
+from .metrics import metrics, metrics_endpoint
+from .export import export_route
+from .tiles import tile_endpoint
+from app.db.sessions.async_session import RequestSessionMiddleware, SerializedSession, engine, warm_pool
+from app.db.changes import changes, cache_changes
+from .schema.suggest import suggest_index
+from .schema.clusters import cluster_index
+from .schema.stats import stats_refresher
 
 async def get_context(request):
-    async for db in get_async_db():
-        return {"db": db}
+    # Sesión de RequestSessionMiddleware: se cierra cuando la respuesta ya se ha enviado.
+    # Campos raíz y DataLoaders la usan a la vez, así que sus operaciones van en serie
+    db = SerializedSession(request.state.db)
+    # Los loaders viven lo que dura la petición: caché y lotes por request
+    return {
+        "db": db,
+        "loaders": DataLoaderRegistry(db),
+        # Modo de consulta JSON por petición (ver schema/json_query.py)
+        "json_mode": request.headers.get("x-graphql-mode", "").lower() == "json",
+    }
+
+class SIPIGraphQL(PersistedQueryGraphQL):
+    """strawberry.asgi.GraphQL no usa `context_getter`: el contexto se construye aquí"""
+
+    async def get_context(self, request, response):
+        context = await get_context(request)
+        # Petición y respuesta para las extensiones (p. ej. Cache-Control de las queries persistidas)
+        context.update(request=request, response=response)
+        return context
+
+graphql_app = SIPIGraphQL(schema)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Conexiones abiertas antes de la primera petición
+    try:
+        await warm_pool()
+    except Exception as e:
+        print(f"[DB] Precalentamiento del pool fallido: {e}")
+    # Escucha los NOTIFY de la base de datos (invalidación de tiles y sugerencias)
+    changes.start()
+    # Invalidación de la caché de respuestas entre workers
+    cache_changes.start()
+    # Índices de autocompletado: si la base de datos no responde se cargan en la primera consulta
+    try:
+        await suggest_index.load_all()
+    except Exception as e:
+        print(f"[Suggest] Carga inicial fallida: {e}")
+    # Índice de clusters precalculado, para que la primera vista a zoom bajo no pague su construcción
+    try:
+        await cluster_index.ensure_loaded()
+    except Exception as e:
+        print(f"[Clusters] Carga inicial fallida: {e}")
+    # Pliegue de deltas y refresco de las vistas de estadísticas
+    stats_refresher.start()
+    yield
+    await stats_refresher.stop()
+    await cache_changes.stop()
+    await changes.stop()
+    await engine.dispose()
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/metrics", metrics_endpoint),
+    # Descargas completas en streaming, sin el límite de página de GraphQL
+    Route("/export/{model}", export_route(MODELS)),
+    Route("/tiles/{z:int}/{x:int}/{y:int}.mvt", tile_endpoint),
+    Mount("/", app=RequestSessionMiddleware(graphql_app)),
+])
 
-app = GraphQL(schema)
-app.context_getter = get_context
\ No newline at end of file
+metrics.set_gauge("graphql_startup_seconds", time.perf_counter() - _started,
+                  help="Tiempo desde la importación de la app hasta que está lista")
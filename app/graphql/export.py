@@ -0,0 +1,274 @@
+"""
+Exportación masiva en streaming (NDJSON / CSV / GeoJSON).
+
+`GET /export/<modelo>?format=ndjson|csv|geojson&filters=[...]&where={...}&include=osm_ext,wd_ext`
+
+Las filas salen de un cursor de servidor (`AsyncSession.stream` + `yield_per`)
+y se codifican y comprimen por lotes, de modo que la memoria no crece con el
+tamaño de la tabla. `filters` y `where` son el JSON de `FilterCondition` y
+`FilterGroup`, los mismos que aceptan los listados GraphQL.
+"""
+import csv
+import enum
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+from geoalchemy2 import Geometry
+from sqlalchemy import func, select
+from sqlalchemy.inspection import inspect
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+from app.db.sessions.async_session import async_session
+from app.graphql.metrics import metrics
+from .schema.base_types import FilterCondition, FilterGroup, FilterOperator, LogicalOperator
+from .schema.filter_compiler import FilterCompiler, FilterError
+
+EXPORT_BATCH_SIZE = int(os.getenv("GRAPHQL_EXPORT_BATCH_SIZE", "2000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("GRAPHQL_EXPORT_GZIP_LEVEL", "5"))
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "geojson": "application/geo+json",
+}
+
+# Un campo exportado: (relación o None para el modelo raíz, nombre, expresión SQL)
+ExportField = Tuple[Optional[str], str, Any]
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+# ==============================
+# Exporter
+# ==============================
+
+class Exporter:
+    """Construye la SELECT de exportación de un modelo y la serializa por lotes"""
+
+    def __init__(self, model: Type, fmt: str, include: Optional[List[str]] = None):
+        if fmt not in FORMATS:
+            raise FilterError(f"Formato no soportado: {fmt} (use {', '.join(FORMATS)})")
+        self.model = model
+        self.format = fmt
+        self.mapper = inspect(model)
+        self.filter_compiler = FilterCompiler(model)
+        self.relations = [self._relationship(key) for key in include or []]
+        self.fields: List[ExportField] = self._fields(None, self.mapper)
+        for rel in self.relations:
+            self.fields += self._fields(rel.key, rel.mapper)
+        self.lonlat = self._lonlat()
+
+    def _relationship(self, key: str):
+        rel = self.mapper.relationships.get(key)
+        # Sólo relaciones a uno: una fila exportada por fila del modelo
+        if rel is None or rel.uselist:
+            raise FilterError(f"{self.model.__name__} no tiene una relación a uno '{key}'")
+        return rel
+
+    def _fields(self, prefix: Optional[str], mapper) -> List[ExportField]:
+        fields = []
+        for prop in mapper.column_attrs:
+            # Las columnas diferidas (p. ej. search_vector) no forman parte de la fila
+            if prop.deferred:
+                continue
+            column = prop.columns[0]
+            expr = getattr(mapper.class_, prop.key)
+            if isinstance(column.type, Geometry):
+                # CSV en WKT; NDJSON/GeoJSON como geometría GeoJSON
+                expr = func.ST_AsText(expr) if self.format == "csv" else func.ST_AsGeoJSON(expr)
+            fields.append((prefix, prop.key, expr))
+        return fields
+
+    def _lonlat(self) -> Optional[Tuple[int, int]]:
+        """Posiciones de longitud/latitud del modelo raíz, si no tiene columna de geometría"""
+        names = [name for prefix, name, _ in self.fields if prefix is None]
+        if "longitud" in names and "latitud" in names:
+            return names.index("longitud"), names.index("latitud")
+        return None
+
+    def _geometry_field(self) -> Optional[int]:
+        for i, (prefix, _, expr) in enumerate(self.fields):
+            if prefix is None and getattr(expr, "name", None) == "ST_AsGeoJSON":
+                return i
+        return None
+
+    # ----------------------
+    # Consulta
+    # ----------------------
+    def statement(self, filters: Optional[List[FilterCondition]] = None, group: Optional[FilterGroup] = None):
+        stmt = select(*[expr.label(f"c{i}") for i, (_, _, expr) in enumerate(self.fields)])
+        stmt = stmt.select_from(self.model)
+        for rel in self.relations:
+            stmt = stmt.outerjoin(getattr(self.model, rel.key))
+        return stmt.where(*self.filter_compiler.compile(filters, group))
+
+    # ----------------------
+    # Serialización
+    # ----------------------
+    def _record(self, row) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        nested: Dict[str, Dict[str, Any]] = {rel.key: {} for rel in self.relations}
+        for (prefix, name, expr), value in zip(self.fields, row):
+            if value is not None and getattr(expr, "name", None) == "ST_AsGeoJSON":
+                value = json.loads(value)
+            target = record if prefix is None else nested[prefix]
+            target[name] = _jsonable(value)
+        for key, values in nested.items():
+            # Sin fila relacionada todas sus columnas llegan a NULL
+            record[key] = values if any(v is not None for v in values.values()) else None
+        return record
+
+    def header(self) -> str:
+        if self.format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow([name if prefix is None else f"{prefix}.{name}" for prefix, name, _ in self.fields])
+            return buffer.getvalue()
+        if self.format == "geojson":
+            return '{"type":"FeatureCollection","features":['
+        return ""
+
+    def footer(self) -> str:
+        return "]}\n" if self.format == "geojson" else ""
+
+    def encode(self, rows, first: bool) -> str:
+        """Texto de un lote de filas; `first` indica si es el primero (comas de GeoJSON)"""
+        if self.format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([
+                    json.dumps(v) if isinstance(v, (dict, list)) else _jsonable(v)
+                    for v in row
+                ])
+            return buffer.getvalue()
+        if self.format == "ndjson":
+            return "".join(json.dumps(self._record(row), ensure_ascii=False) + "\n" for row in rows)
+
+        geometry_field = self._geometry_field()
+        features = []
+        for row in rows:
+            properties = self._record(row)
+            geometry = None
+            if geometry_field is not None:
+                geometry = properties.pop(self.fields[geometry_field][1])
+            elif self.lonlat is not None:
+                lon, lat = row[self.lonlat[0]], row[self.lonlat[1]]
+                if lon is not None and lat is not None:
+                    geometry = {"type": "Point", "coordinates": [lon, lat]}
+            feature = {"type": "Feature", "id": properties.get("id"), "geometry": geometry, "properties": properties}
+            features.append(json.dumps(feature, ensure_ascii=False))
+        if not features:
+            return ""
+        return ("" if first else ",") + ",\n".join(features)
+
+    async def stream(self, stmt, gzip: bool) -> AsyncIterator[bytes]:
+        """Recorre el cursor de servidor lote a lote; cada lote sale ya comprimido"""
+        compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+
+        def chunk(text: str, final: bool = False) -> bytes:
+            data = text.encode("utf-8")
+            if compressor is None:
+                return data
+            data = compressor.compress(data)
+            # Z_SYNC_FLUSH: el cliente recibe cada lote sin esperar al final
+            return data + (compressor.flush() if final else compressor.flush(zlib.Z_SYNC_FLUSH))
+
+        total = 0
+        yield chunk(self.header())
+        async with async_session() as session:
+            result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield chunk(self.encode(rows, first=total == 0))
+                total += len(rows)
+        yield chunk(self.footer(), final=True)
+        metrics.inc("graphql_export_rows_total", total, help="Filas servidas por /export",
+                    model=self.model.__name__, format=self.format)
+
+
+# ==============================
+# Parámetros
+# ==============================
+
+def parse_condition(data: Dict[str, Any]) -> FilterCondition:
+    try:
+        return FilterCondition(
+            field=data["field"],
+            operator=FilterOperator(data["operator"]),
+            value=data.get("value"),
+            values=data.get("values"),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise FilterError(f"Condición no válida: {data!r}") from e
+
+
+def parse_group(data: Dict[str, Any]) -> FilterGroup:
+    try:
+        operator = LogicalOperator(data.get("operator", "and"))
+    except ValueError as e:
+        raise FilterError(f"Operador lógico no válido: {data.get('operator')!r}") from e
+    return FilterGroup(
+        operator=operator,
+        conditions=[parse_condition(c) for c in data.get("conditions") or []],
+        groups=[parse_group(g) for g in data.get("groups") or []],
+    )
+
+
+def _json_param(request: Request, name: str) -> Any:
+    raw = request.query_params.get(name)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        raise FilterError(f"'{name}' no es JSON válido") from e
+
+
+# ==============================
+# Ruta
+# ==============================
+
+def export_route(models: List[Type]):
+    """Endpoint ASGI de exportación para los modelos del schema"""
+    by_name = {model.__name__.lower(): model for model in models}
+
+    async def export_endpoint(request: Request):
+        model = by_name.get(request.path_params["model"].lower())
+        if model is None:
+            return JSONResponse({"error": f"Modelo desconocido: {request.path_params['model']}"}, status_code=404)
+        fmt = request.query_params.get("format", "ndjson").lower()
+        try:
+            include = [k for k in request.query_params.get("include", "").split(",") if k]
+            exporter = Exporter(model, fmt, include)
+            filters = _json_param(request, "filters")
+            where = _json_param(request, "where")
+            stmt = exporter.statement(
+                [parse_condition(c) for c in filters or []],
+                parse_group(where) if where else None,
+            )
+        except FilterError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+        headers = {
+            "Content-Disposition": f'attachment; filename="{model.__tablename__}.{fmt}"',
+            "Vary": "Accept-Encoding",
+        }
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(exporter.stream(stmt, gzip), media_type=FORMATS[fmt], headers=headers)
+
+    return export_endpoint
@@ -0,0 +1,65 @@
+"""
+Métricas del proceso en formato de exposición de Prometheus
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# ==============================
+# Registry
+# ==============================
+
+class MetricsRegistry:
+    """Contadores y gauges en memoria; cada worker expone los suyos en /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[LabelSet, float]] = {}
+        self._kinds: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+
+    def _register(self, name: str, kind: str, help: Optional[str]):
+        self._kinds.setdefault(name, kind)
+        if help:
+            self._help.setdefault(name, help)
+        return self._values.setdefault(name, {})
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def set_gauge(self, name: str, value: float, help: Optional[str] = None, **labels):
+        with self._lock:
+            self._register(name, "gauge", help)[self._labels(labels)] = float(value)
+
+    def inc(self, name: str, amount: float = 1.0, help: Optional[str] = None, **labels):
+        with self._lock:
+            series = self._register(name, "counter", help)
+            key = self._labels(labels)
+            series[key] = series.get(key, 0.0) + amount
+
+    def get(self, name: str, **labels) -> Optional[float]:
+        return self._values.get(name, {}).get(self._labels(labels))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(self._values):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._kinds[name]}")
+                for labels, value in self._values[name].items():
+                    label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -3,10 +3,15 @@
 Tipos base y utilidades comunes para GraphQL
 """
 from typing import List, Optional, Callable, Any
+from contextvars import ContextVar
 from enum import Enum
 from functools import wraps
+import strawberry
+from strawberry.scalars import JSON
+from sqlalchemy.orm.exc import StaleDataError
 
 
+@strawberry.enum
 class FilterOperator(str, Enum):
     eq = "eq"
     ne = "ne"
@@ -22,11 +27,12 @@ class FilterOperator(str, Enum):
     between = "between"
 
 
+@strawberry.input
 class FilterCondition:
     field: str
     operator: FilterOperator
-    value: Any = None
-    values: Optional[List[Any]] = None
+    value: Optional[JSON] = None
+    values: Optional[List[JSON]] = None
 
     def __init__(self, field: str, operator: FilterOperator, value: Any = None, values: Optional[List[Any]] = None):
         self.field = field
@@ -35,54 +41,99 @@ class FilterCondition:
         self.values = values
 
 
+@strawberry.enum
+class LogicalOperator(str, Enum):
+    and_ = "and"
+    or_ = "or"
+
+
+@strawberry.input
+class FilterGroup:
+    """Grupo de condiciones combinadas con AND u OR; admite anidamiento"""
+    operator: LogicalOperator = LogicalOperator.and_
+    conditions: Optional[List[FilterCondition]] = None
+    groups: Optional[List["FilterGroup"]] = None
+
+
+@strawberry.enum
 class OrderDirection(str, Enum):
     asc = "asc"
     desc = "desc"
 
 
+@strawberry.input
 class OrderBy:
     field: str
-    direction: OrderDirection
+    direction: OrderDirection = OrderDirection.asc
 
     def __init__(self, field: str, direction: OrderDirection = OrderDirection.asc):
         self.field = field
         self.direction = direction
 
 
+@strawberry.input
 class PaginationInput:
-    page: int
-    page_size: int
+    page: int = 1
+    page_size: int = 20
 
     def __init__(self, page: int = 1, page_size: int = 20):
         self.page = max(1, page)
         self.page_size = clamp_limit(page_size, 20, 100)
 
 
+@strawberry.enum
+class CountMode(str, Enum):
+    exact = "exact"          # COUNT(*) con el mismo predicado que la página
+    estimated = "estimated"  # estimación del planificador / pg_class.reltuples
+
+
+@strawberry.type
 class PageInfo:
     page: int
     page_size: int
     total: int
     total_pages: int
+    total_is_estimate: bool
 
-    def __init__(self, page: int, page_size: int, total: int):
+    def __init__(self, page: int, page_size: int, total: int, total_is_estimate: bool = False):
         self.page = page
         self.page_size = page_size
         self.total = total
         self.total_pages = (total + page_size - 1) // page_size
+        self.total_is_estimate = total_is_estimate
+
+
+@strawberry.type
+class ConnectionPageInfo:
+    """PageInfo al estilo Relay para los listados por cursor"""
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str] = None
+    end_cursor: Optional[str] = None
 
 
 def clamp_limit(value: int, min_value: int, max_value: int) -> int:
     return max(min_value, min(max_value, value))
 
 
+# Errores silenciados durante la operación en curso (la caché de respuestas no guarda esos resultados)
+resolver_errors: ContextVar[Optional[list]] = ContextVar("resolver_errors", default=None)
+
+
 def suppress_traceback_continue(func: Callable):
     """Decorador para que los errores en resolvers no rompan todo el schema"""
     @wraps(func)
     async def wrapper(*args, **kwargs):
         try:
             return await func(*args, **kwargs)
+        except StaleDataError:
+            # Conflicto de concurrencia optimista: el cliente debe recibir el error
+            raise
         except Exception as e:
             print(f"[Resolver Error] {e}")
+            errors = resolver_errors.get()
+            if errors is not None:
+                errors.append(e)
             return None
     return wrapper
 
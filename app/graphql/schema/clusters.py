@@ -0,0 +1,310 @@
+"""
+Agrupación de puntos de inmuebles por zoom (clusters en servidor).
+
+Índice jerárquico en memoria por worker: una rejilla en coordenadas Web
+Mercator normalizadas con `CLUSTER_CELLS_PER_TILE` celdas por lado de tile.
+Cada celda de zoom z es la unión de sus cuatro hijas de z+1, así que el
+índice se construye desde el zoom más fino hacia arriba y un punto que se
+mueve sólo toca una celda por nivel. Cada celda guarda su id representativo
+y cuántas hijas ocupadas tiene, para responder sin bajar por la jerarquía.
+Se construye en el arranque (lifespan de asgi.py); si entonces falla, en
+la primera consulta. Los cambios llegan por el bus de NOTIFY
+(app/db/changes.py) y se aplican releyendo sólo esos inmuebles.
+"""
+import asyncio
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import strawberry
+from sqlalchemy import func, select
+
+from app.db.changes import changes
+from app.db.models import Inmueble, InmuebleOSMExt
+from app.db.sessions.async_session import async_session
+from app.graphql.metrics import metrics
+from .base_types import suppress_traceback_continue
+
+CLUSTER_MAX_ZOOM = int(os.getenv("GRAPHQL_CLUSTER_MAX_ZOOM", "16"))
+# 4 celdas por tile de 256 px: radio de agrupación de ~64 px
+CLUSTER_CELLS_PER_TILE = 4
+CLUSTER_REFRESH_DELAY = 1.0
+
+Cell = Tuple[int, int]
+
+
+@strawberry.input
+class BBoxInput:
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+
+
+@strawberry.type
+class PointCluster:
+    count: int
+    lon: float
+    lat: float
+    representative_id: strawberry.ID
+    # Zoom al que el cluster se divide (None si sus puntos no se separan en la rejilla)
+    expansion_zoom: Optional[int] = None
+
+
+def _project(lon: float, lat: float) -> Tuple[float, float]:
+    lat = max(-85.0511, min(85.0511, lat))
+    return (lon + 180.0) / 360.0, (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0
+
+
+def _unproject(fx: float, fy: float) -> Tuple[float, float]:
+    return fx * 360.0 - 180.0, math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * fy))))
+
+
+# ==============================
+# Cluster Index
+# ==============================
+
+class ClusterIndex:
+    """Rejilla jerárquica: por zoom, celda -> [recuento, suma_x, suma_y, id representativo, hijas ocupadas]"""
+
+    def __init__(self, max_zoom: int = CLUSTER_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self.loaded = False
+        self._reset()
+        self._lock = asyncio.Lock()
+        self._dirty: Set[str] = set()
+        self._refresh_scheduled = False
+
+    def _reset(self):
+        self.levels: List[Dict[Cell, list]] = [{} for _ in range(self.max_zoom + 1)]
+        # Sólo el nivel más fino guarda los ids de cada celda
+        self.members: Dict[Cell, Set[str]] = {}
+        self.points: Dict[str, Tuple[float, float]] = {}
+
+    def _scale(self, zoom: int) -> int:
+        return (2 ** zoom) * CLUSTER_CELLS_PER_TILE
+
+    def _finest_key(self, fx: float, fy: float) -> Cell:
+        scale = self._scale(self.max_zoom)
+        return min(int(fx * scale), scale - 1), min(int(fy * scale), scale - 1)
+
+    @staticmethod
+    def _children(key: Cell) -> List[Cell]:
+        return [(2 * key[0] + dx, 2 * key[1] + dy) for dx in (0, 1) for dy in (0, 1)]
+
+    # ----------------------
+    # Mantenimiento
+    # ----------------------
+    def load(self, rows: Iterable[Tuple[str, float, float]]):
+        """Carga completa: nivel más fino y agregación nivel a nivel hacia arriba"""
+        self._reset()
+        finest = self.levels[self.max_zoom]
+        for id, lon, lat in rows:
+            fx, fy = _project(lon, lat)
+            key = self._finest_key(fx, fy)
+            self.points[id] = (fx, fy)
+            cell = finest.get(key)
+            if cell is None:
+                finest[key] = [1, fx, fy, id, 0]
+                self.members[key] = {id}
+            else:
+                cell[0] += 1
+                cell[1] += fx
+                cell[2] += fy
+                self.members[key].add(id)
+        for zoom in range(self.max_zoom - 1, -1, -1):
+            level, best = self.levels[zoom], {}
+            for (kx, ky), child in self.levels[zoom + 1].items():
+                key = (kx >> 1, ky >> 1)
+                cell = level.get(key)
+                if cell is None:
+                    level[key] = [child[0], child[1], child[2], child[3], 1]
+                    best[key] = child[0]
+                    continue
+                cell[0] += child[0]
+                cell[1] += child[1]
+                cell[2] += child[2]
+                cell[4] += 1
+                # Representante: el de la hija más poblada
+                if child[0] > best[key]:
+                    best[key] = child[0]
+                    cell[3] = child[3]
+
+    def add(self, id: str, lon: float, lat: float):
+        if id in self.points:
+            self.remove(id)
+        fx, fy = _project(lon, lat)
+        kx, ky = self._finest_key(fx, fy)
+        self.points[id] = (fx, fy)
+        self.members.setdefault((kx, ky), set()).add(id)
+        created = False
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (kx >> shift, ky >> shift)
+            cell = self.levels[zoom].get(key)
+            if cell is None:
+                self.levels[zoom][key] = [1, fx, fy, id, 1 if created else 0]
+                created = True
+                continue
+            cell[0] += 1
+            cell[1] += fx
+            cell[2] += fy
+            if created:
+                cell[4] += 1
+            created = False
+
+    def remove(self, id: str):
+        point = self.points.pop(id, None)
+        if point is None:
+            return
+        fx, fy = point
+        kx, ky = self._finest_key(fx, fy)
+        members = self.members[(kx, ky)]
+        members.discard(id)
+        if not members:
+            del self.members[(kx, ky)]
+        deleted = False
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (kx >> shift, ky >> shift)
+            cell = self.levels[zoom][key]
+            cell[0] -= 1
+            if deleted:
+                cell[4] -= 1
+            deleted = cell[0] <= 0
+            if deleted:
+                del self.levels[zoom][key]
+                continue
+            cell[1] -= fx
+            cell[2] -= fy
+            if cell[3] == id:
+                if zoom == self.max_zoom:
+                    cell[3] = next(iter(members))
+                else:
+                    below = self.levels[zoom + 1]
+                    cell[3] = max((below[c][0], below[c][3]) for c in self._children(key) if c in below)[1]
+
+    def _expansion_zoom(self, zoom: int, key: Cell) -> Optional[int]:
+        """Primer zoom en el que el cluster se reparte en más de una celda"""
+        level = self.levels
+        while zoom < self.max_zoom:
+            if level[zoom][key][4] > 1:
+                return zoom + 1
+            key = next(c for c in self._children(key) if c in level[zoom + 1])
+            zoom += 1
+        return None
+
+    # ----------------------
+    # Consulta
+    # ----------------------
+    def query(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float, zoom: int) -> List[PointCluster]:
+        zoom = max(0, min(self.max_zoom, zoom))
+        level = self.levels[zoom]
+        scale = self._scale(zoom)
+        fx0, fy1 = _project(min_lon, min_lat)
+        fx1, fy0 = _project(max_lon, max_lat)
+        x0, x1 = int(fx0 * scale), min(int(fx1 * scale), scale - 1)
+        y0, y1 = int(fy0 * scale), min(int(fy1 * scale), scale - 1)
+
+        # Se recorre lo más pequeño: el rango de celdas de la caja o las celdas ocupadas
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(level):
+            keys: Iterable[Cell] = (
+                (x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in level
+            )
+        else:
+            keys = (k for k in level if x0 <= k[0] <= x1 and y0 <= k[1] <= y1)
+
+        clusters = []
+        for key in keys:
+            count, sx, sy, representative, _ = level[key]
+            lon, lat = _unproject(sx / count, sy / count)
+            clusters.append(PointCluster(
+                count=count, lon=lon, lat=lat, representative_id=representative,
+                expansion_zoom=self._expansion_zoom(zoom, key) if count > 1 else None,
+            ))
+        return clusters
+
+    # ----------------------
+    # Carga desde la base de datos
+    # ----------------------
+    @staticmethod
+    def _points_select():
+        # Mismo punto que los tiles: el de OSM si existe, si no el de longitud/latitud
+        point = func.coalesce(InmuebleOSMExt.geom, Inmueble.geom)
+        return (
+            select(Inmueble.id, func.ST_X(point), func.ST_Y(point))
+            .outerjoin(Inmueble.osm_ext)
+            .where(Inmueble.deleted_at.is_(None), point.isnot(None))
+        )
+
+    async def build(self):
+        started = time.perf_counter()
+        async with async_session() as session:
+            rows = (await session.execute(self._points_select())).all()
+        self.load(rows)
+        self.loaded = True
+        elapsed = time.perf_counter() - started
+        metrics.set_gauge("graphql_cluster_index_build_seconds", elapsed,
+                          help="Tiempo de construcción del índice de clusters")
+        print(f"[Clusters] Índice construido: {len(self.points)} puntos en {elapsed:.3f}s")
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self.build()
+                # Cambios llegados durante la carga
+                if self._dirty:
+                    await self.refresh()
+
+    async def refresh(self):
+        """Relee sólo los inmuebles marcados como cambiados y los mueve en el índice"""
+        ids, self._dirty = list(self._dirty), set()
+        self._refresh_scheduled = False
+        if not self.loaded or not ids:
+            return
+        found = set()
+        async with async_session() as session:
+            for start in range(0, len(ids), 1000):
+                chunk = ids[start:start + 1000]
+                rows = (await session.execute(self._points_select().where(Inmueble.id.in_(chunk)))).all()
+                for id, lon, lat in rows:
+                    self.add(id, lon, lat)
+                    found.add(id)
+        for id in ids:
+            if id not in found:
+                self.remove(id)
+        metrics.inc("graphql_cluster_index_updates_total", len(ids), help="Puntos actualizados en el índice de clusters")
+
+    def on_row_change(self, payload):
+        """Marca el inmueble como cambiado; las ráfagas del ETL se releen juntas"""
+        if payload.get("id") is None:
+            return
+        self._dirty.add(payload["id"])
+        if self.loaded and not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            loop = asyncio.get_running_loop()
+            loop.call_later(CLUSTER_REFRESH_DELAY, lambda: loop.create_task(self.refresh()))
+
+
+cluster_index = ClusterIndex()
+changes.subscribe("inmuebles", cluster_index.on_row_change)
+changes.subscribe("inmuebles_osm_ext", cluster_index.on_row_change)
+
+# ==============================
+# Queries
+# ==============================
+
+class ClusterQueries:
+    """Query `inmuebleClusters(bbox, zoom)` sobre el índice en memoria"""
+
+    @staticmethod
+    def build() -> Dict[str, strawberry.field]:
+        @suppress_traceback_continue
+        async def inmueble_clusters(bbox: BBoxInput, zoom: int) -> Optional[List[PointCluster]]:
+            await cluster_index.ensure_loaded()
+            return cluster_index.query(bbox.min_lon, bbox.min_lat, bbox.max_lon, bbox.max_lat, zoom)
+
+        return {"inmuebleClusters": strawberry.field(resolver=inmueble_clusters)}
@@ -0,0 +1,109 @@
+"""
+Schema generado de prueba: dos modelos relacionados sobre SQLite (aiosqlite) y un ejecutor de queries
+con el mismo contexto que asgi.get_context.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import DateTime, ForeignKey, Integer, String, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from app.db.sessions.async_session import SerializedSession
+from . import crud_generator
+from .dataloaders import DataLoaderRegistry
+from .schema_generator import SchemaGenerator
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Diocesis(Base):
+    __tablename__ = "gql_diocesis"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    templos: Mapped[list["Templo"]] = relationship(back_populates="diocesis")
+
+
+class Templo(Base):
+    __tablename__ = "gql_templos"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    aforo: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    notas: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    diocesis_id: Mapped[int] = mapped_column(ForeignKey("gql_diocesis.id"))
+    diocesis: Mapped[Diocesis] = relationship(back_populates="templos")
+
+    @property
+    def etiqueta(self) -> str:
+        return f"{self.nombre} ({self.aforo})"
+
+
+DIOCESIS = [dict(id=1, nombre="León", created_at=datetime(2026, 1, 1)), dict(id=2, nombre="Astorga", created_at=datetime(2026, 1, 2))]
+# 12 templos: aforo 50, 100, ..., 600; impares en León, pares en Astorga
+TEMPLOS = [
+    dict(id=i, nombre=f"Templo {i}", aforo=50 * i, notas=None if i % 3 else "bic",
+         created_at=datetime(2026, 2, i), diocesis_id=1 if i % 2 else 2)
+    for i in range(1, 13)
+]
+
+schema = SchemaGenerator.generate_schema([Diocesis, Templo])
+
+
+async def seed(connection):
+    await connection.run_sync(Base.metadata.create_all)
+    await connection.execute(Diocesis.__table__.insert(), DIOCESIS)
+    await connection.execute(Templo.__table__.insert(), TEMPLOS)
+
+
+class GraphQLRunner:
+    """Ejecuta queries contra un schema generado; `statements` guarda el SQL emitido"""
+
+    def __init__(self, path, monkeypatch, schema=schema, seed=seed):
+        self.url = f"sqlite+aiosqlite:///{path}"
+        self.monkeypatch = monkeypatch
+        self.schema = schema
+        self.seed = seed
+        self.statements = []
+        self.seeded = False
+
+    async def _run(self, query, variables, json_mode):
+        engine = create_async_engine(self.url)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _connect(dbapi_connection, _):
+            # json_build_object de PostgreSQL para el modo JSON sin relaciones (sin LATERAL en SQLite)
+            dbapi_connection.create_function("json_build_object", -1, lambda *args: json.dumps(dict(zip(args[::2], args[1::2]))))
+
+        if not self.seeded:
+            async with engine.begin() as connection:
+                await self.seed(connection)
+            self.seeded = True
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _record(connection, cursor, statement, *args):
+            self.statements.append(statement)
+
+        # Los recuentos abren su propia sesión, como en producción
+        self.monkeypatch.setattr(crud_generator, "async_session", async_sessionmaker(engine, expire_on_commit=False))
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                db = SerializedSession(session)
+                context = {"db": db, "loaders": DataLoaderRegistry(db), "json_mode": json_mode}
+                return await self.schema.execute(query, variable_values=variables, context_value=context)
+        finally:
+            await engine.dispose()
+
+    def __call__(self, query, variables=None, json_mode=False):
+        self.statements.clear()
+        return asyncio.run(self._run(query, variables, json_mode))
+
+
+@pytest.fixture
+def graphql(tmp_path, monkeypatch):
+    return GraphQLRunner(tmp_path / "test.sqlite", monkeypatch)
@@ -2,14 +2,44 @@
 """
 Generador de operaciones CRUD genéricas para modelos SQLAlchemy
 """
-from typing import Type, Dict, Any, List, Optional
+from typing import Type, Dict, Any, List, Optional, Tuple
+from datetime import datetime
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import Select, UniqueConstraint, column, insert, select, update, delete, func, text, true, values
+from sqlalchemy.inspection import inspect
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.orm import selectinload
 import strawberry
 
+from app.db.sessions.async_session import async_session
 from .type_generator import StrawberryTypeGenerator
+from .keyset import KeysetPaginator
+from .filter_compiler import FilterCompiler
+from .json_query import JsonQueryCompiler
+from .base_types import FilterCondition, FilterGroup
+
+# ==============================
+# EXPLAIN
+# ==============================
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON) <select>` con los parámetros de la SELECT enlazados como en cualquier consulta"""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
 
 # ==============================
 # Generic CRUD
@@ -21,9 +51,14 @@ class GenericCRUD:
     def __init__(self, model: Type):
         self.model = model
         self.model_name = model.__name__
-        self.properties = StrawberryTypeGenerator.generate_strawberry_type(model)._type_definition.fields
+        self.strawberry_type = StrawberryTypeGenerator.generate_strawberry_type(model)
+        self.properties = self.strawberry_type.__strawberry_definition__.fields
         self.input_create = StrawberryTypeGenerator.generate_input_type(model, "create")
         self.input_update = StrawberryTypeGenerator.generate_input_type(model, "update")
+        self.input_upsert = StrawberryTypeGenerator.generate_input_type(model, "upsert")
+        self.pk_key = inspect(model).get_property_by_column(inspect(model).primary_key[0]).key
+        self.filter_compiler = FilterCompiler(model)
+        self.json_compiler = JsonQueryCompiler(model)
 
     # ----------------------
     # CREATE
@@ -38,50 +73,318 @@ class GenericCRUD:
     # ----------------------
     # READ
     # ----------------------
-    async def get_by_id(self, session: AsyncSession, id: Any):
-        stmt = select(self.model).where(self.model.id == id)
+    def _base_select(self, options: Optional[list] = None, statement: Optional[Select] = None) -> Select:
+        """SELECT de partida: el modelo con sus opciones o una SELECT propia sobre su tabla.
+
+        Con `statement` (p. ej. el modo JSON) las lecturas devuelven filas en
+        lugar de instancias del modelo.
+        """
+        if statement is not None:
+            return statement
+        return select(self.model).options(*(options or []))
+
+    @staticmethod
+    def _fetch(result, statement: Optional[Select] = None) -> list:
+        return list(result.all() if statement is not None else result.scalars().all())
+
+    async def get_by_id(self, session: AsyncSession, id: Any, options: Optional[list] = None, statement: Optional[Select] = None):
+        stmt = self._base_select(options, statement).where(self.model.id == id)
         result = await session.execute(stmt)
-        instance = result.scalar_one_or_none()
-        if not instance:
+        rows = self._fetch(result, statement)
+        if not rows:
             raise NoResultFound(f"{self.model_name} with id {id} not found")
-        return instance
+        return rows[0]
+
+    def build_where(self, filters: Optional[List[FilterCondition]] = None, group: Optional[FilterGroup] = None) -> list:
+        """Predicado compartido por el listado y el recuento.
 
-    async def list_all(self, session: AsyncSession, filters: Optional[Dict[str, Any]] = None, offset: int = 0, limit: int = 20):
-        stmt = select(self.model)
-        if filters:
-            for field, value in filters.items():
-                if hasattr(self.model, field):
-                    stmt = stmt.where(getattr(self.model, field) == value)
+        Se compila una sola vez por consulta y se pasa ya construido a
+        `list_*`, `count` y `estimate_count`.
+        """
+        return self.filter_compiler.compile(filters, group)
+
+    async def list_all(self, session: AsyncSession, where: Optional[list] = None, offset: int = 0, limit: int = 20, order_by: Optional[list] = None, options: Optional[list] = None, statement: Optional[Select] = None):
+        stmt = self._base_select(options, statement).where(*(where or []))
+        if order_by:
+            stmt = stmt.order_by(*order_by)
         stmt = stmt.offset(offset).limit(limit)
         result = await session.execute(stmt)
-        return result.scalars().all()
+        return self._fetch(result, statement)
+
+    async def list_keyset(
+        self,
+        session: AsyncSession,
+        paginator: KeysetPaginator,
+        where: Optional[list] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        reverse: bool = False,
+        options: Optional[list] = None,
+        statement: Optional[Select] = None,
+    ):
+        """Página por cursor; devuelve (instancias, hay_más_en_la_dirección_pedida).
+
+        Con `reverse` se recorre hacia atrás desde `cursor` (o desde el final)
+        y las filas se devuelven de nuevo en el orden de avance.
+        """
+        stmt = self._base_select(options, statement).where(*(where or []))
+        if cursor is not None:
+            stmt = stmt.where(paginator.seek_condition(paginator.decode_cursor(cursor), reverse=reverse))
+        # Se pide una fila de más para saber si existe otra página
+        stmt = stmt.order_by(*paginator.order_clauses(reverse=reverse)).limit(limit + 1)
+        result = await session.execute(stmt)
+        items = self._fetch(result, statement)
+        has_more = len(items) > limit
+        items = items[:limit]
+        if reverse:
+            items.reverse()
+        return items, has_more
 
     # ----------------------
-    # UPDATE
+    # COUNT
     # ----------------------
-    async def update(self, session: AsyncSession, id: Any, input_data: Dict[str, Any]):
-        stmt = select(self.model).where(self.model.id == id)
-        result = await session.execute(stmt)
-        instance = result.scalar_one_or_none()
-        if not instance:
-            raise NoResultFound(f"{self.model_name} with id {id} not found")
-        for key, value in input_data.items():
-            if hasattr(instance, key):
-                setattr(instance, key, value)
-        session.add(instance)
-        await session.commit()
-        await session.refresh(instance)
+    async def count(self, where: Optional[list] = None) -> int:
+        """COUNT(*) exacto en su propia conexión, para solaparlo con la página"""
+        stmt = select(func.count()).select_from(self.model).where(*(where or []))
+        async with async_session() as session:
+            result = await session.execute(stmt)
+            return result.scalar_one()
+
+    async def estimate_count(self, where: Optional[list] = None) -> int:
+        """Recuento aproximado sin recorrer la tabla.
+
+        Sin filtros se usa `pg_class.reltuples` (mantenido por ANALYZE/autovacuum);
+        con filtros, las filas que estima el planificador para el mismo predicado.
+        """
+        conditions = list(where or [])
+        async with async_session() as session:
+            if not conditions:
+                result = await session.execute(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+                    {"table": self.model.__table__.fullname},
+                )
+                estimate = result.scalar_one_or_none()
+                # reltuples vale -1 en tablas nunca analizadas
+                if estimate is not None and estimate >= 0:
+                    return int(estimate)
+                return await self.count(conditions)
+
+            stmt = select(true()).select_from(self.model).where(*conditions)
+            # Parámetros enlazados, no literales: geometrías, JSONB o ARRAY no tienen representación literal
+            result = await session.execute(Explain(stmt))
+            plan = result.scalar_one()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+
+    # ----------------------
+    # WRITE (una sentencia con RETURNING)
+    # ----------------------
+    def _target_row(self, stmt, id: Any, expected_updated_at: Optional[datetime] = None):
+        """WHERE por PK y, si se pide, por el `updated_at` leído (control optimista)"""
+        stmt = stmt.where(getattr(self.model, self.pk_key) == id)
+        if expected_updated_at is not None:
+            if "updated_at" not in inspect(self.model).column_attrs:
+                raise ValueError(f"{self.model_name} no tiene updated_at para el control de concurrencia")
+            stmt = stmt.where(self.model.updated_at.is_not_distinct_from(expected_updated_at))
+        return stmt
+
+    async def _raise_missing(self, session: AsyncSession, id: Any, expected_updated_at: Optional[datetime] = None):
+        """Sólo en el camino de fallo: ¿la fila no existe o ha cambiado desde que se leyó?"""
+        exists = await session.scalar(
+            select(func.count()).select_from(self.model).where(getattr(self.model, self.pk_key) == id)
+        )
+        if exists and expected_updated_at is not None:
+            raise StaleDataError(f"{self.model_name} with id {id} was modified concurrently")
+        raise NoResultFound(f"{self.model_name} with id {id} not found")
+
+    async def _write_one(self, session: AsyncSession, stmt, id: Any, expected_updated_at: Optional[datetime] = None):
+        """Ejecuta un UPDATE/DELETE ... RETURNING sobre una fila y confirma"""
+        stmt = self._target_row(stmt, id, expected_updated_at).returning(self.model)
+        try:
+            result = await session.scalars(stmt.execution_options(synchronize_session=False, populate_existing=True))
+            instance = result.one_or_none()
+            if instance is None:
+                await self._raise_missing(session, id, expected_updated_at)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
         return instance
 
+    # ----------------------
+    # UPDATE
+    # ----------------------
+    async def update(self, session: AsyncSession, id: Any, input_data: Dict[str, Any], expected_updated_at: Optional[datetime] = None):
+        values_ = {key: value for key, value in input_data.items() if key != self.pk_key and hasattr(self.model, key)}
+        if not values_:
+            # Nada que escribir, pero un cliente con datos antiguos recibe el mismo conflicto que al escribir
+            result = await session.scalars(self._target_row(select(self.model), id, expected_updated_at))
+            instance = result.one_or_none()
+            if instance is None:
+                await self._raise_missing(session, id, expected_updated_at)
+            return instance
+        return await self._write_one(session, update(self.model).values(values_), id, expected_updated_at)
+
     # ----------------------
     # DELETE
     # ----------------------
-    async def delete(self, session: AsyncSession, id: Any):
-        stmt = select(self.model).where(self.model.id == id)
-        result = await session.execute(stmt)
-        instance = result.scalar_one_or_none()
-        if not instance:
-            raise NoResultFound(f"{self.model_name} with id {id} not found")
-        await session.delete(instance)
-        await session.commit()
-        return instance
+    async def delete(self, session: AsyncSession, id: Any, expected_updated_at: Optional[datetime] = None):
+        return await self._write_one(session, delete(self.model), id, expected_updated_at)
+
+    @property
+    def supports_soft_delete(self) -> bool:
+        return hasattr(self.model, "soft_delete_values")
+
+    async def soft_delete(self, session: AsyncSession, id: Any, expected_updated_at: Optional[datetime] = None, deleted_by_id: Optional[int] = None):
+        if not self.supports_soft_delete:
+            raise ValueError(f"{self.model_name} no admite borrado lógico")
+        stmt = update(self.model).values(self.model.soft_delete_values(deleted_by_id))
+        return await self._write_one(session, stmt, id, expected_updated_at)
+
+    async def restore(self, session: AsyncSession, id: Any, expected_updated_at: Optional[datetime] = None):
+        if not self.supports_soft_delete:
+            raise ValueError(f"{self.model_name} no admite borrado lógico")
+        stmt = update(self.model).values(self.model.restore_values())
+        return await self._write_one(session, stmt, id, expected_updated_at)
+
+    # ----------------------
+    # BATCH
+    # ----------------------
+    @staticmethod
+    def _group_by_keys(rows: List[Dict[str, Any]]) -> List[Tuple[Tuple[str, ...], List[Dict[str, Any]]]]:
+        """Agrupa las filas por el conjunto de campos enviados (una sentencia por grupo)"""
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        return list(groups.items())
+
+    def unique_keys(self) -> List[frozenset]:
+        """Conjuntos de columnas con restricción única (PK, unique, índices únicos)"""
+        table = inspect(self.model).local_table
+        keys = [frozenset(c.name for c in table.primary_key)]
+        keys += [frozenset([c.name]) for c in table.columns if c.unique]
+        keys += [frozenset(c.name for c in index.columns) for index in table.indexes if index.unique]
+        keys += [frozenset(c.name for c in cons.columns) for cons in table.constraints if isinstance(cons, UniqueConstraint)]
+        return keys
+
+    def conflict_target(self, conflict_on: Optional[List[str]] = None) -> List[str]:
+        """Claves de atributo del objetivo de ON CONFLICT; por defecto la PK"""
+        if not conflict_on:
+            return [self.pk_key]
+        keys = [self.filter_compiler.resolve_field(name).key for name in conflict_on]
+        names = frozenset(getattr(self.model, key).property.columns[0].name for key in keys)
+        if names not in self.unique_keys():
+            raise ValueError(f"{self.model_name}: ({', '.join(conflict_on)}) no es una clave única")
+        return keys
+
+    async def create_many(self, session: AsyncSession, rows: List[Dict[str, Any]]) -> list:
+        """INSERT multi-fila con RETURNING, en una transacción"""
+        instances: Dict[int, Any] = {}
+        indexed = {id(row): i for i, row in enumerate(rows)}
+        stmt = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        try:
+            # Filas con los mismos campos van en la misma sentencia; se devuelven en el orden de entrada
+            for _, group in self._group_by_keys(rows):
+                result = await session.scalars(stmt, group)
+                for row, instance in zip(group, result.all()):
+                    instances[indexed[id(row)]] = instance
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return [instances[i] for i in range(len(rows))]
+
+    async def update_many(self, session: AsyncSession, rows: List[Dict[str, Any]]) -> list:
+        """WITH batch AS (VALUES ...) UPDATE ... FROM batch RETURNING, una sentencia por grupo de campos.
+
+        Las filas que sólo traen la PK no cambian nada y se devuelven tal como están.
+        """
+        pk = self.pk_key
+        if any(row.get(pk) is None for row in rows):
+            raise ValueError(f"{self.model_name}: cada elemento necesita '{pk}'")
+        updated: Dict[Any, Any] = {}
+        unchanged = []
+        try:
+            for keys, group in self._group_by_keys(rows):
+                fields = [key for key in keys if key != pk]
+                if not fields:
+                    unchanged.extend(row[pk] for row in group)
+                    continue
+                columns = [pk] + fields
+                data = values(
+                    *[column(key, getattr(self.model, key).property.columns[0].type) for key in columns],
+                    name="batch"
+                ).data([tuple(row[key] for key in columns) for row in group]).cte("batch")
+                stmt = (
+                    update(self.model)
+                    .where(getattr(self.model, pk) == data.c[pk])
+                    .values({key: data.c[key] for key in fields})
+                    .returning(self.model)
+                    .execution_options(synchronize_session=False, populate_existing=True)
+                )
+                for instance in (await session.scalars(stmt)).all():
+                    updated[getattr(instance, pk)] = instance
+            unchanged = [id_ for id_ in unchanged if id_ not in updated]
+            if unchanged:
+                result = await session.scalars(
+                    select(self.model).where(getattr(self.model, pk).in_(unchanged))
+                    .execution_options(populate_existing=True)
+                )
+                for instance in result.all():
+                    updated[getattr(instance, pk)] = instance
+            missing = [row[pk] for row in rows if row[pk] not in updated]
+            if missing:
+                raise NoResultFound(f"{self.model_name} with id {', '.join(map(str, missing))} not found")
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return [updated[row[pk]] for row in rows]
+
+    async def upsert_many(self, session: AsyncSession, rows: List[Dict[str, Any]], conflict_on: Optional[List[str]] = None) -> list:
+        """INSERT ... ON CONFLICT (clave única) DO UPDATE ... RETURNING.
+
+        Devuelve una instancia por elemento, en el orden de entrada.
+        """
+        target = self.conflict_target(conflict_on)
+        protected = {self.pk_key, "created_at", "created_by_id", *target}
+        mapper = inspect(self.model)
+        if any(key not in row for row in rows for key in target):
+            raise ValueError(f"{self.model_name}: upsert necesita {', '.join(target)} en cada elemento")
+        # Una misma sentencia no puede actualizar dos veces la misma fila
+        row_keys = [tuple(row[key] for key in target) for row in rows]
+        duplicated = sorted({key for key in row_keys if row_keys.count(key) > 1}, key=str)
+        if duplicated:
+            raise ValueError(
+                f"{self.model_name}: {', '.join(target)} repetido en el lote: "
+                + ", ".join(str(key[0] if len(key) == 1 else key) for key in duplicated)
+            )
+        by_key: Dict[Tuple, Any] = {}
+        try:
+            for keys, group in self._group_by_keys(rows):
+                stmt = postgresql.insert(self.model).values(group)
+                set_ = {
+                    mapper.columns[key]: stmt.excluded[mapper.columns[key].name]
+                    for key in keys if key not in protected
+                }
+                if set_ and "updated_at" in mapper.column_attrs and "updated_at" not in keys:
+                    # ON CONFLICT no dispara el onupdate del ORM; hora de la base de datos en UTC, como el resto de columnas
+                    set_[mapper.columns["updated_at"]] = func.timezone("utc", func.now())
+                if not set_:
+                    # Actualización neutra para que RETURNING devuelva también las existentes
+                    first = mapper.columns[target[0]]
+                    set_ = {first: stmt.excluded[first.name]}
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[mapper.columns[key] for key in target],
+                    set_=set_
+                ).returning(self.model)
+                result = await session.scalars(stmt.execution_options(populate_existing=True))
+                # RETURNING de un VALUES multi-fila no garantiza el orden: se reindexa por la clave
+                for instance in result.all():
+                    by_key[tuple(getattr(instance, key) for key in target)] = instance
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return [by_key[key] for key in row_keys]
@@ -0,0 +1,107 @@
+"""
+DataLoaders por petición para resolver relaciones SQLAlchemy en lote
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from aiodataloader import DataLoader
+from sqlalchemy import select
+from sqlalchemy.orm import RelationshipProperty, load_only
+
+from app.db.sessions.async_session import SerializedSession
+
+# ==============================
+# Relationship Loader
+# ==============================
+
+class RelationshipLoader(DataLoader):
+    """Carga una relación para muchas instancias padre con un único `IN (...)`"""
+
+    def __init__(self, registry: "DataLoaderRegistry", relationship: RelationshipProperty, columns: Optional[Tuple[str, ...]] = None):
+        super().__init__()
+        self.registry = registry
+        self.relationship = relationship
+        self.columns = columns
+        self.uselist = relationship.uselist
+        self.target = relationship.mapper.class_
+
+        parent_mapper = relationship.parent
+        target_mapper = relationship.mapper
+
+        if relationship.secondary is not None:
+            # Muchos a muchos: la clave del padre se busca en la tabla intermedia
+            local_col, secondary_col = relationship.synchronize_pairs[0]
+            self.local_key = parent_mapper.get_property_by_column(local_col).key
+            self.remote_col = secondary_col
+            self.remote_key = None
+        else:
+            local_col, remote_col = relationship.local_remote_pairs[0]
+            self.local_key = parent_mapper.get_property_by_column(local_col).key
+            self.remote_col = remote_col
+            self.remote_key = target_mapper.get_property_by_column(remote_col).key
+
+    def key_for(self, instance: Any) -> Optional[Any]:
+        """Valor de la instancia padre que se usa como clave del loader"""
+        return getattr(instance, self.local_key, None)
+
+    def build_statement(self, keys: List[Any]):
+        """SELECT único para todas las claves del lote"""
+        if self.relationship.secondary is not None:
+            stmt = (
+                select(self.target, self.remote_col)
+                .join(self.relationship.secondary, self.relationship.secondaryjoin)
+                .where(self.remote_col.in_(keys))
+            )
+        else:
+            stmt = select(self.target).where(self.remote_col.in_(keys))
+        if self.columns is not None:
+            # La clave remota se necesita para repartir las filas entre los padres
+            columns = set(self.columns) | ({self.remote_key} if self.remote_key else set())
+            stmt = stmt.options(load_only(*[getattr(self.target, key) for key in sorted(columns)]))
+        return stmt
+
+    async def batch_load_fn(self, keys: List[Any]) -> List[Any]:
+        stmt = self.build_statement(list(keys))
+        rows = await self.registry.execute(stmt)
+
+        grouped: Dict[Any, List[Any]] = defaultdict(list)
+        if self.relationship.secondary is not None:
+            for instance, key in rows.all():
+                grouped[key].append(instance)
+        else:
+            for instance in rows.scalars().all():
+                grouped[getattr(instance, self.remote_key)].append(instance)
+
+        if self.uselist:
+            return [grouped.get(key, []) for key in keys]
+        return [(grouped.get(key) or [None])[0] for key in keys]
+
+
+# ==============================
+# Registry
+# ==============================
+
+class DataLoaderRegistry:
+    """Loaders de una petición GraphQL; se crean bajo demanda y comparten sesión
+
+    `session` es la SerializedSession del contexto: los lotes de distintas
+    relaciones se despachan en el mismo tick y, como las consultas de los
+    campos raíz, pasan de uno en uno por su candado.
+    """
+
+    def __init__(self, session: SerializedSession):
+        self.session = session
+        self._loaders: Dict[Tuple[Type, str, Optional[Tuple[str, ...]]], RelationshipLoader] = {}
+
+    def for_relationship(self, relationship: RelationshipProperty, columns: Optional[List[str]] = None) -> RelationshipLoader:
+        """Loader de la relación; selecciones con columnas distintas usan loaders distintos"""
+        columns = tuple(columns) if columns is not None else None
+        key = (relationship.parent.class_, relationship.key, columns)
+        loader = self._loaders.get(key)
+        if loader is None:
+            loader = RelationshipLoader(self, relationship, columns)
+            self._loaders[key] = loader
+        return loader
+
+    async def execute(self, stmt):
+        return await self.session.execute(stmt)
@@ -0,0 +1,169 @@
+"""
+Compilación de FilterCondition / FilterGroup / OrderBy a predicados SQL
+"""
+import enum
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Set, Type
+
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint, and_, or_, true
+from sqlalchemy.inspection import inspect
+
+from .base_types import FilterCondition, FilterGroup, FilterOperator, LogicalOperator, OrderBy
+
+# Con el modo estricto sólo se admite filtrar/ordenar por columnas indexadas
+STRICT_FILTERS = os.getenv("GRAPHQL_STRICT_FILTERS", "false").lower() in ("1", "true", "yes")
+
+
+class FilterError(ValueError):
+    """Filtro no válido para el modelo (campo inexistente, no indexado o valor incorrecto)"""
+
+
+# ==============================
+# Filter Compiler
+# ==============================
+
+class FilterCompiler:
+    """Traduce las condiciones GraphQL de un modelo a expresiones SQLAlchemy"""
+
+    def __init__(self, model: Type, strict: Optional[bool] = None):
+        self.model = model
+        self.mapper = inspect(model)
+        self.strict = STRICT_FILTERS if strict is None else strict
+        self._indexed = self._indexed_columns()
+
+    def _indexed_columns(self) -> Set[str]:
+        """Atributos cuya columna encabeza algún índice, PK o restricción única"""
+        table = self.mapper.local_table
+        leading = set()
+        for col in table.columns:
+            if col.primary_key or col.index or col.unique:
+                leading.add(col.name)
+        for index in table.indexes:
+            cols = list(index.columns)
+            if cols:
+                leading.add(cols[0].name)
+        for constraint in table.constraints:
+            # Las claves foráneas no crean índice en PostgreSQL
+            if not isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint)):
+                continue
+            cols = list(constraint.columns)
+            if cols:
+                leading.add(cols[0].name)
+        return {
+            prop.key for prop in self.mapper.column_attrs
+            if any(col.name in leading for col in prop.columns)
+        }
+
+    # ----------------------
+    # Campos
+    # ----------------------
+    def resolve_field(self, field: str):
+        """Admite el nombre Python (snake_case) o el de GraphQL (camelCase)"""
+        key = field if field in self.mapper.column_attrs else re.sub(r"(?<!^)(?=[A-Z])", "_", field).lower()
+        if key not in self.mapper.column_attrs:
+            raise FilterError(f"{self.model.__name__} no tiene el campo '{field}'")
+        if self.strict and key not in self._indexed:
+            raise FilterError(f"El campo '{field}' de {self.model.__name__} no está indexado")
+        return getattr(self.model, key)
+
+    @staticmethod
+    def _coerce(column, value: Any) -> Any:
+        """Convierte valores JSON al tipo Python de la columna"""
+        if value is None:
+            return None
+        try:
+            py_type = column.type.python_type
+        except NotImplementedError:
+            return value
+        try:
+            if isinstance(py_type, type) and issubclass(py_type, enum.Enum):
+                return value if isinstance(value, py_type) else py_type(value)
+            if py_type is datetime and isinstance(value, str):
+                return datetime.fromisoformat(value)
+            if py_type is date and isinstance(value, str):
+                return date.fromisoformat(value)
+            if py_type is bool and not isinstance(value, bool):
+                return str(value).lower() in ("1", "true", "yes")
+            if py_type in (int, float, Decimal) and not isinstance(value, bool):
+                return py_type(value)
+            if py_type is str and not isinstance(value, str):
+                return str(value)
+        except (TypeError, ValueError) as e:
+            raise FilterError(f"Valor no válido para '{column.key}': {value!r}") from e
+        return value
+
+    # ----------------------
+    # Condiciones
+    # ----------------------
+    def compile_condition(self, condition: FilterCondition):
+        column = self.resolve_field(condition.field)
+        op = condition.operator
+        value, values = condition.value, condition.values
+        # Se acepta también la lista en `value` para in / not_in / between
+        if isinstance(value, list):
+            value, values = None, values if values is not None else value
+        if op != FilterOperator.is_null:
+            value = self._coerce(column, value)
+        if values is not None:
+            values = [self._coerce(column, v) for v in values]
+
+        if op == FilterOperator.eq:
+            return column.is_(None) if value is None else column == value
+        if op == FilterOperator.ne:
+            return column.isnot(None) if value is None else column != value
+        if op == FilterOperator.gt:
+            return column > value
+        if op == FilterOperator.gte:
+            return column >= value
+        if op == FilterOperator.lt:
+            return column < value
+        if op == FilterOperator.lte:
+            return column <= value
+        if op in (FilterOperator.like, FilterOperator.ilike):
+            if not isinstance(value, str):
+                raise FilterError(f"'{op.value}' sobre '{condition.field}' necesita un texto")
+            # Sin comodines explícitos se busca por "contiene"
+            pattern = value if "%" in value or "_" in value else f"%{value}%"
+            return column.like(pattern) if op == FilterOperator.like else column.ilike(pattern)
+        if op == FilterOperator.in_:
+            if not values:
+                raise FilterError(f"'in' sobre '{condition.field}' necesita 'values'")
+            return column.in_(values)
+        if op == FilterOperator.not_in:
+            if not values:
+                raise FilterError(f"'not_in' sobre '{condition.field}' necesita 'values'")
+            return column.not_in(values)
+        if op == FilterOperator.is_null:
+            is_null = value is None or str(value).lower() in ("1", "true", "yes")
+            return column.is_(None) if is_null else column.isnot(None)
+        if op == FilterOperator.between:
+            if not values or len(values) != 2:
+                raise FilterError(f"'between' sobre '{condition.field}' necesita exactamente 2 'values'")
+            return column.between(values[0], values[1])
+        raise FilterError(f"Operador no soportado: {op}")
+
+    def compile_group(self, group: FilterGroup):
+        clauses = [self.compile_condition(c) for c in group.conditions or []]
+        clauses += [self.compile_group(g) for g in group.groups or []]
+        if not clauses:
+            return true()
+        return or_(*clauses) if group.operator == LogicalOperator.or_ else and_(*clauses)
+
+    def compile(self, filters: Optional[List[FilterCondition]] = None, group: Optional[FilterGroup] = None) -> list:
+        """Lista de predicados (combinados con AND) para `Select.where(*...)`"""
+        clauses = [self.compile_condition(c) for c in filters or []]
+        if group is not None:
+            clauses.append(self.compile_group(group))
+        return clauses
+
+    # ----------------------
+    # Ordenación
+    # ----------------------
+    def compile_order_by(self, order_by: Optional[List[OrderBy]]) -> Optional[List[OrderBy]]:
+        """Normaliza los campos de ordenación a claves de atributo validadas"""
+        if not order_by:
+            return None
+        return [OrderBy(field=self.resolve_field(o.field).key, direction=o.direction) for o in order_by]
@@ -0,0 +1,206 @@
+"""
+Modo de consulta JSON: una sola sentencia Postgres por lectura anidada
+"""
+import os
+from datetime import date, datetime
+from typing import Any, Iterable, List, Tuple, Type
+
+import strawberry
+from sqlalchemy import JSON, Text, and_, case, cast, func, literal_column, select, true
+from sqlalchemy.dialects.postgresql import JSON as PG_JSON, aggregate_order_by
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import aliased
+from strawberry.schema.types.base_scalars import DateDefinition, DateTimeDefinition
+
+from .projection import SelectionProjector
+
+# Activa el modo JSON para todas las lecturas generadas; por petición
+# también puede pedirse con la cabecera `X-GraphQL-Mode: json`
+JSON_MODE = os.getenv("GRAPHQL_JSON_MODE", "false").lower() in ("1", "true", "yes")
+
+# ==============================
+# Resolución sobre dicts
+# ==============================
+
+def resolve_attribute(obj: Any, name: str) -> Any:
+    """Resolver por defecto: los nodos del modo JSON son dicts, el resto objetos"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name)
+
+
+def _serialize_iso(value: Any) -> str:
+    # Postgres ya entrega las fechas del JSON en ISO 8601
+    return value if isinstance(value, str) else value.isoformat()
+
+
+DateTimeScalar = strawberry.scalar(
+    datetime, name="DateTime", description="Date with time (isoformat)",
+    serialize=_serialize_iso, parse_value=DateTimeDefinition.parse_value,
+)
+DateScalar = strawberry.scalar(
+    date, name="Date", description="Date (isoformat)",
+    serialize=_serialize_iso, parse_value=DateDefinition.parse_value,
+)
+
+SCALAR_OVERRIDES = {datetime: DateTimeScalar, date: DateScalar}
+
+# ==============================
+# JSON Query Compiler
+# ==============================
+
+class JsonQueryCompiler:
+    """Compila una selección GraphQL anidada a un único SELECT que devuelve JSON.
+
+    Cada relación seleccionada se resuelve con una subconsulta LATERAL
+    (`json_agg` para listas, `json_build_object` para objetos), de modo que
+    la respuesta completa sale de Postgres sin hidratar instancias ORM.
+    """
+
+    # json_build_object admite como mucho 100 argumentos
+    MAX_PAIRS = 50
+
+    def __init__(self, model: Type):
+        self.model = model
+        self._aliases = 0
+
+    @staticmethod
+    def enabled(info) -> bool:
+        return JSON_MODE or bool(info.context.get("json_mode"))
+
+    # ----------------------
+    # Soporte
+    # ----------------------
+    @classmethod
+    def supports(cls, model: Type, selections: Iterable[Any]) -> bool:
+        """Sólo columnas y relaciones; las propiedades calculadas exigen el ORM"""
+        mapper = inspect(model)
+        for field in SelectionProjector.flatten(selections):
+            if field.name.startswith("__"):
+                continue
+            name = SelectionProjector.python_name(model, field.name)
+            if name in mapper.relationships:
+                if not cls.supports(mapper.relationships[name].mapper.class_, field.selections):
+                    return False
+            elif name not in mapper.columns and name not in mapper.column_attrs:
+                return False
+        return True
+
+    # ----------------------
+    # SQL
+    # ----------------------
+    def select(self, selections: Iterable[Any], extra: Iterable[str] = ()):
+        """SELECT de `data` (JSON del nodo) más las columnas `extra` etiquetadas.
+
+        La raíz no lleva alias, así que los filtros, la ordenación y las
+        condiciones del cursor del modelo se aplican tal cual.
+        """
+        self._aliases = 0
+        data, laterals = self._object(self.model, self.model, selections)
+        stmt = select(data.label("data"), *[getattr(self.model, key).label(key) for key in extra])
+        stmt = stmt.select_from(self.model)
+        for lateral in laterals:
+            stmt = stmt.outerjoin(lateral, true())
+        return stmt
+
+    def _next_name(self, prefix: str) -> str:
+        self._aliases += 1
+        return f"{prefix}_{self._aliases}"
+
+    @staticmethod
+    def _key(name: str):
+        return literal_column("'" + name.replace("'", "''") + "'")
+
+    @staticmethod
+    def _column_value(entity: Any, prop) -> Any:
+        column = prop.columns[0]
+        value = getattr(entity, prop.key)
+        enum_class = getattr(column.type, "enum_class", None)
+        if enum_class is not None:
+            # Se almacena el nombre del miembro; GraphQL serializa por su valor
+            return case({m.name: m.value for m in enum_class}, value=value)
+        if isinstance(column.type, JSON):
+            return cast(value, Text)
+        return value
+
+    def _build_object(self, pairs: List[Tuple[str, Any]]):
+        chunks = [pairs[i:i + self.MAX_PAIRS] for i in range(0, len(pairs), self.MAX_PAIRS)] or [[]]
+        if len(chunks) == 1:
+            args = [arg for name, value in chunks[0] for arg in (self._key(name), value)]
+            return func.json_build_object(*args, type_=PG_JSON)
+        merged = None
+        for chunk in chunks:
+            part = func.jsonb_build_object(*[arg for name, value in chunk for arg in (self._key(name), value)])
+            merged = part if merged is None else merged.op("||")(part)
+        return cast(merged, PG_JSON)
+
+    def _object(self, entity: Any, model: Type, selections: Iterable[Any]):
+        """(expresión JSON del nodo, laterales que hay que unir a su FROM)"""
+        mapper = inspect(model)
+        pairs: List[Tuple[str, Any]] = []
+        laterals = []
+        seen = set()
+        for field in SelectionProjector.flatten(selections):
+            if field.name.startswith("__"):
+                continue
+            name = SelectionProjector.python_name(model, field.name)
+            if name in seen:
+                continue
+            seen.add(name)
+            if name in mapper.relationships:
+                lateral = self._relationship(entity, mapper.relationships[name], field.selections)
+                laterals.append(lateral)
+                if mapper.relationships[name].uselist:
+                    pairs.append((name, func.coalesce(lateral.c.data, literal_column("'[]'::json"))))
+                else:
+                    pairs.append((name, lateral.c.data))
+                continue
+            column = mapper.columns.get(name)
+            prop = mapper.get_property_by_column(column) if column is not None else mapper.column_attrs[name]
+            # Los campos del tipo Strawberry usan el nombre de la columna
+            pairs.append((prop.columns[0].name, self._column_value(entity, prop)))
+        return self._build_object(pairs), laterals
+
+    def _relationship(self, parent: Any, relationship, selections: Iterable[Any]):
+        target_model = relationship.mapper.class_
+        target = aliased(target_model, name=self._next_name(relationship.key))
+        parent_mapper = relationship.parent
+        target_mapper = relationship.mapper
+
+        data, laterals = self._object(target, target_model, selections)
+
+        if relationship.secondary is not None:
+            secondary = relationship.secondary.alias(self._next_name("sec"))
+            conditions = [
+                getattr(parent, parent_mapper.get_property_by_column(local).key) == secondary.c[remote.name]
+                for local, remote in relationship.synchronize_pairs
+            ]
+            join_on = [
+                getattr(target, target_mapper.get_property_by_column(remote).key) == secondary.c[sec.name]
+                for remote, sec in relationship.secondary_synchronize_pairs
+            ]
+            from_clause = inspect(target).selectable.join(secondary, and_(*join_on))
+        else:
+            conditions = [
+                getattr(target, target_mapper.get_property_by_column(remote).key)
+                == getattr(parent, parent_mapper.get_property_by_column(local).key)
+                for local, remote in relationship.local_remote_pairs
+            ]
+            from_clause = target
+
+        if relationship.uselist:
+            # Orden estable dentro de la lista: (created_at, id) si existe
+            order = [
+                getattr(target, key) for key in ("created_at",) if key in target_mapper.column_attrs
+            ] + [getattr(target, target_mapper.get_property_by_column(col).key) for col in target_mapper.primary_key]
+            stmt = select(func.json_agg(aggregate_order_by(data, *order), type_=PG_JSON).label("data"))
+        else:
+            stmt = select(data.label("data"))
+
+        stmt = stmt.select_from(from_clause)
+        for lateral in laterals:
+            stmt = stmt.outerjoin(lateral, true())
+        stmt = stmt.where(*conditions)
+        if not relationship.uselist:
+            stmt = stmt.limit(1)
+        return stmt.lateral(self._next_name(f"{relationship.key}_json"))
@@ -0,0 +1,160 @@
+"""
+Paginación por cursor (keyset) para los listados generados
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple, Type
+
+from sqlalchemy import and_, false, or_, tuple_
+from sqlalchemy.inspection import inspect
+
+from .base_types import OrderBy, OrderDirection
+
+
+class InvalidCursorError(ValueError):
+    """El cursor no se puede decodificar o no corresponde a la ordenación pedida"""
+
+
+# ==============================
+# Keyset Paginator
+# ==============================
+
+class KeysetPaginator:
+    """Traduce una ordenación a cursores opacos y condiciones `WHERE` de búsqueda.
+
+    El cursor codifica la tupla `(columnas de ordenación..., id)` de la última fila
+    servida; la página siguiente se pide con una comparación de filas que puede
+    resolverse con un índice compuesto, p. ej. `(created_at, id)`.
+    """
+
+    def __init__(self, model: Type, order_by: Optional[List[OrderBy]] = None):
+        self.model = model
+        mapper = inspect(model)
+        pk = mapper.primary_key[0]
+        self.pk_key = mapper.get_property_by_column(pk).key
+
+        # (clave del atributo, columna, descendente)
+        self.keys: List[Tuple[str, Any, bool]] = []
+        pk_desc = None
+        for order in order_by or self.default_order(model):
+            column = self._column(mapper, order.field)
+            if column.key == self.pk_key:
+                # El id es único: lo que venga detrás nunca decide
+                pk_desc = order.direction == OrderDirection.desc
+                break
+            self.keys.append((column.key, column, order.direction == OrderDirection.desc))
+
+        # El id desempata siempre para que la ordenación sea total; si no se pidió, en la dirección de la última clave
+        if pk_desc is None:
+            pk_desc = self.keys[-1][2] if self.keys else False
+        self.keys.append((self.pk_key, getattr(model, self.pk_key), pk_desc))
+
+    @staticmethod
+    def default_order(model: Type) -> List[OrderBy]:
+        if "created_at" in inspect(model).column_attrs:
+            return [OrderBy(field="created_at")]
+        return []
+
+    @staticmethod
+    def _column(mapper, field: str):
+        if field not in mapper.column_attrs:
+            raise ValueError(f"{mapper.class_.__name__} no tiene la columna ordenable '{field}'")
+        return getattr(mapper.class_, field)
+
+    # ----------------------
+    # Cursores
+    # ----------------------
+    @property
+    def signature(self) -> str:
+        return ",".join(f"{key}{'-' if desc else '+'}" for key, _, desc in self.keys)
+
+    @staticmethod
+    def _dump_value(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return {"dt": value.isoformat()}
+        if isinstance(value, date):
+            return {"d": value.isoformat()}
+        if isinstance(value, Decimal):
+            return {"dec": str(value)}
+        return value
+
+    @staticmethod
+    def _load_value(value: Any) -> Any:
+        if isinstance(value, dict):
+            if "dt" in value:
+                return datetime.fromisoformat(value["dt"])
+            if "d" in value:
+                return date.fromisoformat(value["d"])
+            if "dec" in value:
+                return Decimal(value["dec"])
+        return value
+
+    def encode_cursor(self, instance: Any) -> str:
+        payload = {
+            "o": self.signature,
+            "v": [self._dump_value(getattr(instance, key)) for key, _, _ in self.keys],
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+        except (ValueError, TypeError) as e:
+            raise InvalidCursorError(f"Cursor inválido: {cursor}") from e
+        if payload.get("o") != self.signature or len(payload.get("v", [])) != len(self.keys):
+            raise InvalidCursorError("El cursor no corresponde a la ordenación solicitada")
+        return [self._load_value(v) for v in payload["v"]]
+
+    # ----------------------
+    # SQL
+    # ----------------------
+    def order_clauses(self, reverse: bool = False) -> list:
+        """ORDER BY de avance o su inverso exacto para retroceder.
+
+        NULL se trata como el valor máximo (al final en ASC, al principio en
+        DESC), que es el orden por defecto de Postgres: un mismo índice B-tree
+        sirve en ambas direcciones.
+        """
+        return [
+            column.desc().nulls_first() if desc != reverse else column.asc().nulls_last()
+            for _, column, desc in self.keys
+        ]
+
+    def seek_condition(self, values: List[Any], reverse: bool = False):
+        """Condición que selecciona las filas posteriores (o anteriores) al cursor"""
+        directions = {desc != reverse for _, _, desc in self.keys}
+        nullable = any(self._nullable(column) for _, column, _ in self.keys)
+
+        if len(directions) == 1 and not nullable and None not in values:
+            # Caso común: comparación de filas, resoluble con el índice compuesto
+            columns = tuple_(*[column for _, column, _ in self.keys])
+            cursor = tuple_(*values)
+            return columns < cursor if directions.pop() else columns > cursor
+
+        # Direcciones mixtas o columnas con NULL: expansión lexicográfica
+        branches = []
+        for i, (_, column, desc) in enumerate(self.keys):
+            equal_prefix = [self._equals(col, values[j]) for j, (_, col, _) in enumerate(self.keys[:i])]
+            branches.append(and_(*equal_prefix, self._beyond(column, values[i], desc != reverse)))
+        return or_(*branches)
+
+    @staticmethod
+    def _nullable(column) -> bool:
+        return any(col.nullable for col in column.property.columns)
+
+    @staticmethod
+    def _equals(column, value):
+        return column.is_(None) if value is None else column == value
+
+    @staticmethod
+    def _beyond(column, value, descending: bool):
+        # NULL es el mayor valor posible
+        if descending:
+            return column.isnot(None) if value is None else column < value
+        if value is None:
+            return false()
+        return or_(column > value, column.is_(None))
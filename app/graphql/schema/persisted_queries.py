@@ -0,0 +1,141 @@
+"""
+Consultas persistidas automáticas (APQ) y caché de documentos ya validados.
+
+Protocolo de Apollo: el cliente envía
+`extensions: {"persistedQuery": {"version": 1, "sha256Hash": "<hex>"}}` sin
+`query`; si el servidor no conoce el hash responde `PersistedQueryNotFound` y
+el cliente repite la petición con el texto completo, que queda registrado.
+Las queries persistidas pueden ir por GET, y entonces la respuesta lleva
+`Cache-Control` para que la sirvan las cachés HTTP y las CDN.
+
+Con o sin APQ, cada documento parseado y validado se guarda en un LRU por su
+SHA-256: una query repetida no vuelve a pasar por el parser ni por la
+validación.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from graphql import DocumentNode, GraphQLError
+from strawberry.asgi import GraphQL
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from app.graphql.metrics import metrics
+
+APQ_CACHE_SIZE = int(os.getenv("GRAPHQL_APQ_CACHE_SIZE", "2000"))
+# max-age de las respuestas GET de queries persistidas (0: sin Cache-Control)
+APQ_MAX_AGE = int(os.getenv("GRAPHQL_APQ_MAX_AGE", "60"))
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+# ==============================
+# Document Cache
+# ==============================
+
+class DocumentCache:
+    """LRU acotado hash -> (texto, documento); sólo entran documentos que han pasado la validación"""
+
+    def __init__(self, max_entries: int = APQ_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[str, DocumentNode]]" = OrderedDict()
+
+    def get(self, digest: str) -> Optional[Tuple[str, DocumentNode]]:
+        entry = self.entries.get(digest)
+        if entry is not None:
+            self.entries.move_to_end(digest)
+        return entry
+
+    def put(self, digest: str, query: str, document: DocumentNode):
+        self.entries[digest] = (query, document)
+        self.entries.move_to_end(digest)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+document_cache = DocumentCache()
+
+# ==============================
+# Extensión de Strawberry
+# ==============================
+
+class PersistedQueryExtension(SchemaExtension):
+    """Resuelve el hash de APQ y se salta parseo y validación de los documentos conocidos"""
+
+    digest: Optional[str] = None
+    cached = False
+    persisted = False
+
+    def on_operation(self):
+        ctx = self.execution_context
+        persisted = (ctx.operation_extensions or {}).get("persistedQuery")
+        if persisted is not None:
+            if not isinstance(persisted, dict) or persisted.get("version") != 1 or not persisted.get("sha256Hash"):
+                raise GraphQLError("Versión de persistedQuery no soportada",
+                                   extensions={"code": "PERSISTED_QUERY_NOT_SUPPORTED"})
+            self.persisted = True
+
+        if ctx.query:
+            self.digest = query_hash(ctx.query)
+            if self.persisted and persisted["sha256Hash"].lower() != self.digest:
+                raise GraphQLError("El sha256Hash no corresponde a la query enviada",
+                                   extensions={"code": "PERSISTED_QUERY_HASH_MISMATCH"})
+        elif self.persisted:
+            self.digest = persisted["sha256Hash"].lower()
+
+        entry = document_cache.get(self.digest) if self.digest else None
+        if entry is not None:
+            # Documento ya validado: lista de errores vacía para que Strawberry no vuelva a validar
+            ctx.query, ctx.graphql_document = entry
+            ctx.pre_execution_errors = []
+            self.cached = True
+            metrics.inc("graphql_document_cache_hits_total", help="Documentos servidos sin parsear ni validar")
+        elif self.persisted and not ctx.query:
+            metrics.inc("graphql_apq_misses_total", help="Hashes APQ desconocidos (el cliente reenvía el texto)")
+            raise GraphQLError("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+        yield
+
+    def on_validate(self):
+        yield
+        ctx = self.execution_context
+        if not self.cached and self.digest and not ctx.pre_execution_errors and ctx.graphql_document is not None:
+            document_cache.put(self.digest, ctx.query, ctx.graphql_document)
+
+    def on_execute(self):
+        yield
+        ctx = self.execution_context
+        if not self.persisted or APQ_MAX_AGE <= 0 or ctx.operation_type != OperationType.QUERY:
+            return
+        context = ctx.context if isinstance(ctx.context, dict) else {}
+        request, response = context.get("request"), context.get("response")
+        result = ctx.result
+        if request is None or response is None or request.method != "GET" or result is None or result.errors:
+            return
+        response.headers["Cache-Control"] = f"public, max-age={APQ_MAX_AGE}"
+
+
+# ==============================
+# Vista HTTP
+# ==============================
+
+class PersistedQueryGraphQL(GraphQL):
+    """GraphQL ASGI que no confunde un GET de APQ con una visita al IDE
+
+    Un GET con sólo el hash no lleva `query`, y Strawberry sirve GraphiQL a
+    cualquier GET sin `query` cuyo Accept incluya `*/*` (fetch, curl, Apollo
+    Client): sin esto esas peticiones nunca llegan a la caché.
+    """
+
+    def should_render_graphql_ide(self, request) -> bool:
+        try:
+            extensions = json.loads(request.query_params.get("extensions") or "{}")
+        except ValueError:
+            extensions = {}
+        if isinstance(extensions, dict) and "persistedQuery" in extensions:
+            return False
+        return super().should_render_graphql_ide(request)
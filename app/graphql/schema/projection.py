@@ -0,0 +1,142 @@
+"""
+Proyección de columnas a partir de la selección GraphQL
+"""
+import ast
+import inspect as pyinspect
+import re
+import textwrap
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Type
+
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import load_only
+from strawberry.types.nodes import SelectedField
+
+# ==============================
+# Selection Projector
+# ==============================
+
+class SelectionProjector:
+    """Calcula qué columnas hay que leer para servir una selección GraphQL.
+
+    Se cargan las columnas pedidas, las claves locales de las relaciones
+    pedidas (las usan los DataLoaders) y las columnas de las que dependen
+    las propiedades calculadas, obtenidas analizando su código (`self.x`).
+    """
+
+    # (modelo, propiedad) -> atributos usados; None si no se pueden determinar
+    _dependencies: Dict[Tuple[Type, str], Optional[FrozenSet[str]]] = {}
+
+    # ----------------------
+    # Selección
+    # ----------------------
+    @staticmethod
+    def flatten(selections: Iterable[Any]) -> List[SelectedField]:
+        """Campos seleccionados, expandiendo fragmentos"""
+        fields = []
+        for selection in selections or []:
+            if isinstance(selection, SelectedField):
+                fields.append(selection)
+            else:
+                fields.extend(SelectionProjector.flatten(getattr(selection, "selections", [])))
+        return fields
+
+    @classmethod
+    def descend(cls, selections: Iterable[Any], *path: str) -> List[SelectedField]:
+        """Hijos de los campos dados, bajando por `path` (p. ej. "edges", "node")"""
+        fields = cls.flatten([s for f in cls.flatten(selections) for s in f.selections])
+        for name in path:
+            fields = cls.flatten([s for f in fields if f.name == name for s in f.selections])
+        return fields
+
+    @staticmethod
+    def python_name(model: Type, field: str) -> str:
+        """Nombre Python de un campo GraphQL (camelCase -> snake_case)"""
+        if hasattr(model, field) or field in inspect(model).columns:
+            return field
+        return re.sub(r"(?<!^)(?=[A-Z])", "_", field).lower()
+
+    # ----------------------
+    # Dependencias de propiedades
+    # ----------------------
+    @classmethod
+    def attribute_dependencies(cls, model: Type, name: str) -> Optional[FrozenSet[str]]:
+        """Atributos `self.x` que usa una propiedad o método del modelo"""
+        key = (model, name)
+        if key in cls._dependencies:
+            return cls._dependencies[key]
+
+        attr = getattr(model, name, None)
+        func = attr.fget if isinstance(attr, property) else attr
+        deps: Optional[FrozenSet[str]] = None
+        try:
+            tree = ast.parse(textwrap.dedent(pyinspect.getsource(func)))
+        except (OSError, TypeError, SyntaxError):
+            tree = None
+
+        if tree is not None:
+            names: Set[str] = set()
+            dynamic = False
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "self":
+                    names.add(node.attr)
+                # getattr(self, ...) / vars(self): acceso dinámico, no se puede acotar
+                elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                      and node.func.id in ("getattr", "vars") and node.args
+                      and isinstance(node.args[0], ast.Name) and node.args[0].id == "self"):
+                    dynamic = True
+            if not dynamic and not any(n.startswith("__") for n in names):
+                deps = frozenset(names)
+
+        cls._dependencies[key] = deps
+        return deps
+
+    # ----------------------
+    # Columnas
+    # ----------------------
+    @classmethod
+    def columns_for(cls, model: Type, selections: Iterable[Any], extra: Iterable[str] = ()) -> Optional[List[str]]:
+        """Claves de atributo a cargar, o None si hay que cargar la fila entera"""
+        mapper = inspect(model)
+        keys: Set[str] = set(extra)
+
+        def add(name: str, seen: Set[str]) -> bool:
+            if name in seen:
+                return True
+            seen.add(name)
+            if name in mapper.column_attrs:
+                keys.add(name)
+                return True
+            column = mapper.columns.get(name)
+            if column is not None:
+                keys.add(mapper.get_property_by_column(column).key)
+                return True
+            if name in mapper.relationships:
+                for col in mapper.relationships[name].local_columns:
+                    keys.add(mapper.get_property_by_column(col).key)
+                return True
+            attr = pyinspect.getattr_static(model, name, None)
+            if isinstance(attr, property) or pyinspect.isfunction(attr):
+                deps = cls.attribute_dependencies(model, name)
+                if deps is None:
+                    return False
+                return all(add(dep, seen) for dep in deps)
+            # Constantes de clase y similares no requieren columnas
+            return True
+
+        for field in cls.flatten(selections):
+            if field.name.startswith("__"):
+                continue
+            if not add(cls.python_name(model, field.name), set()):
+                return None
+
+        for col in mapper.primary_key:
+            keys.add(mapper.get_property_by_column(col).key)
+        return sorted(keys)
+
+    @classmethod
+    def load_options(cls, model: Type, selections: Iterable[Any], extra: Iterable[str] = ()) -> list:
+        """Opciones `load_only(...)` para `Select.options(*...)`"""
+        keys = cls.columns_for(model, selections, extra)
+        if keys is None:
+            return []
+        return [load_only(*[getattr(model, key) for key in keys])]
@@ -2,11 +2,19 @@
 Construcción de queries y resolvers GraphQL a partir de GenericCRUD
 """
 from typing import List, Optional, Dict, Any, Callable
+import asyncio
 import strawberry
 from strawberry.types import Info
 from .crud_generator import GenericCRUD
 from .type_generator import PropertyResolver, StrawberryTypeGenerator
-from .base_types import FilterCondition, OrderBy, PaginationInput, PageInfo, suppress_traceback_continue
+from .keyset import KeysetPaginator
+from .projection import SelectionProjector
+from .json_query import JsonQueryCompiler
+from .spatial import SpatialCompiler
+from .base_types import (
+    FilterCondition, FilterGroup, OrderBy, PaginationInput, ConnectionPageInfo, CountMode,
+    clamp_limit, suppress_traceback_continue
+)
 
 # ==============================
 # Query Builder
@@ -24,35 +32,186 @@ class QueryBuilder:
 
         # Resolver para obtener uno por ID
         @suppress_traceback_continue
-        async def get_one(info: Info, id: strawberry.ID):
+        async def get_one(info: Info, id: strawberry.ID) -> Optional[crud.strawberry_type]:
             db = info.context["db"]
-            instance = await crud.get_by_id(db, id)
+            selections = SelectionProjector.descend(info.selected_fields)
+            if JsonQueryCompiler.enabled(info) and JsonQueryCompiler.supports(crud.model, selections):
+                # Modo JSON: el nodo entero (con sus relaciones) sale de una sola sentencia
+                row = await crud.get_by_id(db, id, statement=crud.json_compiler.select(selections))
+                return row.data
+            # Sólo las columnas que pide la selección (y las que necesitan sus propiedades)
+            options = SelectionProjector.load_options(crud.model, selections)
+            instance = await crud.get_by_id(db, id, options)
             return await StrawberryTypeGenerator._convert_to_strawberry(instance)
 
-        # Resolver para obtener lista
+        connection_type = StrawberryTypeGenerator.generate_connection_type(crud.model)
+
+        async def list_connection(
+            info: Info,
+            conditions: list,
+            order_by: Optional[List[OrderBy]],
+            first: Optional[int],
+            after: Optional[str],
+            last: Optional[int],
+            before: Optional[str],
+            pagination: Optional[PaginationInput],
+            count: CountMode
+        ):
+            """Conexión paginada para un predicado ya compilado (listado y consultas espaciales)"""
+            db = info.context["db"]
+            paginator = KeysetPaginator(crud.model, crud.filter_compiler.compile_order_by(order_by))
+            selections = SelectionProjector.descend(info.selected_fields, "edges", "node")
+            cursor_keys = [key for key, _, _ in paginator.keys]
+            statement = None
+            if JsonQueryCompiler.enabled(info) and JsonQueryCompiler.supports(crud.model, selections):
+                # Modo JSON: filas (data, claves del cursor) en lugar de instancias ORM
+                statement = crud.json_compiler.select(selections, extra=cursor_keys)
+            # Columnas de los nodos pedidos más las claves del cursor
+            options = SelectionProjector.load_options(crud.model, selections, extra=cursor_keys)
+
+            # El total se calcula en otra conexión mientras se lee la página
+            if count == CountMode.estimated:
+                total_task = crud.estimate_count(conditions)
+            else:
+                total_task = crud.count(conditions)
+
+            if pagination is not None:
+                # Paginación numérica (OFFSET) para el paginador clásico del frontend
+                offset = (pagination.page - 1) * pagination.page_size
+                items, total = await asyncio.gather(
+                    crud.list_all(db, conditions, offset, pagination.page_size, paginator.order_clauses(), options, statement),
+                    total_task
+                )
+                has_next = offset + len(items) < total
+                has_previous = pagination.page > 1
+            else:
+                backward = before is not None or (last is not None and first is None)
+                limit = clamp_limit((last if backward else first) or 20, 1, 100)
+                (items, has_more), total = await asyncio.gather(
+                    crud.list_keyset(db, paginator, conditions, limit,
+                                     cursor=before if backward else after, reverse=backward,
+                                     options=options, statement=statement),
+                    total_task
+                )
+                has_next = before is not None if backward else has_more
+                has_previous = has_more if backward else after is not None
+
+            edges = [
+                connection_type.edge_type(
+                    cursor=paginator.encode_cursor(item),
+                    node=item.data if statement is not None else await StrawberryTypeGenerator._convert_to_strawberry(item)
+                )
+                for item in items
+            ]
+            return connection_type(
+                edges=edges,
+                page_info=ConnectionPageInfo(
+                    has_next_page=has_next,
+                    has_previous_page=has_previous,
+                    start_cursor=edges[0].cursor if edges else None,
+                    end_cursor=edges[-1].cursor if edges else None
+                ),
+                total_count=total,
+                total_is_estimate=count == CountMode.estimated
+            )
+
+        # Resolver para obtener lista (conexión Relay paginada por cursor)
         @suppress_traceback_continue
         async def get_many(
             info: Info,
             filters: Optional[List[FilterCondition]] = None,
+            where: Optional[FilterGroup] = None,
             order_by: Optional[List[OrderBy]] = None,
-            pagination: Optional[PaginationInput] = None
-        ):
-            db = info.context["db"]
-            offset = pagination.page * pagination.page_size if pagination else 0
-            limit = pagination.page_size if pagination else 20
-            filter_dict = {f.field: f.value for f in filters} if filters else {}
-            items = await crud.list_all(db, filter_dict, offset, limit)
-            return {
-                "items": [await StrawberryTypeGenerator._convert_to_strawberry(item) for item in items],
-                "page_info": PageInfo(
-                    total=len(items),
-                    page=pagination.page if pagination else 1,
-                    page_size=pagination.page_size if pagination else 20
-                )
-            }
+            first: Optional[int] = None,
+            after: Optional[str] = None,
+            last: Optional[int] = None,
+            before: Optional[str] = None,
+            pagination: Optional[PaginationInput] = None,
+            count: CountMode = CountMode.exact
+        ) -> Optional[connection_type]:
+            # Mismo predicado compilado para la página y para el total
+            conditions = crud.build_where(filters, where)
+            return await list_connection(info, conditions, order_by, first, after, last, before, pagination, count)
 
         queries[f"{name_prefix}"] = strawberry.field(resolver=get_one)
         queries[f"{name_prefix}s"] = strawberry.field(resolver=get_many)
 
+        if SpatialCompiler.geometry_column(crud.model) is not None:
+            queries.update(QueryBuilder.build_spatial_queries(crud, name_prefix, list_connection))
+
         return queries
 
+    @staticmethod
+    def build_spatial_queries(crud: GenericCRUD, name_prefix: str, list_connection: Callable) -> Dict[str, strawberry.field]:
+        """Caja, radio y k vecinos más próximos; se combinan con `filters`/`where`"""
+        spatial = SpatialCompiler(crud.model)
+        connection_type = StrawberryTypeGenerator.generate_connection_type(crud.model)
+        queries = {}
+
+        @suppress_traceback_continue
+        async def in_bbox(
+            info: Info,
+            min_lon: float,
+            min_lat: float,
+            max_lon: float,
+            max_lat: float,
+            filters: Optional[List[FilterCondition]] = None,
+            where: Optional[FilterGroup] = None,
+            order_by: Optional[List[OrderBy]] = None,
+            first: Optional[int] = None,
+            after: Optional[str] = None,
+            last: Optional[int] = None,
+            before: Optional[str] = None,
+            pagination: Optional[PaginationInput] = None,
+            count: CountMode = CountMode.exact
+        ) -> Optional[connection_type]:
+            conditions = crud.build_where(filters, where) + [spatial.in_bbox(min_lon, min_lat, max_lon, max_lat)]
+            return await list_connection(info, conditions, order_by, first, after, last, before, pagination, count)
+
+        @suppress_traceback_continue
+        async def within_radius(
+            info: Info,
+            lon: float,
+            lat: float,
+            meters: float,
+            filters: Optional[List[FilterCondition]] = None,
+            where: Optional[FilterGroup] = None,
+            order_by: Optional[List[OrderBy]] = None,
+            first: Optional[int] = None,
+            after: Optional[str] = None,
+            last: Optional[int] = None,
+            before: Optional[str] = None,
+            pagination: Optional[PaginationInput] = None,
+            count: CountMode = CountMode.exact
+        ) -> Optional[connection_type]:
+            conditions = crud.build_where(filters, where) + [spatial.within_radius(lon, lat, meters)]
+            return await list_connection(info, conditions, order_by, first, after, last, before, pagination, count)
+
+        @suppress_traceback_continue
+        async def nearest(
+            info: Info,
+            lon: float,
+            lat: float,
+            k: int = 10,
+            filters: Optional[List[FilterCondition]] = None,
+            where: Optional[FilterGroup] = None
+        ) -> Optional[List[crud.strawberry_type]]:
+            db = info.context["db"]
+            # ORDER BY geography(geom) <-> punto LIMIT k: recorrido KNN del índice GiST
+            conditions = crud.build_where(filters, where) + [spatial.not_null()]
+            selections = SelectionProjector.descend(info.selected_fields)
+            statement = None
+            if JsonQueryCompiler.enabled(info) and JsonQueryCompiler.supports(crud.model, selections):
+                statement = crud.json_compiler.select(selections)
+            options = SelectionProjector.load_options(crud.model, selections)
+            items = await crud.list_all(
+                db, conditions, 0, clamp_limit(k, 1, 100), [spatial.distance_order(lon, lat)], options, statement
+            )
+            if statement is not None:
+                return [item.data for item in items]
+            return [await StrawberryTypeGenerator._convert_to_strawberry(item) for item in items]
+
+        queries[f"{name_prefix}sInBBox"] = strawberry.field(resolver=in_bbox)
+        queries[f"{name_prefix}sWithinRadius"] = strawberry.field(resolver=within_radius)
+        queries[f"{name_prefix}sNearest"] = strawberry.field(resolver=nearest)
+        return queries
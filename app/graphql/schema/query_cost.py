@@ -0,0 +1,192 @@
+"""
+Análisis estático de coste y profundidad de las operaciones GraphQL.
+
+Antes de ejecutar se recorre el documento con el schema y los metadatos de
+los modelos y se estima cuántos objetos va a resolver la operación:
+
+- columnas: 0; propiedades y métodos del modelo: 1 (código arbitrario);
+- objeto (relación a uno, nodo): 1 por cada vez que se resuelve;
+- listas: multiplican su subárbol por `first`/`last`/`k`/`limit` o
+  `pagination.pageSize`; las relaciones a muchos (sin paginar) por
+  `GRAPHQL_COST_LIST_SIZE`;
+- cada conexión suma además su consulta de `totalCount`.
+
+`<X>Connection` y `<X>Edge` son envoltorios: no añaden profundidad ni
+multiplican. Si la operación supera `GRAPHQL_MAX_DEPTH` o `GRAPHQL_MAX_COST`
+se rechaza sin tocar la base de datos; el coste va en
+`extensions.cost` de la respuesta.
+"""
+import os
+from typing import Any, Dict, Optional, Tuple, Type
+
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode,
+    OperationDefinitionNode, OperationType as GraphQLOperationType, get_named_type, is_list_type,
+    get_nullable_type, value_from_ast_untyped
+)
+from sqlalchemy.inspection import inspect
+from strawberry.extensions import SchemaExtension
+
+from app.graphql.metrics import metrics
+from .type_generator import PropertyDetector, StrawberryTypeGenerator
+
+QUERY_MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "8"))
+QUERY_MAX_COST = int(os.getenv("GRAPHQL_MAX_COST", "5000"))
+# Elementos supuestos para una relación a muchos, que se devuelve entera
+QUERY_LIST_SIZE = int(os.getenv("GRAPHQL_COST_LIST_SIZE", "10"))
+# Página por defecto de los listados sin `first`/`last` (ver QueryBuilder.list_connection)
+DEFAULT_PAGE_SIZE = 20
+
+PAGE_ARGUMENTS = ("first", "last", "k", "limit")
+WRAPPER_SUFFIXES = ("Connection", "Edge")
+
+
+class QueryCostError(GraphQLError):
+    pass
+
+
+# ==============================
+# Query Cost Analyzer
+# ==============================
+
+class QueryCostAnalyzer:
+    """Coste y profundidad de una operación ya validada"""
+
+    _models_by_type: Optional[Dict[str, Type]] = None
+
+    def __init__(self, schema, document, variables: Optional[Dict[str, Any]] = None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments: Dict[str, FragmentDefinitionNode] = {
+            d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)
+        }
+
+    @classmethod
+    def model_for(cls, type_name: str) -> Optional[Type]:
+        if cls._models_by_type is None:
+            cls._models_by_type = {t.__name__: m for m, t in StrawberryTypeGenerator._types.items()}
+        return cls._models_by_type.get(type_name)
+
+    @staticmethod
+    def operation(document, operation_name: Optional[str]) -> Optional[OperationDefinitionNode]:
+        operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+        if operation_name:
+            return next((op for op in operations if op.name and op.name.value == operation_name), None)
+        return operations[0] if len(operations) == 1 else None
+
+    def analyze(self, operation: OperationDefinitionNode) -> Tuple[int, int]:
+        root = {
+            GraphQLOperationType.QUERY: self.schema.query_type,
+            GraphQLOperationType.MUTATION: self.schema.mutation_type,
+            GraphQLOperationType.SUBSCRIPTION: self.schema.subscription_type,
+        }[operation.operation]
+        return self._selection_cost(operation.selection_set, root, 0)
+
+    def _fields(self, selection_set, parent_type):
+        """Campos de una selección con el tipo en el que se resuelven, desplegando fragmentos"""
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection, parent_type
+            elif isinstance(selection, InlineFragmentNode):
+                condition = selection.type_condition
+                target = self.schema.get_type(condition.name.value) if condition else parent_type
+                yield from self._fields(selection.selection_set, target)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    target = self.schema.get_type(fragment.type_condition.name.value)
+                    yield from self._fields(fragment.selection_set, target)
+
+    def _arguments(self, node: FieldNode) -> Dict[str, Any]:
+        return {arg.name.value: value_from_ast_untyped(arg.value, self.variables) for arg in node.arguments or []}
+
+    def _page_size(self, node: FieldNode) -> Optional[int]:
+        args = self._arguments(node)
+        for name in PAGE_ARGUMENTS:
+            if isinstance(args.get(name), int):
+                return max(0, args[name])
+        pagination = args.get("pagination")
+        if isinstance(pagination, dict) and isinstance(pagination.get("pageSize"), int):
+            return max(0, pagination["pageSize"])
+        return None
+
+    def _selection_cost(self, selection_set, parent_type, depth: int) -> Tuple[int, int]:
+        cost, max_depth = 0, depth
+        wrapper = parent_type.name.endswith(WRAPPER_SUFFIXES)
+        model = self.model_for(parent_type.name)
+        for node, owner in self._fields(selection_set, parent_type):
+            name = node.name.value
+            field_def = getattr(owner, "fields", {}).get(name)
+            if name.startswith("__") or field_def is None:
+                continue
+            definition = field_def.extensions.get("strawberry-definition")
+            python_name = getattr(definition, "python_name", name)
+
+            if node.selection_set is None:
+                # Escalares: sólo cuestan las propiedades/métodos del modelo
+                if model is not None and python_name in PropertyDetector.get_model_properties(model):
+                    cost += 1
+                continue
+
+            named = get_named_type(field_def.type)
+            if wrapper:
+                child_cost, child_depth = self._selection_cost(node.selection_set, named, depth)
+                cost += child_cost
+                max_depth = max(max_depth, child_depth)
+                continue
+
+            child_cost, child_depth = self._selection_cost(node.selection_set, named, depth + 1)
+            max_depth = max(max_depth, child_depth)
+            relationship = inspect(model).relationships.get(python_name) if model is not None else None
+            page_size = self._page_size(node)
+            if named.name.endswith("Connection"):
+                # Página de nodos más la consulta del total
+                cost += 1 + (page_size if page_size is not None else DEFAULT_PAGE_SIZE) * (1 + child_cost)
+            elif page_size is not None:
+                cost += page_size * (1 + child_cost)
+            elif relationship is not None and relationship.uselist:
+                cost += QUERY_LIST_SIZE * (1 + child_cost)
+            elif is_list_type(get_nullable_type(field_def.type)):
+                cost += DEFAULT_PAGE_SIZE * (1 + child_cost)
+            else:
+                cost += 1 + child_cost
+        return cost, max_depth
+
+
+# ==============================
+# Extensión de Strawberry
+# ==============================
+
+class QueryCostExtension(SchemaExtension):
+    """Rechaza antes de ejecutar las operaciones demasiado profundas o costosas"""
+
+    cost: Optional[int] = None
+    depth: Optional[int] = None
+
+    def on_execute(self):
+        ctx = self.execution_context
+        operation = QueryCostAnalyzer.operation(ctx.graphql_document, ctx.operation_name)
+        if operation is not None:
+            analyzer = QueryCostAnalyzer(ctx.schema._schema, ctx.graphql_document, ctx.variables)
+            self.cost, self.depth = analyzer.analyze(operation)
+            if self.depth > QUERY_MAX_DEPTH:
+                metrics.inc("graphql_rejected_operations_total", help="Operaciones rechazadas por coste o profundidad",
+                            reason="depth")
+                raise QueryCostError(
+                    f"La operación tiene profundidad {self.depth} y el máximo es {QUERY_MAX_DEPTH}",
+                    extensions={"code": "QUERY_TOO_DEEP", "depth": self.depth, "maxDepth": QUERY_MAX_DEPTH}
+                )
+            if self.cost > QUERY_MAX_COST:
+                metrics.inc("graphql_rejected_operations_total", help="Operaciones rechazadas por coste o profundidad",
+                            reason="cost")
+                raise QueryCostError(
+                    f"Coste estimado {self.cost} por encima del máximo {QUERY_MAX_COST}; "
+                    f"reduzca `first`/`pageSize` o la anidación",
+                    extensions={"code": "QUERY_TOO_COMPLEX", "cost": self.cost, "maxCost": QUERY_MAX_COST}
+                )
+        yield
+
+    def get_results(self) -> Dict[str, Any]:
+        if self.cost is None:
+            return {}
+        return {"cost": {"requested": self.cost, "maximum": QUERY_MAX_COST, "depth": self.depth}}
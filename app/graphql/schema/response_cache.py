@@ -0,0 +1,189 @@
+"""
+Caché de respuestas GraphQL por proceso para consultas de catálogos y geografía.
+
+La clave es el documento normalizado (`print_ast`) más variables, nombre de
+operación y modo JSON. Mientras se ejecuta una query se anotan las tablas que
+leen sus sentencias (evento `do_orm_execute` de la sesión); sólo se guarda si
+todas están en `CACHE_TABLES`, y la entrada queda etiquetada con ellas.
+
+Invalidación por etiqueta:
+- las mutaciones generadas invalidan su tabla en el propio worker al terminar;
+- los triggers por sentencia de la migración 0008 publican en el canal
+  `cache_invalidation`, que escucha cada worker (`cache_changes`), de modo que
+  las escrituras de otros workers y del ETL también llegan.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional, Set
+
+from graphql import ExecutionResult, print_ast
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.util import find_tables
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from app.db.changes import cache_changes
+from app.graphql.metrics import metrics
+from .base_types import resolver_errors
+
+RESPONSE_CACHE_SIZE = int(os.getenv("GRAPHQL_RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("GRAPHQL_RESPONSE_CACHE_TTL", "300"))
+
+# Tablas de lectura casi exclusiva: catálogos y geografía
+CACHE_TABLES = set(filter(None, os.getenv(
+    "GRAPHQL_RESPONSE_CACHE_TABLES",
+    "estados_conservacion,estados_tratamiento,figuras_proteccion,roles_tecnico,"
+    "tipos_certificacion_propiedad,tipos_documento,tipos_inmueble,tipos_mime_documento,"
+    "tipos_persona,tipos_transmision,tipos_via,comunidades_autonomas,provincias,localidades"
+).split(",")))
+
+# Marca de "tablas desconocidas" (SQL textual, escrituras): la respuesta no se guarda
+UNKNOWN = "*"
+
+# Tablas leídas por la operación en curso; None fuera de una query cacheable
+_tables_read: ContextVar[Optional[Set[str]]] = ContextVar("tables_read", default=None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_tables(orm_execute_state):
+    tables = _tables_read.get()
+    if tables is None:
+        return
+    statement = orm_execute_state.statement
+    if not isinstance(statement, Select):
+        tables.add(UNKNOWN)
+        return
+    for table in find_tables(statement, include_aliases=True, include_joins=True):
+        tables.add(getattr(table, "name", None) or UNKNOWN)
+
+
+# ==============================
+# Response Cache
+# ==============================
+
+class ResponseCache:
+    """LRU con TTL de `data` por clave, con índice inverso etiqueta -> claves"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.tags: Dict[str, Set[str]] = {}
+        # Se incrementa en cada invalidación: lo calculado antes no se guarda
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(document, variables: Optional[Dict[str, Any]], operation_name: Optional[str], json_mode: bool) -> str:
+        raw = json.dumps(
+            [print_ast(document), variables or {}, operation_name, json_mode],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        data, tags, expires = entry
+        if expires < time.monotonic():
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: Dict[str, Any], tags: Iterable[str], generation: int):
+        if generation != self.generation:
+            return
+        tags = frozenset(tags)
+        self._drop(key)
+        self.entries[key] = (data, tags, time.monotonic() + self.ttl)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def invalidate(self, tag: str):
+        if tag not in CACHE_TABLES:
+            return
+        self.generation += 1
+        keys = self.tags.pop(tag, set())
+        for key in keys:
+            self._drop(key)
+        if keys:
+            metrics.inc("graphql_response_cache_invalidations_total", len(keys),
+                        help="Entradas de la caché de respuestas invalidadas", table=tag)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+        self.tags.clear()
+
+    def on_row_change(self, payload):
+        self.invalidate(payload.get("table"))
+
+
+response_cache = ResponseCache()
+for _table in CACHE_TABLES:
+    cache_changes.subscribe(_table, response_cache.on_row_change)
+
+# ==============================
+# Extensión de Strawberry
+# ==============================
+
+class ResponseCacheExtension(SchemaExtension):
+    """Sirve las queries desde la caché y guarda las que sólo leen tablas cacheables"""
+
+    def on_execute(self):
+        ctx = self.execution_context
+        if not response_cache.enabled or ctx.operation_type != OperationType.QUERY:
+            yield
+            return
+
+        context = ctx.context if isinstance(ctx.context, dict) else {}
+        key = response_cache.key(ctx.graphql_document, ctx.variables, ctx.operation_name, context.get("json_mode", False))
+        data = response_cache.get(key)
+        if data is not None:
+            # Con el resultado ya puesto Strawberry no ejecuta la operación
+            ctx.result = ExecutionResult(data=data, errors=None)
+            metrics.inc("graphql_response_cache_hits_total", help="Queries servidas desde la caché de respuestas")
+            yield
+            return
+
+        generation = response_cache.generation
+        tables: Set[str] = set()
+        errors: list = []
+        tables_token = _tables_read.set(tables)
+        errors_token = resolver_errors.set(errors)
+        try:
+            yield
+        finally:
+            _tables_read.reset(tables_token)
+            resolver_errors.reset(errors_token)
+
+        metrics.inc("graphql_response_cache_misses_total", help="Queries ejecutadas sin la caché de respuestas")
+        result = ctx.result
+        # Nada de resultados con errores (tampoco los silenciados por los resolvers) ni sin acceso a BD
+        if result is None or result.errors or errors or not tables or not tables <= CACHE_TABLES:
+            return
+        response_cache.put(key, result.data, tables, generation)
@@ -0,0 +1,171 @@
+"""
+Artefacto precompilado con los metadatos de los modelos para arrancar rápido.
+
+Se genera en el despliegue (`python -m app.graphql.schema.schema_cache`) y lo
+cargan todos los workers; si las fuentes de los modelos cambian, el hash no
+coincide y se vuelve a introspeccionar (y a escribir) en el arranque.
+"""
+import hashlib
+import importlib
+import json
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+from app.graphql.metrics import metrics
+from .projection import SelectionProjector
+from .type_generator import PropertyDetector
+
+CACHE_PATH = os.getenv("GRAPHQL_SCHEMA_CACHE", ".cache/graphql_schema.json")
+MODELS_PACKAGE = "app.db.models"
+ARTIFACT_VERSION = 1
+
+# Ficheros cuyo contenido determina los metadatos: modelos, mixins y el propio introspector
+_ROOT = Path(__file__).resolve().parents[3]
+SOURCE_GLOBS = [
+    "app/db/models/*.py",
+    "app/db/mixins/*.py",
+    "app/graphql/schema/type_generator.py",
+    "app/graphql/schema/projection.py",
+    "app/graphql/schema/schema_cache.py",
+]
+
+# Tipos de retorno serializables en el artefacto
+_TYPES = {"bool": bool, "int": int, "float": float, "str": str, "date": date,
+          "datetime": datetime, "Decimal": Decimal, "dict": dict, "list": list,
+          "List[Any]": List[Any]}
+_TYPE_NAMES = {repr(t) if not isinstance(t, type) else t.__name__: name for name, t in _TYPES.items()}
+
+# ==============================
+# Schema Cache
+# ==============================
+
+class SchemaCache:
+    """Descubre los modelos y serializa/carga lo que se obtiene por introspección"""
+
+    # ----------------------
+    # Descubrimiento
+    # ----------------------
+    @staticmethod
+    def discover_models(package: str = MODELS_PACKAGE) -> List[Type]:
+        """Importa cada módulo del paquete y devuelve los modelos que define"""
+        folder = _ROOT / package.replace(".", "/")
+        if not folder.exists():
+            raise FileNotFoundError(f"Folder not found: {folder}")
+        models = []
+        for py_file in sorted(folder.glob("*.py")):
+            if py_file.name.startswith("__"):
+                continue
+            module_name = f"{package}.{py_file.stem}"
+            module = importlib.import_module(module_name)
+            for attr_name in dir(module):
+                attr = getattr(module, attr_name)
+                # Sólo los definidos en el módulo: los importados se repetirían
+                if isinstance(attr, type) and hasattr(attr, "__tablename__") and attr.__module__ == module_name:
+                    models.append(attr)
+        return models
+
+    @staticmethod
+    def source_hash() -> str:
+        digest = hashlib.sha256(f"v{ARTIFACT_VERSION}".encode())
+        for pattern in SOURCE_GLOBS:
+            for path in sorted(_ROOT.glob(pattern)):
+                digest.update(str(path.relative_to(_ROOT)).encode())
+                digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    # ----------------------
+    # Serialización
+    # ----------------------
+    @staticmethod
+    def _dump_type(py_type: Any) -> Optional[str]:
+        key = py_type.__name__ if isinstance(py_type, type) else repr(py_type)
+        return _TYPE_NAMES.get(key)
+
+    @classmethod
+    def build(cls, models: List[Type]) -> Dict[str, Any]:
+        """Introspección completa de los modelos en un dict serializable"""
+        entries = []
+        for model in models:
+            properties = {}
+            for name, info in PropertyDetector.get_model_properties(model).items():
+                deps = SelectionProjector.attribute_dependencies(model, name)
+                properties[name] = {
+                    "type": info["type"],
+                    "return_type": cls._dump_type(info["return_type"]),
+                    "dependencies": sorted(deps) if deps is not None else None,
+                }
+            entries.append({"module": model.__module__, "name": model.__name__, "properties": properties})
+        return {"version": ARTIFACT_VERSION, "source_hash": cls.source_hash(), "models": entries}
+
+    @staticmethod
+    def write(artifact: Dict[str, Any], path: str = CACHE_PATH):
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: varios workers pueden regenerarlo a la vez
+        tmp = target.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(artifact, indent=1))
+        os.replace(tmp, target)
+
+    @staticmethod
+    def read(path: str = CACHE_PATH) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def apply(artifact: Dict[str, Any]) -> List[Type]:
+        """Importa los modelos del artefacto y siembra los registros de introspección"""
+        models = []
+        for entry in artifact["models"]:
+            model = getattr(importlib.import_module(entry["module"]), entry["name"])
+            props = {}
+            for name, info in entry["properties"].items():
+                attr = getattr(model, name)
+                return_type = _TYPES.get(info["return_type"]) if info["return_type"] else None
+                props[name] = {
+                    "type": info["type"],
+                    "obj": attr,
+                    "return_type": return_type if return_type is not None else PropertyDetector.infer_return_type(attr),
+                }
+                deps = info["dependencies"]
+                SelectionProjector._dependencies[(model, name)] = frozenset(deps) if deps is not None else None
+            PropertyDetector._properties[model] = props
+            models.append(model)
+        return models
+
+    # ----------------------
+    # Arranque
+    # ----------------------
+    @classmethod
+    def load_models(cls, path: str = CACHE_PATH) -> List[Type]:
+        """Modelos listos para generar el schema, desde el artefacto si es válido"""
+        started = time.perf_counter()
+        artifact = cls.read(path)
+        if artifact and artifact.get("version") == ARTIFACT_VERSION and artifact.get("source_hash") == cls.source_hash():
+            models = cls.apply(artifact)
+            source = "artifact"
+        else:
+            models = cls.discover_models()
+            try:
+                cls.write(cls.build(models), path)
+            except OSError as e:
+                print(f"No se pudo escribir el artefacto del schema en {path}: {e}")
+            source = "introspection"
+        elapsed = time.perf_counter() - started
+        metrics.set_gauge("graphql_schema_metadata_seconds", elapsed,
+                          help="Tiempo de carga de los metadatos de los modelos", source=source)
+        print(f"Metadatos de {len(models)} modelos cargados ({source}) en {elapsed:.3f}s")
+        return models
+
+
+if __name__ == "__main__":
+    # Paso de build: se ejecuta una vez antes de arrancar los workers
+    started = time.perf_counter()
+    models = SchemaCache.discover_models()
+    SchemaCache.write(SchemaCache.build(models))
+    print(f"Artefacto del schema escrito en {CACHE_PATH}: {len(models)} modelos en {time.perf_counter() - started:.3f}s")
@@ -2,12 +2,18 @@
 Generador de schema GraphQL completo a partir de modelos y GenericCRUD
 """
 from typing import Type, List, Optional, Dict, Any
+from datetime import datetime
+from functools import wraps
 import strawberry
+from strawberry.types import Info
+from strawberry.schema.config import StrawberryConfig
 from sqlalchemy.orm import DeclarativeBase
 from .crud_generator import GenericCRUD
 from .query_builder import QueryBuilder
 from .type_generator import StrawberryTypeGenerator, PropertyResolver
 from .base_types import suppress_traceback_continue, FilterCondition, OrderBy, PaginationInput, PageInfo
+from .json_query import SCALAR_OVERRIDES, resolve_attribute
+from .response_cache import response_cache
 
 class SchemaGenerator:
     """Genera schema GraphQL completo con queries, mutaciones y propiedades"""
@@ -46,45 +52,114 @@ class SchemaGenerator:
 
     @staticmethod
     def generate_mutations(crud: GenericCRUD, name_prefix: str):
-        """Genera mutaciones básicas de create, update, delete y restore"""
+        """Genera mutaciones de create, update, delete y restore, y sus variantes por lotes"""
         mutations = {}
+        model = crud.model
+        object_type = crud.strawberry_type
+        to_dict = StrawberryTypeGenerator.input_to_dict
+        convert = StrawberryTypeGenerator._convert_to_strawberry
 
         @suppress_traceback_continue
-        async def create_one(info, data):
+        async def create_one(info: Info, data: crud.input_create) -> Optional[object_type]:
             db = info.context["db"]
-            instance = await crud.create(db, data.__dict__)
-            return await StrawberryTypeGenerator._convert_to_strawberry(instance)
+            instance = await crud.create(db, to_dict(model, data))
+            return await convert(instance)
 
+        # `expected_updated_at` es el `updatedAt` leído por el cliente: si la fila
+        # ha cambiado desde entonces la escritura no se aplica (conflicto)
         @suppress_traceback_continue
-        async def update_one(info, id, data):
+        async def update_one(
+            info: Info,
+            id: strawberry.ID,
+            data: crud.input_update,
+            expected_updated_at: Optional[datetime] = None
+        ) -> Optional[object_type]:
             db = info.context["db"]
-            instance = await crud.update(db, id, data.__dict__)
-            return await StrawberryTypeGenerator._convert_to_strawberry(instance) if instance else None
+            instance = await crud.update(db, id, to_dict(model, data), expected_updated_at)
+            return await convert(instance) if instance else None
 
         @suppress_traceback_continue
-        async def delete_one(info, id):
+        async def delete_one(
+            info: Info,
+            id: strawberry.ID,
+            soft: bool = False,
+            expected_updated_at: Optional[datetime] = None
+        ) -> Optional[object_type]:
             db = info.context["db"]
-            return await crud.delete(db, id)
+            # Borrado físico por defecto; `soft` marca deleted_at en los modelos con AuditMixin
+            if soft:
+                instance = await crud.soft_delete(db, id, expected_updated_at)
+            else:
+                instance = await crud.delete(db, id, expected_updated_at)
+            return await convert(instance) if instance else None
 
         @suppress_traceback_continue
-        async def restore_one(info, id):
+        async def restore_one(
+            info: Info,
+            id: strawberry.ID,
+            expected_updated_at: Optional[datetime] = None
+        ) -> Optional[object_type]:
             db = info.context["db"]
-            instance = await crud.restore(db, id)
-            return await StrawberryTypeGenerator._convert_to_strawberry(instance) if instance else None
+            instance = await crud.restore(db, id, expected_updated_at)
+            return await convert(instance) if instance else None
 
-        mutations[f"create{name_prefix.capitalize()}"] = strawberry.mutation(resolver=create_one)
-        mutations[f"update{name_prefix.capitalize()}"] = strawberry.mutation(resolver=update_one)
-        mutations[f"delete{name_prefix.capitalize()}"] = strawberry.mutation(resolver=delete_one)
-        mutations[f"restore{name_prefix.capitalize()}"] = strawberry.mutation(resolver=restore_one)
+        # Lotes: una sentencia multi-fila con RETURNING por llamada, en una transacción
+        @suppress_traceback_continue
+        async def create_batch(info: Info, data: List[crud.input_create]) -> Optional[List[object_type]]:
+            db = info.context["db"]
+            instances = await crud.create_many(db, [to_dict(model, item) for item in data])
+            return [await convert(instance) for instance in instances]
+
+        @suppress_traceback_continue
+        async def update_batch(info: Info, data: List[crud.input_update]) -> Optional[List[object_type]]:
+            db = info.context["db"]
+            instances = await crud.update_many(db, [to_dict(model, item) for item in data])
+            return [await convert(instance) for instance in instances]
+
+        @suppress_traceback_continue
+        async def upsert_batch(
+            info: Info,
+            data: List[crud.input_upsert],
+            conflict_on: Optional[List[str]] = None
+        ) -> Optional[List[object_type]]:
+            db = info.context["db"]
+            instances = await crud.upsert_many(db, [to_dict(model, item) for item in data], conflict_on)
+            return [await convert(instance) for instance in instances]
+
+        def invalidating(resolver):
+            """Tras escribir, invalida en este worker las respuestas cacheadas que leen la tabla"""
+            @wraps(resolver)
+            async def wrapper(*args, **kwargs):
+                try:
+                    return await resolver(*args, **kwargs)
+                finally:
+                    response_cache.invalidate(model.__tablename__)
+            return wrapper
+
+        mutations[f"create{name_prefix.capitalize()}"] = strawberry.mutation(resolver=invalidating(create_one))
+        mutations[f"update{name_prefix.capitalize()}"] = strawberry.mutation(resolver=invalidating(update_one))
+        mutations[f"delete{name_prefix.capitalize()}"] = strawberry.mutation(resolver=invalidating(delete_one))
+        if crud.supports_soft_delete:
+            mutations[f"restore{name_prefix.capitalize()}"] = strawberry.mutation(resolver=invalidating(restore_one))
+        mutations[f"create{name_prefix.capitalize()}Batch"] = strawberry.mutation(resolver=invalidating(create_batch))
+        mutations[f"update{name_prefix.capitalize()}Batch"] = strawberry.mutation(resolver=invalidating(update_batch))
+        mutations[f"upsert{name_prefix.capitalize()}"] = strawberry.mutation(resolver=invalidating(upsert_batch))
 
         return mutations
 
     @staticmethod
     def generate_complete_schema(base_class: Type[DeclarativeBase]):
         """Genera schema completo a partir de todos los modelos de la base"""
-        models = SchemaGenerator.get_models_from_base(base_class)
+        return SchemaGenerator.generate_schema(SchemaGenerator.get_models_from_base(base_class))
 
-        all_queries = {}
+    @staticmethod
+    def generate_schema(
+        models: List[Type],
+        extra_queries: Optional[Dict[str, Any]] = None,
+        extensions: Optional[List[Any]] = None
+    ) -> strawberry.Schema:
+        """Genera el schema a partir de una lista de modelos, queries propias adicionales y extensiones"""
+        all_queries = dict(extra_queries or {})
         all_mutations = {}
 
         for model in models:
@@ -93,7 +168,15 @@ class SchemaGenerator:
             all_mutations.update(result["mutations"])
 
         # Crear tipos Query y Mutation dinámicamente
-        Query = type("Query", (), all_queries)
-        Mutation = type("Mutation", (), all_mutations)
-
-        return strawberry.Schema(query=Query, mutation=Mutation)
+        Query = strawberry.type(type("Query", (), all_queries))
+        Mutation = strawberry.type(type("Mutation", (), all_mutations))
+
+        # El resolver por defecto y los escalares de fecha aceptan también los
+        # nodos dict (y fechas ISO) que produce el modo de consulta JSON
+        return strawberry.Schema(
+            query=Query,
+            mutation=Mutation,
+            config=StrawberryConfig(default_resolver=resolve_attribute),
+            scalar_overrides=SCALAR_OVERRIDES,
+            extensions=extensions or []
+        )
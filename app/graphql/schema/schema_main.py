@@ -1,40 +1,41 @@
 """
 Schema principal - ensamblaje final de GraphQL
 """
-from pathlib import Path
-import importlib
-from typing import List, Type
+import time
 import strawberry
 
+from app.graphql.metrics import metrics
+from .schema_cache import SchemaCache
 from .schema_generator import SchemaGenerator
+from .clusters import ClusterQueries
+from .search import SearchQueries
+from .suggest import SuggestQueries
+from .stats import StatsQueries
+from .response_cache import ResponseCacheExtension
+from .persisted_queries import PersistedQueryExtension
+from .query_cost import QueryCostExtension
 
-# -----------------------------
-# Función para cargar modelos automáticamente
-# -----------------------------
-def load_models_from_folder(folder: str) -> List[Type]:
-    models = []
-    folder_path = Path(folder)
-    if not folder_path.exists():
-        raise FileNotFoundError(f"Folder not found: {folder}")
-
-    for py_file in folder_path.glob("*.py"):
-        if py_file.name.startswith("__"):
-            continue
-        module_name = f"{folder.replace('/', '.')}.{py_file.stem}"
-        module = importlib.import_module(module_name)
-
-        for attr_name in dir(module):
-            attr = getattr(module, attr_name)
-            if hasattr(attr, "__tablename__"):
-                models.append(attr)
-    return models
+_started = time.perf_counter()
 
 # -----------------------------
-# Cargar modelos
+# Cargar modelos (desde el artefacto precompilado si está al día)
 # -----------------------------
-MODELS = load_models_from_folder("app/db/models")
+MODELS = SchemaCache.load_models()
 
 # -----------------------------
 # Generar schema
 # -----------------------------
-schema: strawberry.Schema = SchemaGenerator.generate_schema(MODELS)
+schema: strawberry.Schema = SchemaGenerator.generate_schema(MODELS, extra_queries={
+    **ClusterQueries.build(),
+    **SearchQueries.build(),
+    **SuggestQueries.build(),
+    **StatsQueries.build(),
+}, extensions=[
+    PersistedQueryExtension,
+    # Antes de la caché de respuestas: el presupuesto se aplica también a lo cacheado
+    QueryCostExtension,
+    ResponseCacheExtension,
+])
+
+metrics.set_gauge("graphql_schema_build_seconds", time.perf_counter() - _started,
+                  help="Tiempo de construcción del schema GraphQL en el arranque del worker")
@@ -0,0 +1,169 @@
+"""
+Búsqueda de texto completo unificada (inmuebles, OSM, citas, fuentes y documentos).
+
+Cada tabla tiene un `search_vector` (configuración `es_unaccent`: español sin
+acentos) mantenido por trigger e indexado con GIN (migración 0005). Los
+nombres admiten además coincidencia aproximada con pg_trgm sobre
+`f_unaccent(nombre)`. Cada tipo aporta sus mejores resultados, se mezclan por
+rango y sólo a los que se devuelven se les calcula el resaltado.
+"""
+import enum
+import os
+from typing import Any, Dict, List, Optional, Type
+
+import strawberry
+from strawberry.types import Info
+from sqlalchemy import String, cast, func, literal, literal_column, null, or_, select, union_all
+
+from app.db.models import (
+    CitaHistoriografica, FuenteHistoriografica, Inmueble, InmuebleDocumento, InmuebleOSMExt
+)
+from .base_types import clamp_limit, suppress_traceback_continue
+
+SEARCH_CONFIG = literal_column("'es_unaccent'::regconfig")
+HEADLINE_OPTIONS = os.getenv(
+    "GRAPHQL_SEARCH_HEADLINE",
+    "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=18, MinWords=6"
+)
+
+
+@strawberry.enum
+class SearchType(str, enum.Enum):
+    inmueble = "inmueble"
+    inmueble_osm = "inmueble_osm"
+    cita = "cita"
+    fuente = "fuente"
+    documento = "documento"
+
+
+@strawberry.type
+class SearchHit:
+    type: SearchType
+    id: strawberry.ID
+    # Inmueble al que pertenece el resultado (para navegar desde citas, documentos, OSM)
+    inmueble_id: Optional[strawberry.ID]
+    title: Optional[str]
+    highlight: Optional[str]
+    rank: float
+
+
+def _cita_title(model):
+    """Título de la fuente citada o, si no lo hay, el comienzo del texto de la cita"""
+    fuente = (
+        select(FuenteHistoriografica.titulo)
+        .where(FuenteHistoriografica.id == model.fuente_id)
+        .scalar_subquery()
+    )
+    return func.coalesce(fuente, func.left(model.texto_cita, 120))
+
+
+# tipo -> modelo, título (columna o expresión), columnas de texto, id de inmueble y si el título admite trigramas
+SEARCH_TARGETS: Dict[SearchType, Dict[str, Any]] = {
+    SearchType.inmueble: {
+        "model": Inmueble, "title": "nombre", "text": ["nombre", "descripcion"],
+        "inmueble_id": "id", "trigram": True,
+    },
+    SearchType.inmueble_osm: {
+        "model": InmuebleOSMExt, "title": "name", "text": ["name", "denomination", "historic"],
+        "inmueble_id": "inmueble_id", "trigram": True,
+    },
+    SearchType.cita: {
+        "model": CitaHistoriografica, "title": _cita_title, "text": ["texto_cita", "notas"],
+        "inmueble_id": "inmueble_id", "trigram": False,
+    },
+    SearchType.fuente: {
+        "model": FuenteHistoriografica, "title": "titulo", "text": ["titulo", "autor", "descripcion"],
+        "inmueble_id": None, "trigram": True,
+    },
+    SearchType.documento: {
+        "model": InmuebleDocumento, "title": None, "text": ["descripcion"],
+        "inmueble_id": "inmueble_id", "trigram": False,
+    },
+}
+
+# ==============================
+# Search Compiler
+# ==============================
+
+class SearchCompiler:
+    """Construye la consulta de búsqueda sobre varios tipos de entidad"""
+
+    @staticmethod
+    def _column(model: Type, name: Optional[str]):
+        return cast(getattr(model, name), String) if name else cast(null(), String)
+
+    @staticmethod
+    def _title(model: Type, title):
+        if callable(title):
+            return cast(title(model), String)
+        return SearchCompiler._column(model, title)
+
+    @staticmethod
+    def branch(search_type: SearchType, tsquery, raw_query: str, limit: int):
+        """Mejores `limit` filas de un tipo, por rango"""
+        target = SEARCH_TARGETS[search_type]
+        model = target["model"]
+        matches = model.search_vector.op("@@")(tsquery)
+        rank = func.ts_rank_cd(model.search_vector, tsquery)
+        if target["trigram"]:
+            # `%` usa el índice GIN de trigramas; el mejor de los dos rangos manda
+            name = func.f_unaccent(getattr(model, target["title"]))
+            fuzzy = func.f_unaccent(raw_query)
+            matches = or_(matches, name.op("%")(fuzzy))
+            rank = func.greatest(rank, func.similarity(name, fuzzy))
+        body = func.concat_ws(" — ", *[getattr(model, col) for col in target["text"]])
+        return (
+            select(
+                literal(search_type.value).label("type"),
+                model.id.label("id"),
+                SearchCompiler._column(model, target["inmueble_id"]).label("inmueble_id"),
+                SearchCompiler._title(model, target["title"]).label("title"),
+                body.label("body"),
+                rank.label("rank"),
+            )
+            .where(matches, model.deleted_at.is_(None))
+            .order_by(rank.desc())
+            .limit(limit)
+        )
+
+    @classmethod
+    def statement(cls, query: str, types: Optional[List[SearchType]] = None, limit: int = 20):
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        branches = [cls.branch(t, tsquery, query, limit) for t in (types or list(SearchType))]
+        hits = union_all(*branches).subquery("hits")
+        # ts_headline es caro: sólo para las filas que se devuelven
+        return (
+            select(
+                hits.c.type, hits.c.id, hits.c.inmueble_id, hits.c.title, hits.c.rank,
+                func.ts_headline(SEARCH_CONFIG, hits.c.body, tsquery, HEADLINE_OPTIONS).label("highlight"),
+            )
+            .order_by(hits.c.rank.desc())
+            .limit(limit)
+        )
+
+
+class SearchQueries:
+    """Query `search(query, types, limit)`"""
+
+    @staticmethod
+    def build() -> Dict[str, strawberry.field]:
+        @suppress_traceback_continue
+        async def search(
+            info: Info,
+            query: str,
+            types: Optional[List[SearchType]] = None,
+            limit: int = 20
+        ) -> Optional[List[SearchHit]]:
+            if not query.strip():
+                return []
+            db = info.context["db"]
+            result = await db.execute(SearchCompiler.statement(query, types, clamp_limit(limit, 1, 100)))
+            return [
+                SearchHit(
+                    type=SearchType(row.type), id=row.id, inmueble_id=row.inmueble_id,
+                    title=row.title, highlight=row.highlight, rank=row.rank,
+                )
+                for row in result
+            ]
+
+        return {"search": strawberry.field(resolver=search)}
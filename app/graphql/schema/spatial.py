@@ -0,0 +1,80 @@
+"""
+Predicados espaciales sobre la columna de geometría de un modelo.
+
+Todos se apoyan en índices GiST (migración 0004):
+- caja: `geom && ST_MakeEnvelope(...)` sobre el índice de geometría
+- radio y vecinos: `geography(geom)`, con su índice de expresión, para
+  trabajar en metros con `ST_DWithin` y ordenar por `<->` (KNN)
+"""
+from typing import Optional, Type
+
+from geoalchemy2 import Geometry
+from sqlalchemy import func
+from sqlalchemy.inspection import inspect
+
+# Tope de radio para que un "alrededor de" no se convierta en un volcado completo
+MAX_RADIUS_METERS = 200_000
+
+
+class SpatialError(ValueError):
+    """Parámetros espaciales fuera de rango o modelo sin geometría"""
+
+
+# ==============================
+# Spatial Compiler
+# ==============================
+
+class SpatialCompiler:
+    """Construye predicados y ordenaciones espaciales para un modelo con geometría"""
+
+    def __init__(self, model: Type):
+        self.model = model
+        self.column = self.geometry_column(model)
+
+    @staticmethod
+    def geometry_column(model: Type):
+        """Primera columna Geometry del modelo, o None"""
+        for prop in inspect(model).column_attrs:
+            if isinstance(prop.columns[0].type, Geometry):
+                return getattr(model, prop.key)
+        return None
+
+    @staticmethod
+    def _check_point(lon: float, lat: float):
+        if not (-180.0 <= lon <= 180.0 and -90.0 <= lat <= 90.0):
+            raise SpatialError(f"Coordenadas fuera de rango: ({lon}, {lat})")
+
+    @staticmethod
+    def point(lon: float, lat: float):
+        SpatialCompiler._check_point(lon, lat)
+        return func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)
+
+    def _geography(self):
+        # Misma expresión que el índice `USING gist (geography(geom))`
+        return func.geography(self.column)
+
+    # ----------------------
+    # Predicados
+    # ----------------------
+    def in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+        self._check_point(min_lon, min_lat)
+        self._check_point(max_lon, max_lat)
+        if min_lon > max_lon or min_lat > max_lat:
+            raise SpatialError("La caja debe ir de (minLon, minLat) a (maxLon, maxLat)")
+        envelope = func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+        return self.column.op("&&")(envelope)
+
+    def within_radius(self, lon: float, lat: float, meters: float):
+        if not 0 < meters <= MAX_RADIUS_METERS:
+            raise SpatialError(f"El radio debe estar entre 0 y {MAX_RADIUS_METERS} metros")
+        return func.ST_DWithin(self._geography(), func.geography(self.point(lon, lat)), meters)
+
+    # ----------------------
+    # Ordenación
+    # ----------------------
+    def distance_order(self, lon: float, lat: float):
+        """Distancia KNN (`<->`) en metros, resuelta por el índice GiST"""
+        return self._geography().op("<->")(func.geography(self.point(lon, lat)))
+
+    def not_null(self):
+        return self.column.isnot(None)
@@ -0,0 +1,260 @@
+"""
+Estadísticas agregadas para los cuadros de mando.
+
+Las consultas no recorren las tablas de origen sino los resúmenes de la
+migración 0007:
+
+- `stats_inmuebles`: recuento por (comunidad, provincia, diócesis, tipo,
+  es_bic, es_ruina). Un trigger escribe deltas +1/-1 en
+  `stats_inmuebles_delta`; la lectura suma resumen y deltas pendientes, así que
+  es exacta al momento, y `StatsRefresher` pliega los deltas cada poco.
+- `stats_transmisiones` / `stats_actuaciones`: número e importe por región y
+  año, vistas materializadas que `StatsRefresher` refresca con
+  `REFRESH MATERIALIZED VIEW CONCURRENTLY` (las lecturas no se bloquean).
+
+Cualquier subconjunto de dimensiones se resuelve con un GROUP BY sobre el
+resumen: el coste depende del número de grupos, no de filas.
+"""
+import asyncio
+import enum
+import os
+import time
+from typing import Dict, List, Optional
+
+import strawberry
+from strawberry.types import Info
+from sqlalchemy import Boolean, Integer, String, cast, column, func, select, table, text, union_all
+
+from app.db.sessions.async_session import async_session
+from app.graphql.metrics import metrics
+from .base_types import suppress_traceback_continue
+
+STATS_FOLD_SECONDS = float(os.getenv("GRAPHQL_STATS_FOLD_SECONDS", "30"))
+STATS_REFRESH_SECONDS = float(os.getenv("GRAPHQL_STATS_REFRESH_SECONDS", "900"))
+# Clave del advisory lock: con varios workers sólo uno refresca a la vez
+STATS_LOCK_KEY = 71_600_016
+
+
+def _inmueble_table(name: str):
+    return table(
+        name,
+        column("comunidad_autonoma_id", String), column("provincia_id", String),
+        column("diocesis_id", String), column("tipo_inmueble_id", String),
+        column("es_bic", Boolean), column("es_ruina", Boolean), column("n", Integer),
+    )
+
+
+def _amount_view(name: str):
+    return table(
+        name,
+        column("comunidad_autonoma_id", String), column("provincia_id", String), column("anio", Integer),
+        column("n", Integer), column("total"),
+    )
+
+
+stats_inmuebles = _inmueble_table("stats_inmuebles")
+stats_inmuebles_delta = _inmueble_table("stats_inmuebles_delta")
+AMOUNT_VIEWS = ["stats_transmisiones", "stats_actuaciones"]
+
+
+# ==============================
+# Tipos
+# ==============================
+
+@strawberry.enum
+class InmuebleStatsDimension(str, enum.Enum):
+    comunidad_autonoma = "comunidad_autonoma_id"
+    provincia = "provincia_id"
+    diocesis = "diocesis_id"
+    tipo_inmueble = "tipo_inmueble_id"
+    es_bic = "es_bic"
+    es_ruina = "es_ruina"
+
+
+@strawberry.input
+class InmuebleStatsFilter:
+    comunidad_autonoma_id: Optional[strawberry.ID] = None
+    provincia_id: Optional[strawberry.ID] = None
+    diocesis_id: Optional[strawberry.ID] = None
+    tipo_inmueble_id: Optional[strawberry.ID] = None
+    es_bic: Optional[bool] = None
+    es_ruina: Optional[bool] = None
+
+
+@strawberry.type
+class InmuebleStats:
+    """Un grupo; sólo vienen informadas las dimensiones pedidas en `groupBy`"""
+    count: int
+    comunidad_autonoma_id: Optional[strawberry.ID] = None
+    provincia_id: Optional[strawberry.ID] = None
+    diocesis_id: Optional[strawberry.ID] = None
+    tipo_inmueble_id: Optional[strawberry.ID] = None
+    es_bic: Optional[bool] = None
+    es_ruina: Optional[bool] = None
+
+
+@strawberry.enum
+class AmountStatsDimension(str, enum.Enum):
+    comunidad_autonoma = "comunidad_autonoma_id"
+    provincia = "provincia_id"
+    anio = "anio"
+
+
+@strawberry.input
+class AmountStatsFilter:
+    comunidad_autonoma_id: Optional[strawberry.ID] = None
+    provincia_id: Optional[strawberry.ID] = None
+    anio_desde: Optional[int] = None
+    anio_hasta: Optional[int] = None
+
+
+@strawberry.type
+class AmountStats:
+    count: int
+    total: float
+    comunidad_autonoma_id: Optional[strawberry.ID] = None
+    provincia_id: Optional[strawberry.ID] = None
+    anio: Optional[int] = None
+
+
+# ==============================
+# Stats Compiler
+# ==============================
+
+class StatsCompiler:
+    """SELECT ... GROUP BY sobre los resúmenes"""
+
+    @staticmethod
+    def inmuebles(group_by: List[InmuebleStatsDimension], where: Optional[InmuebleStatsFilter] = None):
+        # Resumen más deltas aún no plegados
+        source = union_all(
+            select(stats_inmuebles), select(stats_inmuebles_delta)
+        ).subquery("s")
+        keys = [source.c[dimension.value] for dimension in dict.fromkeys(group_by)]
+        total = func.sum(source.c.n)
+        stmt = select(*keys, cast(total, Integer).label("count")).group_by(*keys).having(total != 0)
+        for dimension in InmuebleStatsDimension:
+            value = getattr(where, dimension.value, None) if where else None
+            if value is not None:
+                stmt = stmt.where(source.c[dimension.value] == value)
+        return stmt.order_by(total.desc())
+
+    @staticmethod
+    def amounts(view: str, group_by: List[AmountStatsDimension], where: Optional[AmountStatsFilter] = None):
+        source = _amount_view(view)
+        keys = [source.c[dimension.value] for dimension in dict.fromkeys(group_by)]
+        stmt = select(*keys, cast(func.sum(source.c.n), Integer).label("count"), func.sum(source.c.total).label("total"))
+        if where:
+            if where.comunidad_autonoma_id is not None:
+                stmt = stmt.where(source.c.comunidad_autonoma_id == where.comunidad_autonoma_id)
+            if where.provincia_id is not None:
+                stmt = stmt.where(source.c.provincia_id == where.provincia_id)
+            if where.anio_desde is not None:
+                stmt = stmt.where(source.c.anio >= where.anio_desde)
+            if where.anio_hasta is not None:
+                stmt = stmt.where(source.c.anio <= where.anio_hasta)
+        return stmt.group_by(*keys).order_by(*keys)
+
+
+# ==============================
+# Refresco
+# ==============================
+
+class StatsRefresher:
+    """Tarea de fondo: pliega deltas cada `STATS_FOLD_SECONDS` y refresca las vistas cada `STATS_REFRESH_SECONDS`"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._last_refresh = 0.0
+
+    @staticmethod
+    async def fold() -> int:
+        async with async_session() as session:
+            locked = (await session.execute(select(func.pg_try_advisory_xact_lock(STATS_LOCK_KEY)))).scalar()
+            if not locked:
+                return 0
+            folded = (await session.execute(select(func.stats_inmuebles_fold()))).scalar()
+            await session.commit()
+        metrics.inc("graphql_stats_deltas_folded_total", folded, help="Deltas de estadísticas plegados en el resumen")
+        return folded
+
+    @staticmethod
+    async def refresh_views():
+        started = time.perf_counter()
+        async with async_session() as session:
+            locked = (await session.execute(select(func.pg_try_advisory_xact_lock(STATS_LOCK_KEY + 1)))).scalar()
+            if not locked:
+                return
+            for view in AMOUNT_VIEWS:
+                await session.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+            await session.commit()
+        metrics.set_gauge("graphql_stats_refresh_seconds", time.perf_counter() - started,
+                          help="Duración del último refresco de las vistas de estadísticas")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(STATS_FOLD_SECONDS)
+            try:
+                await self.fold()
+                if time.monotonic() - self._last_refresh >= STATS_REFRESH_SECONDS:
+                    await self.refresh_views()
+                    self._last_refresh = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Stats] Error refrescando estadísticas: {e}")
+
+    def start(self):
+        if self._task is None:
+            # Las vistas se crearon (o refrescaron) en la migración; el primer refresco espera un ciclo
+            self._last_refresh = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+stats_refresher = StatsRefresher()
+
+# ==============================
+# Queries
+# ==============================
+
+class StatsQueries:
+    """Queries `inmuebleStats`, `transmisionStats` y `actuacionStats`"""
+
+    @staticmethod
+    def _amount_query(view: str):
+        @suppress_traceback_continue
+        async def resolver(
+            info: Info,
+            group_by: List[AmountStatsDimension],
+            where: Optional[AmountStatsFilter] = None
+        ) -> Optional[List[AmountStats]]:
+            result = await info.context["db"].execute(StatsCompiler.amounts(view, group_by, where))
+            return [AmountStats(**row._mapping) for row in result]
+
+        return strawberry.field(resolver=resolver)
+
+    @classmethod
+    def build(cls) -> Dict[str, strawberry.field]:
+        @suppress_traceback_continue
+        async def inmueble_stats(
+            info: Info,
+            group_by: List[InmuebleStatsDimension],
+            where: Optional[InmuebleStatsFilter] = None
+        ) -> Optional[List[InmuebleStats]]:
+            result = await info.context["db"].execute(StatsCompiler.inmuebles(group_by, where))
+            return [InmuebleStats(**row._mapping) for row in result]
+
+        return {
+            "inmuebleStats": strawberry.field(resolver=inmueble_stats),
+            "transmisionStats": cls._amount_query("stats_transmisiones"),
+            "actuacionStats": cls._amount_query("stats_actuaciones"),
+        }
@@ -0,0 +1,192 @@
+"""
+Índice de autocompletado en memoria para nombres geográficos y catálogos.
+
+Por entidad se guardan dos arrays ordenados de claves normalizadas
+(`unidecode`, minúsculas, sólo alfanuméricos): el nombre completo y cada
+sufijo que empieza en una palabra ("sebastian de los reyes" para "San
+Sebastián de los Reyes"). Una sugerencia es un `bisect` más un recorrido
+corto, sin ir a la base de datos. Se carga en el arranque y cada entidad se
+recarga al llegar NOTIFY de su tabla (migración 0006).
+"""
+import asyncio
+import enum
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple, Type
+
+import strawberry
+from sqlalchemy import select
+from unidecode import unidecode
+
+from app.db.models import (
+    ComunidadAutonoma, Diocesis, EstadoConservacion, EstadoTratamiento, FigurasProteccion, Localidad,
+    Provincia, RolTecnico, TipoCertificacionPropiedad, TipoDocumento, TipoInmueble, TipoPersona,
+    TipoTransmision
+)
+from app.db.models.catalogos import TipoVia
+from app.db.changes import changes
+from app.db.sessions.async_session import async_session
+from app.graphql.metrics import metrics
+from .base_types import clamp_limit, suppress_traceback_continue
+
+SUGGEST_RELOAD_DELAY = 1.0
+
+# entidad -> modelo; todos tienen columna `nombre`
+SUGGEST_MODELS: Dict[str, Type] = {
+    "comunidad_autonoma": ComunidadAutonoma,
+    "provincia": Provincia,
+    "localidad": Localidad,
+    "diocesis": Diocesis,
+    "tipo_inmueble": TipoInmueble,
+    "tipo_via": TipoVia,
+    "tipo_documento": TipoDocumento,
+    "tipo_persona": TipoPersona,
+    "tipo_transmision": TipoTransmision,
+    "tipo_certificacion_propiedad": TipoCertificacionPropiedad,
+    "estado_conservacion": EstadoConservacion,
+    "estado_tratamiento": EstadoTratamiento,
+    "figura_proteccion": FigurasProteccion,
+    "rol_tecnico": RolTecnico,
+}
+
+SuggestEntity = strawberry.enum(enum.Enum("SuggestEntity", {name: name for name in SUGGEST_MODELS}))
+
+
+@strawberry.type
+class Suggestion:
+    id: strawberry.ID
+    name: str
+
+
+def normalize(text: str) -> str:
+    """Clave de búsqueda: sin acentos, en minúsculas y con los separadores reducidos a un espacio"""
+    return re.sub(r"[^a-z0-9]+", " ", unidecode(text or "").lower()).strip()
+
+
+# ==============================
+# Prefix Index
+# ==============================
+
+class PrefixIndex:
+    """Arrays ordenados (clave, nombre, id) de una entidad"""
+
+    def __init__(self, rows: List[Tuple[str, str]]):
+        names, words = [], []
+        for id, name in rows:
+            key = normalize(name)
+            if not key:
+                continue
+            names.append((key, name, id))
+            tokens = key.split(" ")
+            for i in range(1, len(tokens)):
+                words.append((" ".join(tokens[i:]), name, id))
+        names.sort()
+        words.sort()
+        self.names, self.words = names, words
+        self.name_keys = [entry[0] for entry in names]
+        self.word_keys = [entry[0] for entry in words]
+
+    @staticmethod
+    def _scan(keys: List[str], entries: list, prefix: str, limit: int, seen: set, out: list):
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and len(out) < limit and keys[i].startswith(prefix):
+            _, name, id = entries[i]
+            if id not in seen:
+                seen.add(id)
+                out.append(Suggestion(id=id, name=name))
+            i += 1
+
+    def suggest(self, prefix: str, limit: int) -> List[Suggestion]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        out: List[Suggestion] = []
+        seen: set = set()
+        # Primero los que empiezan por el prefijo; después los que lo tienen al inicio de otra palabra
+        self._scan(self.name_keys, self.names, prefix, limit, seen, out)
+        self._scan(self.word_keys, self.words, prefix, limit, seen, out)
+        return out
+
+
+# ==============================
+# Suggest Index
+# ==============================
+
+class SuggestIndex:
+    """Un PrefixIndex por entidad, sustituido entero en cada recarga"""
+
+    def __init__(self):
+        self.indexes: Dict[str, PrefixIndex] = {}
+        self._pending: set = set()
+        self._reload_scheduled = False
+        self._lock = asyncio.Lock()
+
+    async def load(self, entity: str):
+        model = SUGGEST_MODELS[entity]
+        async with async_session() as session:
+            rows = (await session.execute(
+                select(model.id, model.nombre).where(model.deleted_at.is_(None))
+            )).all()
+        # Se construye aparte y se publica de una vez: las consultas nunca ven un índice a medias
+        self.indexes[entity] = PrefixIndex(rows)
+
+    async def load_all(self):
+        started = time.perf_counter()
+        for entity in SUGGEST_MODELS:
+            await self.load(entity)
+        elapsed = time.perf_counter() - started
+        metrics.set_gauge("graphql_suggest_index_build_seconds", elapsed,
+                          help="Tiempo de carga de los índices de autocompletado")
+        print(f"[Suggest] {len(self.indexes)} índices cargados en {elapsed:.3f}s")
+
+    async def ensure_loaded(self, entity: str):
+        if entity not in self.indexes:
+            async with self._lock:
+                if entity not in self.indexes:
+                    await self.load(entity)
+
+    async def _reload_pending(self):
+        entities, self._pending = self._pending, set()
+        self._reload_scheduled = False
+        for entity in entities:
+            try:
+                await self.load(entity)
+            except Exception as e:
+                print(f"[Suggest] Error recargando {entity}: {e}")
+
+    def on_row_change(self, payload):
+        entity = _ENTITY_BY_TABLE.get(payload.get("table"))
+        if entity is None or entity not in self.indexes:
+            return
+        self._pending.add(entity)
+        if not self._reload_scheduled:
+            self._reload_scheduled = True
+            loop = asyncio.get_running_loop()
+            loop.call_later(SUGGEST_RELOAD_DELAY, lambda: loop.create_task(self._reload_pending()))
+
+    def suggest(self, entity: str, prefix: str, limit: int) -> List[Suggestion]:
+        return self.indexes[entity].suggest(prefix, limit)
+
+
+_ENTITY_BY_TABLE = {model.__tablename__: entity for entity, model in SUGGEST_MODELS.items()}
+
+suggest_index = SuggestIndex()
+for _table in _ENTITY_BY_TABLE:
+    changes.subscribe(_table, suggest_index.on_row_change)
+
+# ==============================
+# Queries
+# ==============================
+
+class SuggestQueries:
+    """Query `suggest(entity, prefix, limit)`"""
+
+    @staticmethod
+    def build() -> Dict[str, strawberry.field]:
+        @suppress_traceback_continue
+        async def suggest(entity: SuggestEntity, prefix: str, limit: int = 10) -> Optional[List[Suggestion]]:
+            await suggest_index.ensure_loaded(entity.value)
+            return suggest_index.suggest(entity.value, prefix, clamp_limit(limit, 1, 50))
+
+        return {"suggest": strawberry.field(resolver=suggest)}
@@ -0,0 +1,239 @@
+"""
+GenericCRUD: escrituras por lotes y control optimista contra SQLite en memoria (aiosqlite).
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import DateTime, Integer, String, event, select
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from .crud_generator import GenericCRUD
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Registro(Base):
+    __tablename__ = "registros"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    codigo: Mapped[str] = mapped_column(String, unique=True)
+    nombre: Mapped[str] = mapped_column(String)
+    notas: Mapped[str | None] = mapped_column(String, nullable=True)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, onupdate=datetime.utcnow)
+
+
+crud = GenericCRUD(Registro)
+
+SEED = [
+    dict(id=1, codigo="a", nombre="Uno"),
+    dict(id=2, codigo="b", nombre="Dos", notas="x"),
+    dict(id=3, codigo="c", nombre="Tres"),
+]
+
+
+@pytest.fixture
+def run():
+    """Ejecuta la corrutina `test(session)` sobre una base nueva con SEED"""
+    def run(test):
+        async def main():
+            engine = create_async_engine("sqlite+aiosqlite://")
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def _connect(dbapi_connection, _):
+                # timezone('utc', now()) de PostgreSQL: CURRENT_TIMESTAMP ya es UTC en SQLite
+                dbapi_connection.create_function("timezone", 2, lambda zone, value: value)
+                # sqlite3 no abre transacción ante `WITH ... UPDATE`: BEGIN explícito, como en PostgreSQL
+                dbapi_connection.isolation_level = None
+
+            @event.listens_for(engine.sync_engine, "begin")
+            def _begin(connection):
+                connection.exec_driver_sql("BEGIN")
+
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                session.add_all(Registro(**row) for row in SEED)
+                await session.commit()
+                session.expunge_all()
+                await test(session)
+            await engine.dispose()
+        asyncio.run(main())
+    return run
+
+
+async def rows(session):
+    session.expunge_all()
+    result = await session.scalars(select(Registro).order_by(Registro.id))
+    return [(r.id, r.codigo, r.nombre, r.notas) for r in result]
+
+
+# ----------------------
+# create_many
+# ----------------------
+
+def test_create_many_keeps_input_order_across_field_groups(run):
+    async def test(session):
+        created = await crud.create_many(session, [
+            {"codigo": "e", "nombre": "E"},
+            {"codigo": "d", "nombre": "D", "notas": "n"},
+            {"codigo": "f", "nombre": "F"},
+        ])
+        assert [r.codigo for r in created] == ["e", "d", "f"]
+        assert [r.notas for r in created] == [None, "n", None]
+        assert len(await rows(session)) == 6
+    run(test)
+
+
+def test_create_many_is_all_or_nothing(run):
+    async def test(session):
+        with pytest.raises(Exception):
+            await crud.create_many(session, [{"codigo": "e", "nombre": "E"}, {"codigo": "a", "nombre": "A"}])
+        assert len(await rows(session)) == 3
+    run(test)
+
+
+# ----------------------
+# update_many
+# ----------------------
+
+def test_update_many_keeps_input_order_across_field_groups(run):
+    async def test(session):
+        updated = await crud.update_many(session, [
+            {"id": 3, "nombre": "III"},
+            {"id": 1, "notas": "y"},
+            {"id": 2, "nombre": "II", "notas": None},
+        ])
+        assert [r.id for r in updated] == [3, 1, 2]
+        assert await rows(session) == [(1, "a", "Uno", "y"), (2, "b", "II", None), (3, "c", "III", None)]
+    run(test)
+
+
+def test_update_many_returns_pk_only_rows_unchanged(run):
+    async def test(session):
+        updated = await crud.update_many(session, [{"id": 2}, {"id": 1, "nombre": "I"}, {"id": 3}])
+        assert [(r.id, r.nombre) for r in updated] == [(2, "Dos"), (1, "I"), (3, "Tres")]
+        assert [(r.id, r.nombre) for r in await crud.update_many(session, [{"id": 3}])] == [(3, "Tres")]
+    run(test)
+
+
+@pytest.mark.parametrize("batch, missing", [
+    ([{"id": 1, "nombre": "I"}, {"id": 99, "nombre": "X"}], "99"),
+    ([{"id": 1, "nombre": "I"}, {"id": 98}], "98"),
+])
+def test_update_many_reports_missing_rows_and_rolls_back(run, batch, missing):
+    async def test(session):
+        with pytest.raises(NoResultFound, match=f"with id {missing} not found"):
+            await crud.update_many(session, batch)
+        assert (await rows(session))[0] == (1, "a", "Uno", None)
+    run(test)
+
+
+def test_update_many_needs_the_pk(run):
+    async def test(session):
+        with pytest.raises(ValueError, match="necesita 'id'"):
+            await crud.update_many(session, [{"nombre": "X"}])
+    run(test)
+
+
+# ----------------------
+# upsert_many
+# ----------------------
+
+def test_upsert_many_returns_rows_in_input_order(run):
+    async def test(session):
+        result = await crud.upsert_many(session, [
+            {"codigo": "z", "nombre": "Zeta"},
+            {"codigo": "b", "nombre": "Be", "notas": "nueva"},
+            {"codigo": "a", "nombre": "A"},
+        ], conflict_on=["codigo"])
+        assert [(r.codigo, r.nombre) for r in result] == [("z", "Zeta"), ("b", "Be"), ("a", "A")]
+        # Las existentes conservan su id; la nueva se inserta
+        assert [r.id for r in result][1:] == [2, 1]
+        assert len(await rows(session)) == 4
+    run(test)
+
+
+def test_upsert_many_stamps_updated_at_on_conflict(run):
+    async def test(session):
+        before = datetime.utcnow().replace(microsecond=0)
+        result = await crud.upsert_many(session, [{"codigo": "a", "nombre": "A"}, {"codigo": "q", "nombre": "Q"}], ["codigo"])
+        assert result[0].updated_at >= before
+        assert result[1].updated_at is None
+    run(test)
+
+
+def test_upsert_many_rejects_duplicate_keys(run):
+    async def test(session):
+        with pytest.raises(ValueError, match="codigo repetido en el lote: a"):
+            await crud.upsert_many(session, [
+                {"codigo": "a", "nombre": "A1"},
+                {"codigo": "z", "nombre": "Z"},
+                {"codigo": "a", "nombre": "A2", "notas": "otra"},
+            ], conflict_on=["codigo"])
+        assert len(await rows(session)) == 3
+    run(test)
+
+
+def test_upsert_many_needs_the_conflict_key(run):
+    async def test(session):
+        with pytest.raises(ValueError, match="upsert necesita codigo"):
+            await crud.upsert_many(session, [{"codigo": "a", "nombre": "A"}, {"nombre": "B"}], ["codigo"])
+        with pytest.raises(ValueError, match="no es una clave única"):
+            await crud.upsert_many(session, [{"nombre": "A"}], ["nombre"])
+    run(test)
+
+
+# ----------------------
+# Control optimista (updated_at)
+# ----------------------
+
+async def touch(session, id):
+    """Modifica la fila y devuelve su updated_at, como lo leería un cliente"""
+    return (await crud.update(session, id, {"notas": "leída"})).updated_at
+
+
+@pytest.mark.parametrize("payload", [{"nombre": "Nuevo"}, {}, {"id": 1}])
+def test_update_with_current_version(run, payload):
+    async def test(session):
+        version = await touch(session, 1)
+        instance = await crud.update(session, 1, payload, expected_updated_at=version)
+        assert instance.id == 1
+    run(test)
+
+
+@pytest.mark.parametrize("payload", [{"nombre": "Nuevo"}, {}, {"id": 1}])
+def test_update_with_stale_version_conflicts(run, payload):
+    async def test(session):
+        stale = await touch(session, 1)
+        await crud.update(session, 1, {"notas": "otro cliente", "updated_at": datetime(2030, 1, 1)})
+        with pytest.raises(StaleDataError):
+            await crud.update(session, 1, payload, expected_updated_at=stale)
+        assert (await rows(session))[0][2] == "Uno"
+    run(test)
+
+
+@pytest.mark.parametrize("payload", [{"nombre": "Nuevo"}, {}])
+def test_update_missing_row(run, payload):
+    async def test(session):
+        with pytest.raises(NoResultFound):
+            await crud.update(session, 99, payload)
+        with pytest.raises(NoResultFound):
+            await crud.update(session, 99, payload, expected_updated_at=datetime(2026, 1, 1))
+    run(test)
+
+
+def test_delete_with_stale_version_conflicts(run):
+    async def test(session):
+        stale = await touch(session, 2)
+        await crud.update(session, 2, {"updated_at": datetime(2030, 1, 1)})
+        with pytest.raises(StaleDataError):
+            await crud.delete(session, 2, expected_updated_at=stale)
+        deleted = await crud.delete(session, 2, expected_updated_at=datetime(2030, 1, 1))
+        assert deleted.id == 2
+        assert [r[0] for r in await rows(session)] == [1, 3]
+    run(test)
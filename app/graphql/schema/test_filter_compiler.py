@@ -0,0 +1,219 @@
+"""
+FilterCompiler: cada operador, grupos anidados, conversión de valores y modo estricto, contra SQLite en memoria.
+"""
+import enum
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import (
+    Boolean, Date, DateTime, Enum, ForeignKey, Index, Integer, Numeric, String, UniqueConstraint, create_engine, select
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from . import filter_compiler
+from .base_types import FilterCondition, FilterGroup, FilterOperator as Op, LogicalOperator, OrderBy, OrderDirection
+from .filter_compiler import FilterCompiler, FilterError
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Estado(enum.Enum):
+    bueno = "bueno"
+    ruina = "ruina"
+
+
+class Ciudad(Base):
+    __tablename__ = "ciudades"
+    __table_args__ = (UniqueConstraint("nombre"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    provincia: Mapped[str] = mapped_column(String)
+
+
+class Item(Base):
+    __tablename__ = "items"
+    __table_args__ = (Index("ix_items_city_day", "city", "day"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, index=True)
+    city: Mapped[str] = mapped_column(String)
+    day: Mapped[date | None] = mapped_column(Date, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    amount: Mapped[Decimal | None] = mapped_column(Numeric(8, 2), nullable=True)
+    units: Mapped[int] = mapped_column(Integer)
+    active: Mapped[bool] = mapped_column(Boolean)
+    estado: Mapped[Estado] = mapped_column(Enum(Estado))
+    notes: Mapped[str | None] = mapped_column(String, nullable=True)
+    ciudad_id: Mapped[int | None] = mapped_column(ForeignKey("ciudades.id"), nullable=True)
+
+
+ROWS = [
+    dict(id=1, name="Iglesia de San Pedro", city="León", day=date(2026, 1, 1), created_at=datetime(2026, 1, 1, 10),
+         amount=Decimal("10.50"), units=1, active=True, estado=Estado.bueno, notes=None),
+    dict(id=2, name="Ermita de Santa Ana", city="León", day=date(2026, 1, 2), created_at=datetime(2026, 1, 2, 10),
+         amount=Decimal("20.00"), units=2, active=False, estado=Estado.ruina, notes="ruinas"),
+    dict(id=3, name="Catedral", city="Burgos", day=None, created_at=datetime(2026, 1, 3, 10),
+         amount=None, units=3, active=True, estado=Estado.bueno, notes="gótica"),
+    dict(id=4, name="Convento 100%", city="Soria", day=date(2026, 1, 4), created_at=datetime(2026, 1, 4, 10),
+         amount=Decimal("40.00"), units=4, active=True, estado=Estado.ruina, notes=None),
+]
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(Item(**row) for row in ROWS)
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def compiler():
+    return FilterCompiler(Item, strict=False)
+
+
+def ids(session, clauses):
+    return sorted(session.scalars(select(Item.id).where(*clauses)))
+
+
+def cond(field, operator, value=None, values=None):
+    return FilterCondition(field=field, operator=operator, value=value, values=values)
+
+
+@pytest.mark.parametrize("condition, expected", [
+    (cond("city", Op.eq, "León"), [1, 2]),
+    (cond("city", Op.ne, "León"), [3, 4]),
+    (cond("notes", Op.eq, None), [1, 4]),
+    (cond("notes", Op.ne, None), [2, 3]),
+    (cond("units", Op.gt, 2), [3, 4]),
+    (cond("units", Op.gte, 2), [2, 3, 4]),
+    (cond("units", Op.lt, 2), [1]),
+    (cond("units", Op.lte, 2), [1, 2]),
+    (cond("amount", Op.gt, "15.5"), [2, 4]),
+    # Sin comodines: "contiene"; con ellos, el patrón tal cual
+    (cond("name", Op.like, "de San"), [1, 2]),
+    (cond("name", Op.like, "Ermita%"), [2]),
+    (cond("name", Op.ilike, "CATEDRAL"), [3]),
+    (cond("city", Op.in_, values=["Soria", "Burgos"]), [3, 4]),
+    (cond("city", Op.not_in, values=["León"]), [3, 4]),
+    (cond("units", Op.between, values=[2, 3]), [2, 3]),
+    (cond("day", Op.is_null, True), [3]),
+    (cond("day", Op.is_null, "false"), [1, 2, 4]),
+    (cond("day", Op.is_null), [3]),
+])
+def test_operators(session, compiler, condition, expected):
+    assert ids(session, compiler.compile([condition])) == expected
+
+
+@pytest.mark.parametrize("condition, expected", [
+    # Fechas ISO, números en texto, booleanos y enums por valor
+    (cond("createdAt", Op.gte, "2026-01-03T00:00:00"), [3, 4]),
+    (cond("day", Op.lt, "2026-01-02"), [1]),
+    (cond("units", Op.eq, "4"), [4]),
+    (cond("active", Op.eq, "false"), [2]),
+    (cond("active", Op.eq, 1), [1, 3, 4]),
+    (cond("estado", Op.eq, "ruina"), [2, 4]),
+    (cond("estado", Op.in_, values=["bueno"]), [1, 3]),
+    (cond("city", Op.in_, ["Burgos"]), [3]),
+    (cond("units", Op.between, ["1", "2"]), [1, 2]),
+])
+def test_value_coercion_and_field_names(session, compiler, condition, expected):
+    assert ids(session, compiler.compile([condition])) == expected
+
+
+def test_nested_groups(session, compiler):
+    # city = León AND (units >= 2 OR (estado = bueno AND notes IS NULL))
+    group = FilterGroup(
+        operator=LogicalOperator.and_,
+        conditions=[cond("city", Op.eq, "León")],
+        groups=[FilterGroup(
+            operator=LogicalOperator.or_,
+            conditions=[cond("units", Op.gte, 2)],
+            groups=[FilterGroup(conditions=[cond("estado", Op.eq, "bueno"), cond("notes", Op.is_null, True)])],
+        )],
+    )
+    assert ids(session, compiler.compile(group=group)) == [1, 2]
+
+
+def test_filters_and_group_are_combined_with_and(session, compiler):
+    group = FilterGroup(operator=LogicalOperator.or_, conditions=[cond("city", Op.eq, "Soria"), cond("units", Op.eq, 1)])
+    assert ids(session, compiler.compile([cond("active", Op.eq, True)], group)) == [1, 4]
+
+
+def test_empty_input(session, compiler):
+    assert compiler.compile() == []
+    assert ids(session, compiler.compile(group=FilterGroup())) == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("condition, message", [
+    (cond("missing", Op.eq, 1), "no tiene el campo 'missing'"),
+    (cond("city", Op.in_), "necesita 'values'"),
+    (cond("city", Op.not_in, values=[]), "necesita 'values'"),
+    (cond("units", Op.between, values=[1]), "exactamente 2"),
+    (cond("units", Op.like, 5), "necesita un texto"),
+    (cond("units", Op.eq, "many"), "Valor no válido para 'units'"),
+    (cond("day", Op.eq, "2026-13-01"), "Valor no válido para 'day'"),
+    (cond("estado", Op.eq, "perfecto"), "Valor no válido para 'estado'"),
+])
+def test_invalid_filters(compiler, condition, message):
+    with pytest.raises(FilterError, match=message):
+        compiler.compile([condition])
+
+
+# ----------------------
+# Modo estricto
+# ----------------------
+
+def test_strict_mode_only_allows_leading_index_columns():
+    compiler = FilterCompiler(Item, strict=True)
+    # PK, index=True y primera columna de un índice compuesto
+    for field in ("id", "name", "city"):
+        compiler.compile([cond(field, Op.ne, None)])
+    # Segunda columna del índice compuesto y columnas sin índice
+    for field in ("day", "notes", "units"):
+        with pytest.raises(FilterError, match="no está indexado"):
+            compiler.compile([cond(field, Op.ne, None)])
+    with pytest.raises(FilterError, match="no está indexado"):
+        compiler.compile(group=FilterGroup(groups=[FilterGroup(conditions=[cond("notes", Op.eq, "x")])]))
+
+
+def test_strict_mode_rejects_unindexed_foreign_keys():
+    # La FK no crea índice: filtrar u ordenar por ella sería un recorrido secuencial
+    with pytest.raises(FilterError, match="no está indexado"):
+        FilterCompiler(Item, strict=True).compile([cond("ciudadId", Op.eq, 1)])
+    with pytest.raises(FilterError, match="no está indexado"):
+        FilterCompiler(Item, strict=True).compile_order_by([OrderBy(field="ciudad_id")])
+    # Las restricciones UNIQUE sí tienen índice
+    compiler = FilterCompiler(Ciudad, strict=True)
+    compiler.compile([cond("nombre", Op.eq, "León")])
+    with pytest.raises(FilterError, match="no está indexado"):
+        compiler.compile([cond("provincia", Op.eq, "León")])
+
+
+def test_strict_default_comes_from_environment(monkeypatch):
+    monkeypatch.setattr(filter_compiler, "STRICT_FILTERS", True)
+    assert FilterCompiler(Item).strict is True
+    monkeypatch.setattr(filter_compiler, "STRICT_FILTERS", False)
+    assert FilterCompiler(Item).strict is False
+
+
+# ----------------------
+# Ordenación
+# ----------------------
+
+def test_order_by_normalizes_field_names(compiler):
+    order = compiler.compile_order_by([OrderBy(field="createdAt", direction=OrderDirection.desc), OrderBy(field="units")])
+    assert [(o.field, o.direction) for o in order] == [("created_at", OrderDirection.desc), ("units", OrderDirection.asc)]
+    assert compiler.compile_order_by(None) is None
+    assert compiler.compile_order_by([]) is None
+
+
+def test_order_by_is_validated():
+    with pytest.raises(FilterError, match="no tiene el campo"):
+        FilterCompiler(Item, strict=False).compile_order_by([OrderBy(field="missing")])
+    with pytest.raises(FilterError, match="no está indexado"):
+        FilterCompiler(Item, strict=True).compile_order_by([OrderBy(field="units")])
@@ -0,0 +1,131 @@
+"""
+Modo JSON: una sentencia por lectura, con los nodos como dicts.
+
+SQLite no tiene LATERAL: las lecturas sin relaciones se ejecutan (con un
+json_build_object registrado en conftest) y las anidadas se comprueban
+compilando para PostgreSQL.
+"""
+import enum
+from types import SimpleNamespace
+
+from sqlalchemy import Enum, Integer, JSON
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from strawberry.types.nodes import SelectedField
+
+from . import json_query
+from .conftest import Diocesis, Templo
+from .json_query import JsonQueryCompiler, resolve_attribute
+
+# Sin createdAt: SQLite guarda las fechas como texto "YYYY-MM-DD HH:MM:SS", PostgreSQL las serializa en ISO 8601
+LIST = "{ templos(first: 3) { edges { cursor node { id nombre aforo notas } } totalCount } }"
+
+
+def field(name, *children):
+    return SelectedField(name=name, directives={}, arguments={}, selections=list(children), alias=None)
+
+
+def compile_pg(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+# ----------------------
+# Ejecución
+# ----------------------
+
+def test_json_mode_returns_the_same_page_in_one_statement(graphql):
+    orm = graphql(LIST)
+    json = graphql(LIST, json_mode=True)
+    assert orm.errors is None and json.errors is None
+    assert json.data == orm.data
+    page = [s for s in graphql.statements if "FROM gql_templos" in s and "count(" not in s]
+    assert len(page) == 1 and "json_build_object" in page[0]
+
+
+def test_json_mode_get_by_id(graphql):
+    result = graphql('{ templo(id: "4") { id nombre notas } }', json_mode=True)
+    assert result.errors is None
+    assert result.data["templo"] == {"id": "4", "nombre": "Templo 4", "notas": None}
+    assert any("json_build_object" in s for s in graphql.statements)
+
+
+def test_properties_fall_back_to_the_orm(graphql):
+    result = graphql('{ templo(id: "2") { nombre etiqueta } }', json_mode=True)
+    assert result.errors is None
+    assert result.data["templo"] == {"nombre": "Templo 2", "etiqueta": "Templo 2 (100)"}
+    assert not any("json_build_object" in s for s in graphql.statements)
+
+
+def test_enabled_by_context_or_environment(monkeypatch):
+    assert JsonQueryCompiler.enabled(SimpleNamespace(context={"json_mode": True}))
+    assert not JsonQueryCompiler.enabled(SimpleNamespace(context={}))
+    monkeypatch.setattr(json_query, "JSON_MODE", True)
+    assert JsonQueryCompiler.enabled(SimpleNamespace(context={}))
+
+
+def test_resolve_attribute_reads_dicts_and_objects():
+    assert resolve_attribute({"nombre": "León"}, "nombre") == "León"
+    assert resolve_attribute({}, "nombre") is None
+    assert resolve_attribute(SimpleNamespace(nombre="Astorga"), "nombre") == "Astorga"
+
+
+# ----------------------
+# Soporte
+# ----------------------
+
+def test_supports_columns_and_relationships_only():
+    assert JsonQueryCompiler.supports(Templo, [field("id"), field("diocesisId"), field("diocesis", field("nombre"))])
+    assert JsonQueryCompiler.supports(Diocesis, [field("__typename"), field("templos", field("aforo"))])
+    assert not JsonQueryCompiler.supports(Templo, [field("etiqueta")])
+    # También dentro de una relación
+    assert not JsonQueryCompiler.supports(Diocesis, [field("templos", field("etiqueta"))])
+
+
+# ----------------------
+# SQL
+# ----------------------
+
+def test_relationships_become_lateral_subqueries():
+    sql = compile_pg(JsonQueryCompiler(Diocesis).select(
+        [field("nombre"), field("templos", field("nombre"), field("diocesis", field("id")))], extra=["created_at", "id"],
+    ))
+    assert sql.count("LEFT OUTER JOIN LATERAL") == 2
+    # Lista: json_agg ordenado por (created_at, id), vacía como '[]'
+    assert "json_agg(json_build_object('nombre', templos_1.nombre" in sql
+    assert "ORDER BY templos_1.created_at, templos_1.id)" in sql
+    assert "coalesce(templos_json_" in sql and "'[]'::json" in sql
+    # Objeto: una fila
+    assert "LIMIT $" in sql
+    assert "gql_diocesis.created_at AS created_at, gql_diocesis.id AS id" in sql
+
+
+def test_wide_objects_are_built_in_chunks(monkeypatch):
+    monkeypatch.setattr(JsonQueryCompiler, "MAX_PAIRS", 2)
+    sql = compile_pg(JsonQueryCompiler(Templo).select([field("id"), field("nombre"), field("aforo"), field("notas"), field("createdAt")]))
+    assert sql.count("jsonb_build_object(") == 3
+    assert sql.count("||") == 2
+    assert "AS JSON) AS data" in sql
+    assert "json_build_object(" not in sql.replace("jsonb_build_object(", "")
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Estado(enum.Enum):
+    bueno = "Bueno"
+    ruina = "En ruina"
+
+
+class Ficha(Base):
+    __tablename__ = "json_fichas"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    estado: Mapped[Estado] = mapped_column(Enum(Estado))
+    datos = mapped_column(JSON)
+
+
+def test_enums_and_json_columns():
+    sql = compile_pg(JsonQueryCompiler(Ficha).select([field("estado"), field("datos")]))
+    # El enum se guarda por nombre y GraphQL lo sirve por valor
+    assert "CASE json_fichas.estado WHEN $1::VARCHAR THEN $2::VARCHAR WHEN $3::VARCHAR THEN $4::VARCHAR END" in sql
+    assert "CAST(json_fichas.datos AS TEXT)" in sql
@@ -0,0 +1,182 @@
+"""
+KeysetPaginator: cursores y recorrido completo de una tabla (SQLite en memoria) por páginas.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Date, DateTime, Integer, Numeric, String, create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from .base_types import OrderBy, OrderDirection
+from .keyset import InvalidCursorError, KeysetPaginator
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    score: Mapped[Decimal | None] = mapped_column(Numeric(6, 2), nullable=True)
+    day: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+
+def asc(field):
+    return OrderBy(field=field, direction=OrderDirection.asc)
+
+
+def desc(field):
+    return OrderBy(field=field, direction=OrderDirection.desc)
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Muchos empates y NULL para que el desempate y la expansión lexicográfica importen
+        for i in range(1, 41):
+            session.add(Item(
+                id=i,
+                created_at=datetime(2026, 1, 1 + i % 4, 12, 0),
+                name="abcd"[i % 4],
+                score=None if i % 5 == 0 else Decimal(i % 3) + Decimal("0.25"),
+                day=None if i % 7 == 0 else date(2026, 2, 1 + i % 2),
+            ))
+        session.commit()
+        yield session
+
+
+def expected_order(session, paginator):
+    """Orden de referencia en Python: NULL es el valor máximo y el id desempata"""
+    def sort_key(item):
+        key = []
+        for attr, _, descending in paginator.keys:
+            value = getattr(item, attr)
+            # (es_null, valor) ordena NULL al final; en DESC se invierte todo el par
+            pair = (value is None, value if value is not None else 0)
+            key.append(_Reversed(pair) if descending else pair)
+        return key
+    return [item.id for item in sorted(session.scalars(select(Item)).all(), key=sort_key)]
+
+
+class _Reversed:
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def walk(session, paginator, page_size, reverse=False):
+    """Recorre la tabla entera página a página, como lo haría un cliente con los cursores"""
+    ids, cursor = [], None
+    while True:
+        stmt = select(Item).order_by(*paginator.order_clauses(reverse=reverse)).limit(page_size)
+        if cursor is not None:
+            stmt = stmt.where(paginator.seek_condition(paginator.decode_cursor(cursor), reverse=reverse))
+        page = session.scalars(stmt).all()
+        if not page:
+            return list(reversed(ids)) if reverse else ids
+        ids.extend(item.id for item in page)
+        cursor = paginator.encode_cursor(page[-1])
+
+
+ORDERINGS = [
+    None,
+    [asc("name")],
+    [desc("name")],
+    [asc("score")],
+    [desc("score")],
+    [asc("name"), desc("created_at")],
+    [desc("day"), asc("score")],
+    [asc("score"), asc("day"), desc("name")],
+    [desc("id")],
+    [asc("name"), desc("id"), asc("score")],
+]
+
+
+@pytest.mark.parametrize("order_by", ORDERINGS)
+@pytest.mark.parametrize("page_size", [1, 3, 7])
+def test_forward_and_backward_walk_visit_every_row_once(session, order_by, page_size):
+    paginator = KeysetPaginator(Item, order_by)
+    expected = expected_order(session, paginator)
+
+    assert walk(session, paginator, page_size) == expected
+    assert walk(session, paginator, page_size, reverse=True) == expected
+
+
+def test_default_order_is_created_at_then_id():
+    paginator = KeysetPaginator(Item)
+    assert [(key, descending) for key, _, descending in paginator.keys] == [("created_at", False), ("id", False)]
+
+
+def test_id_breaks_ties_in_the_direction_of_the_last_key():
+    paginator = KeysetPaginator(Item, [asc("name"), desc("score")])
+    assert [(key, descending) for key, _, descending in paginator.keys] == [
+        ("name", False), ("score", True), ("id", True)
+    ]
+
+
+def test_explicit_id_order_keeps_its_direction_and_ends_the_keys():
+    assert [(key, descending) for key, _, descending in KeysetPaginator(Item, [desc("id")]).keys] == [("id", True)]
+    paginator = KeysetPaginator(Item, [asc("name"), desc("id"), asc("score")])
+    assert [(key, descending) for key, _, descending in paginator.keys] == [("name", False), ("id", True)]
+
+
+def test_unknown_order_field():
+    with pytest.raises(ValueError, match="no tiene la columna ordenable"):
+        KeysetPaginator(Item, [asc("missing")])
+
+
+# ----------------------
+# Cursores
+# ----------------------
+
+def test_cursor_round_trip_keeps_types():
+    paginator = KeysetPaginator(Item, [asc("created_at"), asc("day"), desc("score")])
+    item = Item(id=7, created_at=datetime(2026, 3, 4, 5, 6, 7, 891000), day=date(2026, 2, 1), score=Decimal("1.25"))
+
+    cursor = paginator.encode_cursor(item)
+    assert "=" not in cursor
+    assert paginator.decode_cursor(cursor) == [item.created_at, item.day, item.score, 7]
+    assert [type(v) for v in paginator.decode_cursor(cursor)] == [datetime, date, Decimal, int]
+
+
+def test_cursor_with_nulls():
+    paginator = KeysetPaginator(Item, [asc("score")])
+    assert paginator.decode_cursor(paginator.encode_cursor(Item(id=3, score=None))) == [None, 3]
+
+
+def test_cursor_from_another_ordering_is_rejected():
+    cursor = KeysetPaginator(Item, [asc("name")]).encode_cursor(Item(id=1, name="a"))
+    for other in ([desc("name")], [asc("score")], None):
+        with pytest.raises(InvalidCursorError, match="no corresponde"):
+            KeysetPaginator(Item, other).decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24", ""])
+def test_malformed_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        KeysetPaginator(Item).decode_cursor(cursor)
+
+
+def test_row_comparison_only_for_uniform_non_null_orderings():
+    dialect = create_engine("sqlite://").dialect
+
+    def sql(paginator, values, reverse=False):
+        return str(paginator.seek_condition(values, reverse).compile(dialect=dialect))
+
+    uniform = KeysetPaginator(Item, [desc("created_at")])
+    assert sql(uniform, [datetime(2026, 1, 1), 5]) == "(items.created_at, items.id) < (?, ?)"
+    assert sql(uniform, [datetime(2026, 1, 1), 5], reverse=True) == "(items.created_at, items.id) > (?, ?)"
+    # Columna con NULL, valor NULL en el cursor o direcciones mixtas: OR de prefijos iguales
+    assert " OR " in sql(KeysetPaginator(Item, [asc("score")]), [Decimal("1.25"), 5])
+    assert " OR " in sql(KeysetPaginator(Item, [asc("name"), desc("created_at")]), ["a", datetime(2026, 1, 1), 5])
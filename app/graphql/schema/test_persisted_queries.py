@@ -0,0 +1,88 @@
+"""
+Consultas persistidas (APQ) por HTTP: PersistedQueryExtension + PersistedQueryGraphQL sobre un schema mínimo.
+"""
+import json
+
+import pytest
+import strawberry
+from starlette.testclient import TestClient
+
+from . import persisted_queries
+from .persisted_queries import APQ_MAX_AGE, DocumentCache, PersistedQueryExtension, PersistedQueryGraphQL, query_hash
+
+QUERY = "{ saludo }"
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def saludo(self) -> str:
+        return "hola"
+
+
+class App(PersistedQueryGraphQL):
+    async def get_context(self, request, response):
+        return {"request": request, "response": response}
+
+
+client = TestClient(App(strawberry.Schema(query=Query, extensions=[PersistedQueryExtension])))
+
+
+@pytest.fixture(autouse=True)
+def document_cache(monkeypatch):
+    cache = DocumentCache()
+    monkeypatch.setattr(persisted_queries, "document_cache", cache)
+    return cache
+
+
+def apq(digest=None):
+    return {"persistedQuery": {"version": 1, "sha256Hash": digest or query_hash(QUERY)}}
+
+
+def get_hash_only(accept="*/*"):
+    return client.get("/", params={"extensions": json.dumps(apq())}, headers={"Accept": accept})
+
+
+def register():
+    response = client.post("/", json={"query": QUERY, "extensions": apq()})
+    assert response.json() == {"data": {"saludo": "hola"}}
+
+
+@pytest.mark.parametrize("accept", ["*/*", "text/html,application/json;q=0.9,*/*;q=0.8", "application/json"])
+def test_get_with_hash_only_is_served_from_the_cache(accept):
+    register()
+    response = get_hash_only(accept)
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json() == {"data": {"saludo": "hola"}}
+    assert response.headers["cache-control"] == f"public, max-age={APQ_MAX_AGE}"
+
+
+def test_unknown_hash_over_get_asks_for_the_query():
+    response = get_hash_only()
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json()["errors"][0]["extensions"] == {"code": "PERSISTED_QUERY_NOT_FOUND"}
+
+
+def test_post_is_not_cacheable():
+    register()
+    response = client.post("/", json={"extensions": apq()})
+    assert response.json() == {"data": {"saludo": "hola"}}
+    assert "cache-control" not in response.headers
+
+
+def test_hash_mismatch():
+    response = client.post("/", json={"query": QUERY, "extensions": apq("0" * 64)})
+    assert response.json()["errors"][0]["extensions"] == {"code": "PERSISTED_QUERY_HASH_MISMATCH"}
+
+
+def test_validated_documents_are_cached_without_apq(document_cache):
+    assert client.post("/", json={"query": QUERY}).json() == {"data": {"saludo": "hola"}}
+    assert document_cache.get(query_hash(QUERY))[0] == QUERY
+    client.post("/", json={"query": "{ missing }"})
+    assert document_cache.get(query_hash("{ missing }")) is None
+
+
+@pytest.mark.parametrize("params", [{}, {"extensions": "{}"}, {"extensions": "not json"}])
+def test_browsers_still_get_the_ide(params):
+    response = client.get("/", params=params, headers={"Accept": "text/html"})
+    assert response.headers["content-type"].startswith("text/html")
@@ -0,0 +1,59 @@
+"""
+SelectionProjector: sólo se leen las columnas que pide la selección GraphQL.
+"""
+from .conftest import Templo
+from .projection import SelectionProjector
+
+
+def page_select(statements, table):
+    """SELECT de las filas de `table` (no el del total)"""
+    selects = [s for s in statements if s.lstrip().startswith("SELECT") and f"FROM {table}" in s and "count(" not in s]
+    assert len(selects) == 1, selects
+    return selects[0]
+
+
+def selected_columns(sql, table):
+    select_list = sql[:sql.index(f"FROM {table}")]
+    return {name for name in ("id", "nombre", "aforo", "notas", "created_at", "diocesis_id") if f"{table}.{name}" in select_list}
+
+
+def test_list_reads_only_selected_columns_and_cursor_keys(graphql):
+    result = graphql("{ templos(first: 3) { edges { node { nombre } } } }")
+    assert result.errors is None
+    assert [edge["node"]["nombre"] for edge in result.data["templos"]["edges"]] == ["Templo 1", "Templo 2", "Templo 3"]
+    # created_at e id: claves del cursor con el orden por defecto
+    assert selected_columns(page_select(graphql.statements, "gql_templos"), "gql_templos") == {"id", "created_at", "nombre"}
+
+
+def test_property_loads_the_columns_it_uses(graphql):
+    result = graphql('{ templo(id: "2") { etiqueta } }')
+    assert result.errors is None
+    assert result.data["templo"]["etiqueta"] == "Templo 2 (100)"
+    assert selected_columns(page_select(graphql.statements, "gql_templos"), "gql_templos") == {"id", "nombre", "aforo"}
+
+
+def test_relationship_loads_its_key_and_the_related_selection(graphql):
+    result = graphql("{ templos(first: 2) { edges { node { diocesis { nombre } } } } }")
+    assert result.errors is None
+    assert [edge["node"]["diocesis"]["nombre"] for edge in result.data["templos"]["edges"]] == ["León", "Astorga"]
+    assert selected_columns(page_select(graphql.statements, "gql_templos"), "gql_templos") == {"id", "created_at", "diocesis_id"}
+    assert selected_columns(page_select(graphql.statements, "gql_diocesis"), "gql_diocesis") == {"id", "nombre"}
+
+
+def test_order_by_columns_are_loaded_for_the_cursor(graphql):
+    result = graphql('{ templos(first: 2, orderBy: [{field: "aforo", direction: desc}]) { edges { cursor node { id } } } }')
+    assert result.errors is None
+    assert [edge["node"]["id"] for edge in result.data["templos"]["edges"]] == ["12", "11"]
+    assert selected_columns(page_select(graphql.statements, "gql_templos"), "gql_templos") == {"id", "aforo"}
+
+
+class Dinamico:
+    @property
+    def campo(self):
+        return getattr(self, "notas")
+
+
+def test_dynamic_property_loads_the_whole_row():
+    assert SelectionProjector.attribute_dependencies(Dinamico, "campo") is None
+    assert SelectionProjector.attribute_dependencies(Templo, "etiqueta") == {"nombre", "aforo"}
+    assert SelectionProjector.python_name(Templo, "diocesisId") == "diocesis_id"
@@ -0,0 +1,105 @@
+"""
+Listados generados: total exacto o estimado, calculado a la vez que la página.
+"""
+import asyncio
+
+from geoalchemy2 import Geometry
+from sqlalchemy import Column, Integer, select, table, true
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .crud_generator import Explain, GenericCRUD
+
+LIST = """
+query ($filters: [FilterCondition!], $first: Int, $pagination: PaginationInput, $count: CountMode! = exact) {
+  templos(filters: $filters, first: $first, pagination: $pagination, count: $count) {
+    edges { node { id nombre } }
+    pageInfo { hasNextPage hasPreviousPage }
+    totalCount
+    totalIsEstimate
+  }
+}
+"""
+
+
+def templos(graphql, **variables):
+    result = graphql(LIST, variables)
+    assert result.errors is None, result.errors
+    assert result.data["templos"] is not None
+    return result.data["templos"]
+
+
+def test_total_counts_every_matching_row(graphql):
+    connection = templos(graphql, first=5)
+    assert len(connection["edges"]) == 5
+    assert connection["totalCount"] == 12
+    assert connection["totalIsEstimate"] is False
+    assert connection["pageInfo"]["hasNextPage"] is True
+
+
+def test_total_uses_the_page_filters(graphql):
+    filters = [{"field": "aforo", "operator": "gt", "value": 400}]
+    connection = templos(graphql, filters=filters, first=2)
+    assert [edge["node"]["id"] for edge in connection["edges"]] == ["9", "10"]
+    assert connection["totalCount"] == 4
+
+
+def test_total_with_numeric_pagination(graphql):
+    connection = templos(graphql, pagination={"page": 1, "pageSize": 20})
+    assert len(connection["edges"]) == 12
+    assert connection["totalCount"] == 12
+    assert connection["pageInfo"]["hasNextPage"] is False
+
+
+def test_total_runs_concurrently_with_the_page(graphql, monkeypatch):
+    # Cada lado espera a que el otro haya empezado: en serie, el primero agotaría su espera
+    events = {}
+    count, list_keyset = GenericCRUD.count, GenericCRUD.list_keyset
+
+    async def meet(mine, other):
+        events.setdefault(mine, asyncio.Event()).set()
+        await asyncio.wait_for(events.setdefault(other, asyncio.Event()).wait(), timeout=1)
+
+    async def concurrent_count(self, where=None):
+        await meet("count", "page")
+        return await count(self, where)
+
+    async def concurrent_list_keyset(self, *args, **kwargs):
+        await meet("page", "count")
+        return await list_keyset(self, *args, **kwargs)
+
+    monkeypatch.setattr(GenericCRUD, "count", concurrent_count)
+    monkeypatch.setattr(GenericCRUD, "list_keyset", concurrent_list_keyset)
+    connection = templos(graphql, first=3)
+    assert connection["totalCount"] == 12
+    assert len(connection["edges"]) == 3
+
+
+def test_estimated_mode_skips_the_exact_count(graphql, monkeypatch):
+    calls = []
+
+    async def estimate_count(self, where=None):
+        calls.append(list(where or []))
+        return 1000
+
+    async def count(self, where=None):
+        raise AssertionError("COUNT(*) en modo estimado")
+
+    monkeypatch.setattr(GenericCRUD, "estimate_count", estimate_count)
+    monkeypatch.setattr(GenericCRUD, "count", count)
+    filters = [{"field": "aforo", "operator": "gt", "value": 400}]
+    connection = templos(graphql, filters=filters, first=2, count="estimated")
+    assert connection["totalCount"] == 1000
+    assert connection["totalIsEstimate"] is True
+    # El estimador recibe el mismo predicado que la página
+    assert len(calls) == 1 and len(calls[0]) == 1
+
+
+def test_explain_binds_parameters():
+    # Columnas sin representación literal (JSONB, geometría): el EXPLAIN no puede usar literal_binds
+    lugares = table("lugares", Column("id", Integer), Column("datos", JSONB), Column("geom", Geometry("POINT", srid=4326)))
+    stmt = select(true()).select_from(lugares).where(lugares.c.datos.contains({"bic": True}), lugares.c.id > 5)
+    sql = str(Explain(stmt).compile(dialect=postgresql.asyncpg.dialect()))
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "$1" in sql and "$2" in sql
+
@@ -0,0 +1,173 @@
+"""
+QueryCostAnalyzer / QueryCostExtension sobre un schema pequeño generado con StrawberryTypeGenerator.
+"""
+from typing import List, Optional
+
+import pytest
+import strawberry
+from graphql import parse
+from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from . import query_cost
+from .base_types import PaginationInput
+from .query_cost import DEFAULT_PAGE_SIZE, QUERY_LIST_SIZE, QueryCostAnalyzer, QueryCostExtension
+from .type_generator import StrawberryTypeGenerator
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Diocesis(Base):
+    __tablename__ = "cost_diocesis"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    parroquias: Mapped[List["Parroquia"]] = relationship(back_populates="diocesis")
+
+    @property
+    def etiqueta(self) -> str:
+        return f"Diócesis de {self.nombre}"
+
+
+class Parroquia(Base):
+    __tablename__ = "cost_parroquias"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    diocesis_id: Mapped[int] = mapped_column(ForeignKey("cost_diocesis.id"))
+    diocesis: Mapped[Diocesis] = relationship(back_populates="parroquias")
+
+
+DiocesisType = StrawberryTypeGenerator.generate_strawberry_type(Diocesis)
+ParroquiaType = StrawberryTypeGenerator.generate_strawberry_type(Parroquia)
+DiocesisConnection = StrawberryTypeGenerator.generate_connection_type(Diocesis)
+
+
+def _field(resolver, return_type):
+    resolver.__annotations__["return"] = return_type
+    return strawberry.field(resolver=resolver)
+
+
+def _one(id: strawberry.ID):
+    return None
+
+
+def _connection(first: Optional[int] = None, last: Optional[int] = None,
+                pagination: Optional[PaginationInput] = None):
+    return None
+
+
+def _nearest(k: int = 10):
+    return []
+
+
+def _all():
+    return []
+
+
+Query = strawberry.type(type("Query", (), {
+    "diocesis": _field(_one, Optional[DiocesisType]),
+    "diocesiss": _field(_connection, Optional[DiocesisConnection]),
+    "diocesisNearest": _field(_nearest, Optional[List[DiocesisType]]),
+    "parroquiasAll": _field(_all, List[ParroquiaType]),
+}))
+schema = strawberry.Schema(query=Query, extensions=[QueryCostExtension])
+
+
+@pytest.fixture(autouse=True)
+def models_by_type(monkeypatch):
+    # El mapa tipo -> modelo se cachea en la clase; se rehace con los tipos de este módulo
+    monkeypatch.setattr(QueryCostAnalyzer, "_models_by_type", None)
+
+
+def analyze(query, variables=None, operation_name=None):
+    document = parse(query)
+    operation = QueryCostAnalyzer.operation(document, operation_name)
+    return QueryCostAnalyzer(schema._schema, document, variables).analyze(operation)
+
+
+# ----------------------
+# Coste
+# ----------------------
+
+@pytest.mark.parametrize("query, cost, depth", [
+    # Objeto: 1; columnas: 0; propiedad del modelo: 1
+    ("{ diocesis(id: 1) { id nombre } }", 1, 1),
+    ("{ diocesis(id: 1) { id etiqueta } }", 2, 1),
+    # Relación a muchos sin paginar: GRAPHQL_COST_LIST_SIZE; a uno: 1
+    ("{ diocesis(id: 1) { parroquias { id } } }", 1 + QUERY_LIST_SIZE, 2),
+    ("{ diocesis(id: 1) { parroquias { diocesis { id } } } }", 1 + QUERY_LIST_SIZE * 2, 3),
+    # Listas: por `k` o por la página por defecto
+    ("{ diocesisNearest(k: 3) { id } }", 3, 1),
+    ("{ diocesisNearest { id } }", DEFAULT_PAGE_SIZE, 1),
+    ("{ parroquiasAll { diocesis { etiqueta } } }", DEFAULT_PAGE_SIZE * 3, 2),
+])
+def test_cost_and_depth(query, cost, depth):
+    assert analyze(query) == (cost, depth)
+
+
+@pytest.mark.parametrize("arguments, page", [
+    ("(first: 5)", 5),
+    ("(last: 3)", 3),
+    ("(pagination: {page: 2, pageSize: 7})", 7),
+    ("", DEFAULT_PAGE_SIZE),
+    ("(first: -4)", 0),
+])
+def test_connection_pages_multiply_nodes(arguments, page):
+    # Consulta del total + página de nodos, cada uno con su lista de parroquias
+    query = f"{{ diocesiss{arguments} {{ totalCount pageInfo {{ hasNextPage }} edges {{ cursor node {{ id parroquias {{ id }} }} }} }} }}"
+    assert analyze(query) == (1 + page * (1 + QUERY_LIST_SIZE), 2)
+
+
+def test_connection_and_edge_add_no_depth():
+    assert analyze("{ diocesiss(first: 2) { edges { node { id } } } }") == (1 + 2, 1)
+
+
+def test_page_size_from_variables():
+    query = "query($n: Int, $p: PaginationInput) { a: diocesiss(first: $n) { totalCount } b: diocesiss(pagination: $p) { totalCount } }"
+    assert analyze(query, {"n": 4, "p": {"page": 1, "pageSize": 9}}) == ((1 + 4) + (1 + 9), 1)
+
+
+def test_fragments_cost_like_inline_fields():
+    inline = "{ diocesis(id: 1) { etiqueta parroquias { id diocesis { id } } } }"
+    fragments = """
+        query { diocesis(id: 1) { ...D } }
+        fragment D on DiocesisType { etiqueta parroquias { ...P } }
+        fragment P on ParroquiaType { id ... on ParroquiaType { diocesis { id } } }
+    """
+    assert analyze(fragments) == analyze(inline)
+
+
+def test_introspection_fields_are_free():
+    assert analyze("{ __typename diocesis(id: 1) { __typename id } }") == (1, 1)
+
+
+def test_operation_selection():
+    document = parse("query A { diocesis(id: 1) { id } } query B { parroquiasAll { id } }")
+    assert QueryCostAnalyzer.operation(document, "B").name.value == "B"
+    assert QueryCostAnalyzer.operation(document, None) is None
+    assert QueryCostAnalyzer.operation(document, "C") is None
+
+
+# ----------------------
+# Extensión
+# ----------------------
+
+def test_cost_reported_in_extensions():
+    result = schema.execute_sync("{ diocesiss(first: 5) { totalCount } }")
+    assert result.errors is None
+    assert result.extensions["cost"] == {"requested": 6, "maximum": query_cost.QUERY_MAX_COST, "depth": 1}
+
+
+def test_too_deep_is_rejected(monkeypatch):
+    monkeypatch.setattr(query_cost, "QUERY_MAX_DEPTH", 2)
+    result = schema.execute_sync("{ diocesis(id: 1) { parroquias { diocesis { id } } } }")
+    assert result.data is None
+    assert result.errors[0].extensions == {"code": "QUERY_TOO_DEEP", "depth": 3, "maxDepth": 2}
+
+
+def test_too_costly_is_rejected(monkeypatch):
+    monkeypatch.setattr(query_cost, "QUERY_MAX_COST", 100)
+    result = schema.execute_sync("{ diocesiss(first: 50) { edges { node { parroquias { id } } } } }")
+    assert result.data is None
+    assert result.errors[0].extensions == {"code": "QUERY_TOO_COMPLEX", "cost": 1 + 50 * (1 + QUERY_LIST_SIZE), "maxCost": 100}
@@ -0,0 +1,138 @@
+"""
+Caché de respuestas: sólo queries sobre tablas cacheables, invalidadas por etiqueta (tabla).
+"""
+import time
+
+import pytest
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from app.db.changes import cache_changes
+from .conftest import GraphQLRunner
+from .response_cache import ResponseCache, ResponseCacheExtension, response_cache
+from .schema_generator import SchemaGenerator
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Provincia(Base):
+    """Catálogo: su tabla está en CACHE_TABLES"""
+    __tablename__ = "provincias"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+
+
+class Visita(Base):
+    __tablename__ = "cache_visitas"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+
+
+schema = SchemaGenerator.generate_schema([Provincia, Visita], extensions=[ResponseCacheExtension])
+
+PROVINCIAS = "{ provincias(first: 10) { edges { node { nombre } } } }"
+
+
+# ----------------------
+# ResponseCache
+# ----------------------
+
+def test_invalidate_drops_only_entries_tagged_with_the_table():
+    cache = ResponseCache()
+    cache.put("a", {"a": 1}, {"provincias"}, cache.generation)
+    cache.put("b", {"b": 1}, {"provincias", "localidades"}, cache.generation)
+    cache.put("c", {"c": 1}, {"localidades"}, cache.generation)
+    cache.invalidate("provincias")
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") == {"c": 1}
+    assert cache.tags == {"localidades": {"c"}}
+
+
+def test_tables_outside_the_cache_do_not_invalidate():
+    cache = ResponseCache()
+    cache.put("a", {"a": 1}, {"provincias"}, cache.generation)
+    generation = cache.generation
+    cache.invalidate("inmuebles")
+    assert cache.generation == generation
+    assert cache.get("a") == {"a": 1}
+
+
+def test_results_computed_before_an_invalidation_are_not_stored():
+    cache = ResponseCache()
+    generation = cache.generation
+    cache.invalidate("provincias")
+    cache.put("a", {"a": 1}, {"provincias"}, generation)
+    assert cache.get("a") is None
+
+
+def test_ttl_and_lru(monkeypatch):
+    cache = ResponseCache(max_entries=2, ttl=10)
+    for key in "abc":
+        cache.put(key, {key: 1}, {"provincias"}, cache.generation)
+    assert cache.get("a") is None
+    assert cache.tags["provincias"] == {"b", "c"}
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("b") is None
+
+
+def test_cache_invalidation_channel_reaches_the_cache():
+    response_cache.clear()
+    response_cache.put("a", {"a": 1}, {"provincias"}, response_cache.generation)
+    # Lo que publica el trigger por sentencia de la migración 0008
+    cache_changes.publish({"table": "provincias", "op": "UPDATE"})
+    assert response_cache.get("a") is None
+
+
+# ----------------------
+# Extensión
+# ----------------------
+
+async def seed(connection):
+    await connection.run_sync(Base.metadata.create_all)
+    await connection.execute(Provincia.__table__.insert(), [dict(id=24, nombre="León"), dict(id=49, nombre="Zamora")])
+    await connection.execute(Visita.__table__.insert(), [dict(id=1, nombre="Catedral")])
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    graphql = GraphQLRunner(tmp_path / "cache.sqlite", monkeypatch, schema, seed)
+
+    def execute(query):
+        result = graphql(query)
+        assert result.errors is None, result.errors
+        return result.data
+    execute.statements = graphql.statements
+
+    response_cache.clear()
+    yield execute
+    response_cache.clear()
+
+
+def test_catalog_queries_are_served_from_the_cache(run):
+    first = run(PROVINCIAS)
+    assert run.statements
+    assert run(PROVINCIAS) == first
+    assert run.statements == []
+
+
+def test_queries_on_other_tables_are_not_cached(run):
+    run("{ visitas(first: 10) { edges { node { nombre } } } }")
+    run("{ visitas(first: 10) { edges { node { nombre } } } }")
+    assert run.statements
+
+
+def test_change_notifications_invalidate_the_response(run):
+    run(PROVINCIAS)
+    cache_changes.publish({"table": "provincias", "op": "UPDATE"})
+    run(PROVINCIAS)
+    assert run.statements
+
+
+def test_generated_mutations_invalidate_their_table(run):
+    assert run(PROVINCIAS)["provincias"]["edges"] == [{"node": {"nombre": "León"}}, {"node": {"nombre": "Zamora"}}]
+    run('mutation { updateProvincia(id: "49", data: {nombre: "Zamora (capital)"}) { nombre } }')
+    assert run(PROVINCIAS)["provincias"]["edges"][1] == {"node": {"nombre": "Zamora (capital)"}}
+    assert run.statements
@@ -0,0 +1,154 @@
+"""
+SpatialCompiler: caja, radio y vecinos sobre las expresiones de los índices GiST.
+"""
+import asyncio
+
+import pytest
+from geoalchemy2 import Geometry
+from sqlalchemy import Integer, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from .crud_generator import GenericCRUD
+from .schema_generator import SchemaGenerator
+from .spatial import MAX_RADIUS_METERS, SpatialCompiler, SpatialError
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Punto(Base):
+    __tablename__ = "spatial_puntos"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    geom = mapped_column(Geometry("POINT", srid=4326), nullable=True)
+
+
+class Plano(Base):
+    __tablename__ = "spatial_planos"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    titulo: Mapped[str] = mapped_column(String)
+
+
+spatial = SpatialCompiler(Punto)
+
+
+def compile_pg(clause):
+    return str(clause.compile(dialect=postgresql.asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+# ----------------------
+# Predicados
+# ----------------------
+
+def test_geometry_column():
+    assert SpatialCompiler.geometry_column(Punto) is Punto.geom
+    assert SpatialCompiler.geometry_column(Plano) is None
+
+
+def test_bbox_uses_the_geometry_index():
+    sql = compile_pg(spatial.in_bbox(-7.1, 41.9, -4.2, 43.3))
+    assert sql == "spatial_puntos.geom && ST_MakeEnvelope(-7.1, 41.9, -4.2, 43.3, 4326)"
+
+
+def test_radius_in_meters_over_geography():
+    sql = compile_pg(spatial.within_radius(-5.57, 42.6, 1500))
+    assert sql == (
+        "ST_DWithin(geography(spatial_puntos.geom), "
+        "geography(ST_SetSRID(ST_MakePoint(-5.57, 42.6), 4326)), 1500)"
+    )
+
+
+def test_knn_order():
+    sql = compile_pg(spatial.distance_order(-5.57, 42.6))
+    assert sql == "geography(spatial_puntos.geom) <-> geography(ST_SetSRID(ST_MakePoint(-5.57, 42.6), 4326))"
+    assert compile_pg(spatial.not_null()) == "spatial_puntos.geom IS NOT NULL"
+
+
+@pytest.mark.parametrize("call", [
+    lambda: spatial.in_bbox(-181, 40, -4, 43),
+    lambda: spatial.in_bbox(-7, 40, -4, 91),
+    # Esquinas cambiadas
+    lambda: spatial.in_bbox(-4, 40, -7, 43),
+    lambda: spatial.in_bbox(-7, 43, -4, 40),
+    lambda: spatial.within_radius(-5.5, 42.6, 0),
+    lambda: spatial.within_radius(-5.5, 42.6, MAX_RADIUS_METERS + 1),
+    lambda: spatial.within_radius(200, 42.6, 100),
+    lambda: spatial.distance_order(-5.5, -95),
+])
+def test_out_of_range_parameters(call):
+    with pytest.raises(SpatialError):
+        call()
+
+
+# ----------------------
+# Queries generadas
+# ----------------------
+
+schema = SchemaGenerator.generate_schema([Punto, Plano])
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Argumentos de list_all/list_keyset en lugar de ir a la base de datos"""
+    calls = {}
+
+    async def list_all(self, session, where=None, offset=0, limit=20, order_by=None, options=None, statement=None):
+        calls["list_all"] = dict(where=where, limit=limit, order_by=order_by)
+        return []
+
+    async def list_keyset(self, session, paginator, where, limit, **kwargs):
+        calls["list_keyset"] = dict(where=where, limit=limit)
+        return [], False
+
+    async def count(self, where=None):
+        return 0
+
+    monkeypatch.setattr(GenericCRUD, "list_all", list_all)
+    monkeypatch.setattr(GenericCRUD, "list_keyset", list_keyset)
+    monkeypatch.setattr(GenericCRUD, "count", count)
+    return calls
+
+
+def execute(query):
+    result = asyncio.run(schema.execute(query, context_value={"db": None, "loaders": None, "json_mode": False}))
+    assert result.errors is None, result.errors
+    return result.data
+
+
+def test_spatial_queries_only_for_models_with_geometry():
+    sdl = str(schema)
+    for name in ("puntosInBBox", "puntosWithinRadius", "puntosNearest"):
+        assert name in sdl
+    assert "planosInBBox" not in sdl
+
+
+def test_bbox_query_combines_filters_and_box(captured):
+    data = execute('{ puntosInBBox(minLon: -7, minLat: 41, maxLon: -4, maxLat: 43, '
+                   'filters: [{field: "nombre", operator: eq, value: "Castro"}]) { totalCount } }')
+    assert data["puntosInBBox"]["totalCount"] == 0
+    where = [compile_pg(c) for c in captured["list_keyset"]["where"]]
+    assert where == ["spatial_puntos.nombre = 'Castro'", "spatial_puntos.geom && ST_MakeEnvelope(-7.0, 41.0, -4.0, 43.0, 4326)"]
+
+
+def test_radius_query(captured):
+    execute("{ puntosWithinRadius(lon: -5.57, lat: 42.6, meters: 500) { totalCount } }")
+    assert compile_pg(captured["list_keyset"]["where"][-1]).startswith("ST_DWithin(geography(spatial_puntos.geom)")
+
+
+def test_nearest_orders_by_distance_and_clamps_k(captured):
+    execute("{ puntosNearest(lon: -5.57, lat: 42.6, k: 1000) { id } }")
+    call = captured["list_all"]
+    assert call["limit"] == 100
+    assert [compile_pg(c) for c in call["order_by"]] == [compile_pg(spatial.distance_order(-5.57, 42.6))]
+    assert compile_pg(call["where"][-1]) == "spatial_puntos.geom IS NOT NULL"
+
+
+def test_out_of_range_query_returns_null(captured):
+    result = asyncio.run(schema.execute(
+        "{ puntosWithinRadius(lon: -5.57, lat: 42.6, meters: 1000000) { totalCount } }",
+        context_value={"db": None, "loaders": None, "json_mode": False},
+    ))
+    assert result.data["puntosWithinRadius"] is None
+    assert "list_keyset" not in captured
@@ -0,0 +1,100 @@
+"""
+StrawberryTypeGenerator: columnas que llegan al schema generado.
+"""
+import asyncio
+
+import strawberry
+from geoalchemy2 import Geometry
+from sqlalchemy import Integer, String
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.types import UserDefinedType
+
+from .type_generator import StrawberryTypeGenerator
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Opaque(UserDefinedType):
+    """Como Geometry o TSVECTOR en SQLAlchemy 2.1: `python_type` es `object`"""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "OPAQUE"
+
+    @property
+    def python_type(self):
+        return object
+
+
+class Lugar(Base):
+    __tablename__ = "type_lugares"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    geom = mapped_column(Geometry("POINT", srid=4326), nullable=True)
+    vector = mapped_column(TSVECTOR, nullable=True)
+    opaco = mapped_column(Opaque, nullable=True)
+
+
+class Documento(Base):
+    __tablename__ = "type_documentos"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    titulo: Mapped[str] = mapped_column(String)
+    # Como en los modelos: vector mantenido por trigger, diferido
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
+    # Diferida aunque su tipo sí tenga equivalente Python
+    texto_completo: Mapped[str | None] = mapped_column(String, nullable=True, deferred=True)
+
+
+LugarType = StrawberryTypeGenerator.generate_strawberry_type(Lugar)
+DocumentoType = StrawberryTypeGenerator.generate_strawberry_type(Documento)
+
+
+def field_names(strawberry_type):
+    return {field.python_name for field in strawberry_type.__strawberry_definition__.fields}
+
+
+def test_columns_without_python_type_are_not_exposed():
+    assert field_names(LugarType) == {"id", "nombre"}
+    for operation in ("create", "update", "upsert"):
+        input_fields = field_names(StrawberryTypeGenerator.generate_input_type(Lugar, operation))
+        assert input_fields == ({"nombre"} if operation == "create" else {"id", "nombre"})
+
+
+def test_convert_skips_columns_without_python_type():
+    lugar = Lugar(id=1, nombre="Ermita", geom="SRID=4326;POINT(-3.7 40.4)", vector="'ermit':1", opaco=b"\x00")
+    obj = asyncio.run(StrawberryTypeGenerator._convert_to_strawberry(lugar))
+    assert (obj.id, obj.nombre) == (1, "Ermita")
+    assert not hasattr(obj, "geom")
+
+
+def test_deferred_columns_are_not_exposed():
+    assert field_names(DocumentoType) == {"id", "titulo"}
+    for operation in ("create", "update", "upsert"):
+        assert field_names(StrawberryTypeGenerator.generate_input_type(Documento, operation)) <= {"id", "titulo"}
+    obj = asyncio.run(StrawberryTypeGenerator._convert_to_strawberry(Documento(id=1, titulo="Acta")))
+    assert (obj.id, obj.titulo) == (1, "Acta")
+
+
+def test_schema_has_no_geometry_or_search_vector():
+    @strawberry.type
+    class Query:
+        lugar: LugarType
+        documento: DocumentoType
+
+    @strawberry.type
+    class Mutation:
+        @strawberry.mutation
+        def crear(self, data: StrawberryTypeGenerator.generate_input_type(Documento, "create")) -> DocumentoType:
+            return None
+
+        @strawberry.mutation
+        def actualizar(self, data: StrawberryTypeGenerator.generate_input_type(Documento, "update")) -> DocumentoType:
+            return None
+
+    sdl = str(strawberry.Schema(query=Query, mutation=Mutation))
+    for name in ("geom", "opaco", "vector", "searchVector", "textoCompleto"):
+        assert name not in sdl
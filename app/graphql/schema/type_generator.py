@@ -8,9 +8,14 @@ from decimal import Decimal
 import strawberry
 from strawberry.types import Info
 from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import RelationshipProperty
 import enum
+import inspect as pyinspect
 import uuid
 
+from .base_types import ConnectionPageInfo
+from .projection import SelectionProjector
+
 # ==============================
 # Property Detector
 # ==============================
@@ -28,15 +33,24 @@ class PropertyDetector:
         """Determina si un objeto es un método callable público"""
         return callable(obj) and not isinstance(obj, type) and not obj.__name__.startswith("_")
 
-    @staticmethod
-    def get_model_properties(model: Type) -> Dict[str, Dict[str, Any]]:
+    # modelo -> propiedades detectadas; se rellena también desde el artefacto de schema_cache
+    _properties: Dict[Type, Dict[str, Dict[str, Any]]] = {}
+
+    @classmethod
+    def get_model_properties(cls, model: Type) -> Dict[str, Dict[str, Any]]:
         """Devuelve propiedades y métodos útiles con tipos inferidos"""
+        if model in cls._properties:
+            return cls._properties[model]
         props = {}
 
         for attr_name in dir(model):
             if attr_name.startswith("_"):
                 continue
 
+            # Los métodos de clase/estáticos son utilidades del modelo, no campos
+            if isinstance(pyinspect.getattr_static(model, attr_name, None), (classmethod, staticmethod)):
+                continue
+
             attr = getattr(model, attr_name)
 
             if PropertyDetector.is_property_method(attr):
@@ -53,6 +67,7 @@ class PropertyDetector:
                         "obj": attr,
                         "return_type": PropertyDetector.infer_return_type(attr)
                     }
+        cls._properties[model] = props
         return props
 
     @staticmethod
@@ -104,6 +119,32 @@ class PropertyResolver:
                 return None
         return resolver
 
+# ==============================
+# Relationship Resolver
+# ==============================
+
+class RelationshipResolver:
+    """Crea resolvers para relaciones SQLAlchemy usando los DataLoaders de la petición"""
+
+    @staticmethod
+    def create_relationship_resolver(relationship: RelationshipProperty) -> Callable:
+        async def resolver(self, info: Info) -> Any:
+            if isinstance(self, dict):
+                # Modo JSON: la relación ya viene anidada en el propio nodo
+                return self.get(relationship.key)
+            columns = SelectionProjector.columns_for(
+                relationship.mapper.class_, SelectionProjector.descend(info.selected_fields)
+            )
+            loader = info.context["loaders"].for_relationship(relationship, columns)
+            key = loader.key_for(self._model_instance)
+            if key is None:
+                return [] if relationship.uselist else None
+            result = await loader.load(key)
+            if relationship.uselist:
+                return [await StrawberryTypeGenerator._convert_to_strawberry(item) for item in result]
+            return await StrawberryTypeGenerator._convert_to_strawberry(result)
+        return resolver
+
 # ==============================
 # Strawberry Type Generator
 # ==============================
@@ -143,14 +184,47 @@ class StrawberryTypeGenerator:
         if py_type == uuid.UUID:
             return strawberry.ID
 
-        if column and (column.primary_key or column.name == "id"):
+        if column is not None and (column.primary_key or column.name == "id"):
             return strawberry.ID
 
         return cls._type_mapping.get(py_type, str)
 
+    # Registro modelo -> tipo Strawberry; necesario para enlazar relaciones cíclicas
+    _types: Dict[Type, Type] = {}
+
+    @staticmethod
+    def column_python_type(column) -> Optional[Type]:
+        """Tipo Python de una columna, o None si el tipo no lo expone (p. ej. Geometry, TSVECTOR)"""
+        try:
+            py_type = column.type.python_type
+        except NotImplementedError:
+            return None
+        # SQLAlchemy 2.1 devuelve `object` para UserDefinedType (Geometry) y TSVECTOR en vez de fallar
+        return None if py_type is object else py_type
+
+    @classmethod
+    def exposed_columns(cls, model: Type) -> List[tuple]:
+        """(columna, tipo Python) de las columnas publicadas en GraphQL.
+
+        Quedan fuera las que no tienen tipo Python y las diferidas, como
+        `search_vector`, que mantiene un trigger y no forma parte de la fila.
+        """
+        mapper = inspect(model)
+        columns = []
+        for col in mapper.columns:
+            if mapper.get_property_by_column(col).deferred:
+                continue
+            py_type = cls.column_python_type(col)
+            if py_type is not None:
+                columns.append((col, py_type))
+        return columns
+
     @classmethod
     def generate_strawberry_type(cls, model: Type, type_name: str = None) -> Type:
-        """Genera un tipo Strawberry completo incluyendo propiedades"""
+        """Genera un tipo Strawberry completo incluyendo propiedades y relaciones"""
+        if model in cls._types:
+            return cls._types[model]
+
         if type_name is None:
             type_name = f"{model.__name__}Type"
 
@@ -158,38 +232,120 @@ class StrawberryTypeGenerator:
         fields: Dict[str, Type] = {}
 
         # Columnas
-        for col in mapper.columns:
-            st_type = cls.python_type_to_strawberry(col.type.python_type, col)
+        for col, py_type in cls.exposed_columns(model):
+            st_type = cls.python_type_to_strawberry(py_type, col)
             fields[col.name] = Optional[st_type] if col.nullable else st_type
 
+        # El tipo se registra antes de recorrer las relaciones para cortar los ciclos
+        strawberry_cls = type(type_name, (), {"__annotations__": fields})
+        cls._types[model] = strawberry_cls
+
+        # Relaciones (resueltas en lote mediante DataLoaders)
+        for rel in mapper.relationships:
+            target_type = cls.generate_strawberry_type(rel.mapper.class_)
+            resolver = RelationshipResolver.create_relationship_resolver(rel)
+            resolver.__annotations__["return"] = List[target_type] if rel.uselist else Optional[target_type]
+            setattr(strawberry_cls, rel.key, strawberry.field(resolver=resolver))
+
         # Propiedades y métodos
         props = PropertyDetector.get_model_properties(model)
         for name, info in props.items():
+            if name in fields or name in mapper.relationships:
+                continue
             st_type = cls.python_type_to_strawberry(info["return_type"])
-            fields[name] = st_type
+            resolver = PropertyResolver.create_property_resolver(name, info)
+            resolver.__annotations__["return"] = Optional[st_type]
+            setattr(strawberry_cls, name, strawberry.field(resolver=resolver))
 
         # Crear tipo Strawberry dinámico
-        return strawberry.type(type(type_name, (), {"__annotations__": fields}))
+        return strawberry.type(strawberry_cls)
+
+    _connection_types: Dict[Type, Type] = {}
+
+    @classmethod
+    def generate_connection_type(cls, model: Type) -> Type:
+        """Genera `<Modelo>Connection` y `<Modelo>Edge` al estilo Relay"""
+        if model in cls._connection_types:
+            return cls._connection_types[model]
+        node_type = cls.generate_strawberry_type(model)
+        edge_type = strawberry.type(type(f"{model.__name__}Edge", (), {
+            "__annotations__": {"cursor": str, "node": node_type}
+        }))
+        connection_type = strawberry.type(type(f"{model.__name__}Connection", (), {
+            "__annotations__": {
+                "edges": List[edge_type],
+                "page_info": ConnectionPageInfo,
+                "total_count": int,
+                "total_is_estimate": bool,
+            }
+        }))
+        connection_type.edge_type = edge_type
+        cls._connection_types[model] = connection_type
+        return connection_type
+
+    @classmethod
+    async def _convert_to_strawberry(cls, instance: Any) -> Any:
+        """Envuelve una instancia SQLAlchemy en su tipo Strawberry"""
+        if instance is None:
+            return None
+
+        model = type(instance)
+        strawberry_type = cls.generate_strawberry_type(model)
+        mapper = inspect(model)
+
+        # Las columnas no proyectadas (load_only) quedan a None en vez de cargarse
+        unloaded = inspect(instance).unloaded
+        data = {}
+        for col, _ in cls.exposed_columns(model):
+            key = mapper.get_property_by_column(col).key
+            data[col.name] = None if key in unloaded else getattr(instance, key)
+
+        obj = strawberry_type(**data)
+        # Propiedades y relaciones se resuelven contra la instancia original
+        obj._model_instance = instance
+        return obj
+
+    _input_types: Dict[tuple, Type] = {}
 
     @classmethod
     def generate_input_type(cls, model: Type, operation: str = "create") -> Type:
-        """Genera Input type para create/update"""
+        """Genera Input type para create/update/upsert.
+
+        Los campos opcionales valen `strawberry.UNSET` si no se envían, para
+        distinguir "no tocar" de un `null` explícito (ver `input_to_dict`).
+        """
+        if (model, operation) in cls._input_types:
+            return cls._input_types[(model, operation)]
         type_name = f"{model.__name__}{operation.capitalize()}Input"
-        mapper = inspect(model)
         fields: Dict[str, Type] = {}
+        defaults: Dict[str, Any] = {}
 
-        for col in mapper.columns:
+        for col, py_type in cls.exposed_columns(model):
             if col.primary_key and operation == "create":
                 continue
-            py_type = col.type.python_type
             st_type = cls.python_type_to_strawberry(py_type, col)
 
             if operation == "update":
                 st_type = Optional[st_type]
-            else:  # create
+            else:  # create / upsert
                 if col.nullable or col.default or col.server_default:
                     st_type = Optional[st_type]
 
             fields[col.name] = st_type
+            if get_origin(st_type) is not None and type(None) in get_args(st_type):
+                defaults[col.name] = strawberry.UNSET
+
+        input_type = strawberry.input(type(type_name, (), {"__annotations__": fields, **defaults}))
+        cls._input_types[(model, operation)] = input_type
+        return input_type
 
-        return strawberry.input(type(type_name, (), {"__annotations__": fields}))
+    @staticmethod
+    def input_to_dict(model: Type, data: Any) -> Dict[str, Any]:
+        """Valores enviados de un Input, con las claves de atributo del modelo"""
+        mapper = inspect(model)
+        table = mapper.local_table
+        return {
+            mapper.get_property_by_column(table.c[name]).key: value
+            for name, value in vars(data).items()
+            if value is not strawberry.UNSET and name in table.c
+        }
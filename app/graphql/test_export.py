@@ -0,0 +1,189 @@
+"""
+Exportación: SELECT por formato y codificación CSV / NDJSON / GeoJSON por lotes.
+"""
+import asyncio
+import csv
+import enum
+import gzip
+import io
+import json
+from datetime import date
+
+import pytest
+from geoalchemy2 import Geometry
+from sqlalchemy import Date, Enum, Float, ForeignKey, Integer, JSON, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from app.graphql import export
+from app.graphql.export import Exporter
+from app.graphql.schema.base_types import FilterCondition, FilterOperator
+from app.graphql.schema.filter_compiler import FilterError
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Estado(enum.Enum):
+    bueno = "Bueno"
+    ruina = "En ruina"
+
+
+class Lugar(Base):
+    __tablename__ = "export_lugares"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    fecha: Mapped[date | None] = mapped_column(Date, nullable=True)
+    estado: Mapped[Estado | None] = mapped_column(Enum(Estado), nullable=True)
+    datos = mapped_column(JSON, nullable=True)
+    geom = mapped_column(Geometry("POINT", srid=4326), nullable=True)
+    search_vector = mapped_column(TSVECTOR, nullable=True, deferred=True)
+    ext: Mapped["LugarExt"] = relationship(back_populates="lugar", uselist=False)
+    fotos: Mapped[list["Foto"]] = relationship()
+
+
+class LugarExt(Base):
+    __tablename__ = "export_lugares_ext"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    lugar_id: Mapped[int] = mapped_column(ForeignKey("export_lugares.id"))
+    wikidata: Mapped[str | None] = mapped_column(String, nullable=True)
+    lugar: Mapped[Lugar] = relationship(back_populates="ext")
+
+
+class Foto(Base):
+    __tablename__ = "export_fotos"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    lugar_id: Mapped[int] = mapped_column(ForeignKey("export_lugares.id"))
+
+
+class Sitio(Base):
+    """Sin geometría: el punto GeoJSON sale de longitud/latitud"""
+    __tablename__ = "export_sitios"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nombre: Mapped[str] = mapped_column(String)
+    longitud: Mapped[float | None] = mapped_column(Float, nullable=True)
+    latitud: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
+GEOJSON_POINT = '{"type":"Point","coordinates":[-5.57,42.6]}'
+# Filas en el orden de Exporter.fields: Lugar (id, nombre, fecha, estado, datos, geom) + ext (id, lugar_id, wikidata)
+ROWS = [
+    (1, "Catedral", date(1255, 1, 1), Estado.bueno, {"bic": True}, GEOJSON_POINT, 10, 1, "Q1"),
+    (2, "Ermita", None, Estado.ruina, None, None, None, None, None),
+]
+
+
+def compile_pg(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+# ----------------------
+# Consulta
+# ----------------------
+
+@pytest.mark.parametrize("fmt, geometry", [("csv", "ST_AsText"), ("ndjson", "ST_AsGeoJSON"), ("geojson", "ST_AsGeoJSON")])
+def test_statement_per_format(fmt, geometry):
+    exporter = Exporter(Lugar, fmt, ["ext"])
+    sql = compile_pg(exporter.statement([FilterCondition(field="nombre", operator=FilterOperator.eq, value="Ermita")]))
+    assert f"{geometry}(export_lugares.geom) AS c5" in sql
+    assert "search_vector" not in sql
+    assert "LEFT OUTER JOIN export_lugares_ext ON export_lugares.id = export_lugares_ext.lugar_id" in sql
+    assert "export_lugares_ext.wikidata AS c8" in sql
+    assert "WHERE export_lugares.nombre = $1" in sql
+
+
+def test_rejects_unknown_formats_and_to_many_relationships():
+    with pytest.raises(FilterError):
+        Exporter(Lugar, "xml")
+    with pytest.raises(FilterError):
+        Exporter(Lugar, "ndjson", ["fotos"])
+    with pytest.raises(FilterError):
+        Exporter(Lugar, "ndjson", ["nada"])
+
+
+# ----------------------
+# Codificación
+# ----------------------
+
+def test_csv():
+    exporter = Exporter(Lugar, "csv", ["ext"])
+    rows = [row[:5] + ("POINT(-5.57 42.6)",) + row[6:] if row[5] else row for row in ROWS]
+    lines = list(csv.reader(io.StringIO(exporter.header() + exporter.encode(rows, first=True))))
+    assert lines[0] == ["id", "nombre", "fecha", "estado", "datos", "geom", "ext.id", "ext.lugar_id", "ext.wikidata"]
+    assert lines[1] == ["1", "Catedral", "1255-01-01", "Bueno", '{"bic": true}', "POINT(-5.57 42.6)", "10", "1", "Q1"]
+    assert lines[2] == ["2", "Ermita", "", "En ruina", "", "", "", "", ""]
+    assert exporter.footer() == ""
+
+
+def test_ndjson():
+    exporter = Exporter(Lugar, "ndjson", ["ext"])
+    text = exporter.encode(ROWS, first=True)
+    assert text.endswith("\n")
+    first, second = [json.loads(line) for line in text.splitlines()]
+    assert first == {
+        "id": 1, "nombre": "Catedral", "fecha": "1255-01-01", "estado": "Bueno", "datos": {"bic": True},
+        "geom": {"type": "Point", "coordinates": [-5.57, 42.6]},
+        "ext": {"id": 10, "lugar_id": 1, "wikidata": "Q1"},
+    }
+    # Sin fila relacionada: null, no un objeto de nulos
+    assert second["ext"] is None and second["geom"] is None
+
+
+def test_geojson_uses_the_geometry_column():
+    exporter = Exporter(Lugar, "geojson")
+    rows = [row[:6] for row in ROWS]
+    document = json.loads(exporter.header() + exporter.encode(rows[:1], first=True) + exporter.encode(rows[1:], first=False) + exporter.footer())
+    first, second = document["features"]
+    assert first["id"] == 1
+    assert first["geometry"] == {"type": "Point", "coordinates": [-5.57, 42.6]}
+    assert "geom" not in first["properties"]
+    assert second["geometry"] is None
+    # Un lote vacío no deja comas sueltas
+    assert exporter.encode([], first=False) == ""
+
+
+def test_geojson_falls_back_to_longitude_and_latitude():
+    exporter = Exporter(Sitio, "geojson")
+    text = exporter.encode([(1, "Castro", -6.2, 42.9), (2, "Sin posición", None, None)], first=True)
+    first, second = [json.loads(feature) for feature in text.split(",\n")]
+    assert first["geometry"] == {"type": "Point", "coordinates": [-6.2, 42.9]}
+    assert second["geometry"] is None
+
+
+# ----------------------
+# Streaming
+# ----------------------
+
+def stream(monkeypatch, exporter, stmt, gzip_):
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(Sitio.__table__.create)
+            await connection.execute(Sitio.__table__.insert(), [
+                dict(id=i, nombre=f"Sitio {i}", longitud=-6.0 + i / 10, latitud=42.0) for i in range(1, 8)
+            ])
+        monkeypatch.setattr(export, "async_session", async_sessionmaker(engine))
+        try:
+            return b"".join([chunk async for chunk in exporter.stream(stmt, gzip_)])
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("gzip_", [False, True])
+def test_stream_in_batches(monkeypatch, gzip_):
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 3)
+    encoded = []
+    encode = Exporter.encode
+    monkeypatch.setattr(Exporter, "encode", lambda self, rows, first: encoded.append(len(rows)) or encode(self, rows, first))
+
+    exporter = Exporter(Sitio, "geojson")
+    body = stream(monkeypatch, exporter, exporter.statement(), gzip_)
+    if gzip_:
+        body = gzip.decompress(body)
+    document = json.loads(body)
+    assert [feature["id"] for feature in document["features"]] == list(range(1, 8))
+    assert encoded == [3, 3, 1]
@@ -0,0 +1,126 @@
+"""
+Caché de tiles: cobertura de un punto e invalidación a partir de los avisos de `row_changes`.
+"""
+import asyncio
+import math
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.graphql import tiles
+from app.graphql.tiles import TILE_BUFFER, TILE_EXTENT, TileCache
+
+# Punto OSM y punto de longitud/latitud de un mismo inmueble, y otro lejano
+OSM = [-3.7037902, 40.4167754]
+LONLAT = [-5.9844589, 37.3890924]
+FAR = [2.1734, 41.3851]
+
+
+def tile_of(lon, lat, z):
+    """Tile XYZ de un punto (fórmula de referencia de OSM)"""
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return z, x, y
+
+
+def test_covering_includes_the_tile_of_the_point_at_every_zoom():
+    keys = TileCache.covering(*OSM, max_zoom=12)
+    assert {tile_of(*OSM, z) for z in range(13)} <= keys
+    assert tile_of(*OSM, 10) == (10, 501, 386)
+    assert max(z for z, _, _ in keys) == 12
+    assert tile_of(*FAR, 8) not in keys
+
+
+def test_covering_includes_neighbours_within_the_buffer():
+    z = 10
+    n = 2 ** z
+    # Justo a la derecha del borde izquierdo del tile (501, 386): dentro del buffer del vecino 500
+    lon = 501 / n * 360.0 - 180.0 + (TILE_BUFFER / TILE_EXTENT / 2) / n * 360.0
+    keys = {key for key in TileCache.covering(lon, OSM[1], max_zoom=z) if key[0] == z}
+    assert {(z, 500, 386), (z, 501, 386)} <= keys
+    assert (z, 502, 386) not in keys
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = TileCache(str(tmp_path), ttl=0)
+    monkeypatch.setattr(tiles, "tile_cache", cache)
+    for point in (OSM, LONLAT, FAR):
+        for key in TileCache.covering(*point, max_zoom=6):
+            cache.put(key, b"tile")
+    return cache
+
+
+def notify(*payloads):
+    """Entrega los avisos como el bus de cambios y espera al lote de invalidación"""
+    async def deliver():
+        for payload in payloads:
+            tiles.on_row_change(payload)
+        await asyncio.sleep(0.6)
+    asyncio.run(deliver())
+
+
+def cached(cache, point, z=6):
+    return cache.get(tile_of(*point, z)) is not None
+
+
+@pytest.mark.parametrize("payload, invalidated", [
+    # Cambio de atributos de un inmueble con punto OSM: el trigger envía el punto OSM en old y new
+    ({"table": "inmuebles", "op": "UPDATE", "id": "a", "old": OSM, "new": OSM}, [OSM]),
+    # La extensión OSM aparece: el inmueble deja su longitud/latitud y pasa al punto OSM
+    ({"table": "inmuebles_osm_ext", "op": "INSERT", "id": "a", "old": LONLAT, "new": OSM}, [OSM, LONLAT]),
+    # ... o desaparece
+    ({"table": "inmuebles_osm_ext", "op": "DELETE", "id": "a", "old": OSM, "new": LONLAT}, [OSM, LONLAT]),
+    # Sin posición (p. ej. sin coordenadas ni OSM): no hay tile que invalidar
+    ({"table": "inmuebles", "op": "UPDATE", "id": "b", "old": None, "new": None}, []),
+])
+def test_row_change_invalidates_old_and_new_points(cache, payload, invalidated):
+    notify(payload)
+    for point in (OSM, LONLAT, FAR):
+        assert cached(cache, point) is (point not in invalidated), point
+
+
+def test_changes_are_applied_in_one_batch(cache, monkeypatch):
+    flushes = []
+    flush = tiles._flush
+    monkeypatch.setattr(tiles, "_flush", lambda: (flushes.append(1), flush()))
+    notify(*[{"table": "inmuebles", "op": "UPDATE", "id": str(i), "old": OSM, "new": LONLAT} for i in range(50)])
+    assert flushes == [1]
+    assert not cached(cache, OSM) and not cached(cache, LONLAT) and cached(cache, FAR)
+
+
+def test_catalog_renames_clear_every_tile(cache):
+    notify({"table": "tipos_inmueble", "op": "INSERT", "id": "t"})
+    assert cached(cache, FAR)
+    notify({"table": "tipos_inmueble", "op": "UPDATE", "id": "t"})
+    assert not any(cached(cache, point) for point in (OSM, LONLAT, FAR))
+
+
+@pytest.fixture
+def client():
+    return TestClient(Starlette(routes=[Route("/tiles/{z:int}/{x:int}/{y:int}.mvt", tiles.tile_endpoint)]))
+
+
+def test_rendered_tiles_are_cached(cache, client, monkeypatch):
+    async def render_tile(z, x, y):
+        return b"mvt"
+    monkeypatch.setattr(tiles, "render_tile", render_tile)
+
+    response = client.get("/tiles/6/0/0.mvt")
+    assert response.content == b"mvt"
+    assert cache.get((6, 0, 0))[1] == b"mvt"
+    assert client.get("/tiles/6/0/0.mvt", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_tile_rendered_during_an_invalidation_is_not_cached(cache, client, monkeypatch):
+    async def render_tile(z, x, y):
+        # Llega un lote de invalidación mientras se genera: el tile puede ser ya antiguo
+        tiles._flush()
+        return b"mvt"
+    monkeypatch.setattr(tiles, "render_tile", render_tile)
+
+    assert client.get("/tiles/6/0/0.mvt").content == b"mvt"
+    assert cache.get((6, 0, 0)) is None
@@ -0,0 +1,229 @@
+"""
+Tiles vectoriales (MVT) de inmuebles con caché en disco.
+
+`GET /tiles/{z}/{x}/{y}.mvt` genera la capa `inmuebles` con `ST_AsMVT` a partir
+de `InmuebleOSMExt.geom` o, si el inmueble no la tiene, de su columna generada
+`geom` (longitud/latitud). Los tiles se guardan direccionados por contenido
+(`objects/<sha256>.mvt`, compartidos por todos los tiles iguales, p. ej. los
+vacíos) con un índice `tiles/z/x/y` que apunta al objeto. Los cambios de filas
+que llegan por el bus (app/db/changes.py) borran del índice sólo los tiles que
+cubren la posición antigua y la nueva.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import text
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from app.db.changes import changes
+from app.db.sessions.async_session import async_session
+from app.graphql.metrics import metrics
+
+TILE_CACHE_DIR = os.getenv("GRAPHQL_TILE_CACHE_DIR", ".cache/tiles")
+# Sólo se cachean (y se invalidan) los zooms hasta este; por encima se generan siempre
+TILE_CACHE_MAX_ZOOM = int(os.getenv("GRAPHQL_TILE_CACHE_MAX_ZOOM", "16"))
+# Red de seguridad por si se pierden notificaciones con la API parada
+TILE_CACHE_TTL = int(os.getenv("GRAPHQL_TILE_CACHE_TTL", "86400"))
+TILE_MAX_ZOOM = 22
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_LAYER = "inmuebles"
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+TileKey = Tuple[int, int, int]
+
+TILE_SQL = text("""
+WITH bounds AS (
+    SELECT ST_TileEnvelope(:z, :x, :y) AS tile,
+           ST_Transform(ST_TileEnvelope(:z, :x, :y, margin => :margin), 4326) AS area
+),
+puntos AS (
+    SELECT o.inmueble_id AS id, o.geom
+    FROM inmuebles_osm_ext o, bounds
+    WHERE o.geom && bounds.area
+    UNION ALL
+    SELECT i.id, i.geom
+    FROM inmuebles i, bounds
+    WHERE i.geom && bounds.area
+      AND NOT EXISTS (
+          SELECT 1 FROM inmuebles_osm_ext o WHERE o.inmueble_id = i.id AND o.geom IS NOT NULL
+      )
+),
+mvt AS (
+    SELECT ST_AsMVTGeom(ST_Transform(p.geom, 3857), bounds.tile, :extent, :buffer) AS geom,
+           i.id, i.nombre, i.es_bic, i.es_ruina, t.nombre AS tipo_inmueble
+    FROM puntos p
+    JOIN inmuebles i ON i.id = p.id
+    LEFT JOIN tipos_inmueble t ON t.id = i.tipo_inmueble_id,
+    bounds
+    WHERE i.deleted_at IS NULL
+)
+SELECT ST_AsMVT(mvt, :layer, :extent, 'geom') FROM mvt
+""")
+
+# ==============================
+# Tile Cache
+# ==============================
+
+class TileCache:
+    """Caché de tiles en disco direccionada por contenido, compartida entre workers"""
+
+    def __init__(self, root: str = TILE_CACHE_DIR, ttl: int = TILE_CACHE_TTL):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def _index_path(self, key: TileKey) -> Path:
+        z, x, y = key
+        return self.root / "tiles" / str(z) / str(x) / str(y)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.mvt"
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def get(self, key: TileKey) -> Optional[Tuple[str, bytes]]:
+        """(digest, contenido) del tile si está en caché y no ha caducado"""
+        index = self._index_path(key)
+        try:
+            if self.ttl and time.time() - index.stat().st_mtime > self.ttl:
+                return None
+            digest = index.read_text()
+            return digest, self._object_path(digest).read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: TileKey, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        obj = self._object_path(digest)
+        if not obj.exists():
+            self._write_atomic(obj, data)
+        self._write_atomic(self._index_path(key), digest.encode())
+        return digest
+
+    def invalidate(self, keys: Iterable[TileKey]) -> int:
+        removed = 0
+        for key in keys:
+            try:
+                self._index_path(key).unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root / "tiles", ignore_errors=True)
+
+    # ----------------------
+    # Cobertura
+    # ----------------------
+    @staticmethod
+    def covering(lon: float, lat: float, max_zoom: int = TILE_CACHE_MAX_ZOOM) -> Set[TileKey]:
+        """Tiles de cada zoom en los que aparece un punto, incluido el margen (buffer) de los vecinos"""
+        lat = max(-85.0511, min(85.0511, lat))
+        margin = TILE_BUFFER / TILE_EXTENT
+        fx = (lon + 180.0) / 360.0
+        fy = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0
+        keys = set()
+        for z in range(max_zoom + 1):
+            n = 2 ** z
+            for dx in (-margin, 0.0, margin):
+                for dy in (-margin, 0.0, margin):
+                    x, y = math.floor(fx * n + dx), math.floor(fy * n + dy)
+                    if 0 <= x < n and 0 <= y < n:
+                        keys.add((z, x, y))
+        return keys
+
+
+tile_cache = TileCache()
+
+# ----------------------
+# Invalidación desde el bus de cambios
+# ----------------------
+_pending: Set[TileKey] = set()
+_pending_all = False
+_flush_scheduled = False
+# Se incrementa en cada invalidación: un tile generado mientras tanto no se guarda
+_generation = 0
+
+
+def _flush():
+    global _pending_all, _flush_scheduled, _generation
+    _generation += 1
+    if _pending_all:
+        tile_cache.clear()
+        removed = -1
+    else:
+        removed = tile_cache.invalidate(_pending)
+    _pending.clear()
+    _pending_all = _flush_scheduled = False
+    metrics.inc("graphql_tile_invalidations_total", help="Lotes de invalidación de tiles aplicados")
+    if removed:
+        print(f"[Tiles] Invalidación: {'todos' if removed < 0 else removed} tiles")
+
+
+def on_row_change(payload: Dict[str, Any]):
+    """Acumula los tiles afectados; las ráfagas del ETL se aplican en un solo lote"""
+    global _pending_all, _flush_scheduled
+    points = [payload.get("old"), payload.get("new")]
+    if payload.get("table") == "tipos_inmueble" and payload.get("op") != "INSERT":
+        # El nombre del tipo va en todos los tiles que lo contienen (un tipo nuevo aún no está en ninguno)
+        _pending_all = True
+    for point in points:
+        if point:
+            _pending.update(TileCache.covering(point[0], point[1]))
+    if not _flush_scheduled:
+        _flush_scheduled = True
+        asyncio.get_running_loop().call_later(0.5, _flush)
+
+
+for _table in ("inmuebles", "inmuebles_osm_ext", "tipos_inmueble"):
+    changes.subscribe(_table, on_row_change)
+
+# ==============================
+# Ruta
+# ==============================
+
+async def render_tile(z: int, x: int, y: int) -> bytes:
+    async with async_session() as session:
+        data = await session.scalar(TILE_SQL, {
+            "z": z, "x": x, "y": y, "margin": TILE_BUFFER / TILE_EXTENT,
+            "extent": TILE_EXTENT, "buffer": TILE_BUFFER, "layer": TILE_LAYER,
+        })
+    return bytes(data or b"")
+
+
+async def tile_endpoint(request: Request) -> Response:
+    z, x, y = (request.path_params[k] for k in ("z", "x", "y"))
+    if not (0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return JSONResponse({"error": f"Tile fuera de rango: {z}/{x}/{y}"}, status_code=404)
+
+    cached = tile_cache.get((z, x, y)) if z <= TILE_CACHE_MAX_ZOOM else None
+    if cached is not None:
+        digest, data = cached
+        metrics.inc("graphql_tile_requests_total", help="Tiles servidos por /tiles", cache="hit")
+    else:
+        generation = _generation
+        data = await render_tile(z, x, y)
+        if z <= TILE_CACHE_MAX_ZOOM and generation == _generation:
+            digest = tile_cache.put((z, x, y), data)
+        else:
+            digest = hashlib.sha256(data).hexdigest()
+        metrics.inc("graphql_tile_requests_total", help="Tiles servidos por /tiles", cache="miss")
+
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type=MEDIA_TYPE, headers=headers)
@@ -5,11 +5,13 @@ set -e
 GRAPHQL_PORT=${GRAPHQL_PORT:-8000}
 echo "== Starting GraphQL on port: $GRAPHQL_PORT"
 
-[ -d alembic/versions ] || mkdir -p alembic/versions
-if ! ls -1 alembic/versions/*.py >/dev/null 2>&1; then
-  echo "Autogenerating initial Alembic revision..."
-  alembic revision --autogenerate -m "initial"
+# Migraciones: sólo donde se piden (job de despliegue / primer arranque),
+# no en cada reinicio o autoescalado de los pods
+if [ "${RUN_MIGRATIONS:-1}" = "1" ]; then
+  alembic upgrade head
 fi
-alembic upgrade head
 
-exec uvicorn app.graphql.asgi:app --host 0.0.0.0 --port $GRAPHQL_PORT
+# Artefacto del schema: se construye una vez y lo cargan todos los workers
+python -m app.graphql.schema.schema_cache
+
+exec uvicorn app.graphql.asgi:app --host 0.0.0.0 --port $GRAPHQL_PORT --workers ${GRAPHQL_WORKERS:-1}